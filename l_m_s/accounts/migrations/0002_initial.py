@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.book'),
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='member',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wishlists', to='accounts.memberprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='memberprofile',
+            index=models.Index(fields=['member_id'], name='accounts_me_member__f81dcb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memberprofile',
+            index=models.Index(fields=['status'], name='accounts_me_status_d8c38a_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='memberbadge',
+            unique_together={('member', 'badge')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='wishlist',
+            unique_together={('member', 'book')},
+        ),
+    ]
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from accounts.models import MemberProfile
+from accounts.premium_models import Badge
+from catalog.images import image_changed, schedule_derivatives
 from notifications.models import NotificationPreference
 from analytics.models import MemberActivity
 
@@ -19,3 +21,21 @@ def create_user_profile(sender, instance, created, **kwargs):
 def create_member_activity(sender, instance, created, **kwargs):
     if created:
         MemberActivity.objects.get_or_create(member=instance)
+
+@receiver(pre_save, sender=MemberProfile)
+def note_new_profile_picture(sender, instance, **kwargs):
+    instance._new_profile_picture = image_changed(instance, 'profile_picture')
+
+@receiver(post_save, sender=MemberProfile)
+def build_profile_picture_derivatives(sender, instance, **kwargs):
+    if instance.__dict__.pop('_new_profile_picture', False):
+        schedule_derivatives(instance.profile_picture)
+
+@receiver(pre_save, sender=Badge)
+def note_new_badge_icon(sender, instance, **kwargs):
+    instance._new_icon = image_changed(instance, 'icon')
+
+@receiver(post_save, sender=Badge)
+def build_badge_icon_derivatives(sender, instance, **kwargs):
+    if instance.__dict__.pop('_new_icon', False):
+        schedule_derivatives(instance.icon)
\ No newline at end of file
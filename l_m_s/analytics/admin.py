@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import BookPopularity, MemberActivity, LibraryStatistics, SearchLog
+from .models import BookPopularity, MemberActivity, LibraryStatistics, SearchLog, SearchQueryDaily
 
 @admin.register(BookPopularity)
 class BookPopularityAdmin(admin.ModelAdmin):
@@ -27,3 +27,10 @@ class SearchLogAdmin(admin.ModelAdmin):
     search_fields = ['search_query', 'user__username']
     date_hierarchy = 'timestamp'
     readonly_fields = ['timestamp']
+
+@admin.register(SearchQueryDaily)
+class SearchQueryDailyAdmin(admin.ModelAdmin):
+    list_display = ['normalized_query', 'date', 'search_count', 'zero_result_count']
+    list_filter = ['date']
+    search_fields = ['normalized_query']
+    date_hierarchy = 'date'
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from analytics.rollups import rollup_search_logs
+
+class Command(BaseCommand):
+    help = 'Fold new search log entries into the daily search query totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        folded = rollup_search_logs(batch_size=options['batch_size'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Rolled up {folded} search log entries')
+        )
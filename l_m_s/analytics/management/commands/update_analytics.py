@@ -14,7 +14,7 @@ class Command(BaseCommand):
         
         for book in Book.objects.all():
             total_loans = Loan.objects.filter(book_instance__book=book).count()
-            total_reviews = book.reviews.count()
+            total_reviews = book.total_ratings
             avg_rating = book.average_rating
             
             popularity_score = (total_loans * 2) + (total_reviews * 1.5) + (float(avg_rating) * 10)
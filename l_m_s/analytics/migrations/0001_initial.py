@@ -0,0 +1,117 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0002_initial'),
+        ('catalog', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibraryStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, unique=True)),
+                ('total_members', models.IntegerField(default=0)),
+                ('active_members', models.IntegerField(default=0)),
+                ('total_books', models.IntegerField(default=0)),
+                ('available_books', models.IntegerField(default=0)),
+                ('books_on_loan', models.IntegerField(default=0)),
+                ('new_members', models.IntegerField(default=0)),
+                ('new_loans', models.IntegerField(default=0)),
+                ('books_returned', models.IntegerField(default=0)),
+                ('overdue_books', models.IntegerField(default=0)),
+                ('fines_collected', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('new_books_added', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Library Statistics',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MemberActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_books_borrowed', models.IntegerField(default=0)),
+                ('total_books_returned', models.IntegerField(default=0)),
+                ('total_overdue', models.IntegerField(default=0)),
+                ('total_fines_paid', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('total_reviews_written', models.IntegerField(default=0)),
+                ('favorite_genres', models.CharField(blank=True, max_length=300)),
+                ('reading_streak_days', models.IntegerField(default=0)),
+                ('last_activity', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='accounts.memberprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('search_query', models.CharField(max_length=300)),
+                ('results_count', models.IntegerField(default=0)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchQueryDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('normalized_query', models.CharField(max_length=300)),
+                ('search_count', models.IntegerField(default=0)),
+                ('zero_result_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Search Query Daily Totals',
+                'ordering': ['-date', '-search_count'],
+                'indexes': [models.Index(fields=['date', '-search_count'], name='analytics_s_date_c14fc7_idx')],
+                'unique_together': {('date', 'normalized_query')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BookPopularity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_loans', models.IntegerField(db_index=True, default=0)),
+                ('total_reservations', models.IntegerField(default=0)),
+                ('total_reviews', models.IntegerField(default=0)),
+                ('average_rating', models.DecimalField(db_index=True, decimal_places=2, default=0.0, max_digits=3)),
+                ('views_count', models.IntegerField(default=0)),
+                ('last_borrowed', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('popularity_score', models.FloatField(db_index=True, default=0.0)),
+                ('trending_rank', models.IntegerField(blank=True, db_index=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='popularity', to='catalog.book')),
+            ],
+            options={
+                'verbose_name_plural': 'Book Popularities',
+                'ordering': ['-popularity_score'],
+                'indexes': [models.Index(fields=['-popularity_score', 'trending_rank'], name='analytics_b_popular_018518_idx'), models.Index(fields=['total_loans', '-average_rating'], name='analytics_b_total_l_7cafb4_idx')],
+            },
+        ),
+    ]
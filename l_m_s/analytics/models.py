@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.auth.models import User
 
 class BookPopularity(models.Model):
     book = models.OneToOneField('catalog.Book', on_delete=models.CASCADE, related_name='popularity')
@@ -85,3 +86,28 @@ class SearchLog(models.Model):
         
     def __str__(self):
         return f"{self.search_query} - {self.timestamp}"
+
+class SearchQueryDaily(models.Model):
+    date = models.DateField(db_index=True)
+    normalized_query = models.CharField(max_length=300)
+    search_count = models.IntegerField(default=0)
+    zero_result_count = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-date', '-search_count']
+        unique_together = ['date', 'normalized_query']
+        verbose_name_plural = 'Search Query Daily Totals'
+        indexes = [
+            models.Index(fields=['date', '-search_count']),
+        ]
+        
+    def __str__(self):
+        return f"{self.normalized_query} on {self.date}: {self.search_count}"
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} up to {self.last_id}"
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import SearchLog, SearchQueryDaily, RollupWatermark
+
+SEARCH_WATERMARK = 'search_queries'
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())[:300]
+
+def fold_search_logs(rows):
+    """Sum ``(timestamp, search_query, results_count)`` rows per day and query."""
+    totals = {}
+    for timestamp, search_query, results_count in rows:
+        query = normalize_query(search_query)
+        if not query:
+            continue
+        key = (timezone.localdate(timestamp), query)
+        count, zero = totals.get(key, (0, 0))
+        totals[key] = (count + 1, zero + (results_count == 0))
+    return totals
+
+def apply_search_totals(totals):
+    existing = SearchQueryDaily.objects.filter(
+        date__in={date for date, query in totals},
+        normalized_query__in={query for date, query in totals},
+    )
+    existing = {(row.date, row.normalized_query): row for row in existing}
+    
+    changed, created = [], []
+    for (date, query), (count, zero) in totals.items():
+        row = existing.get((date, query))
+        if row is None:
+            created.append(SearchQueryDaily(
+                date=date, normalized_query=query, search_count=count, zero_result_count=zero
+            ))
+        else:
+            row.search_count += count
+            row.zero_result_count += zero
+            changed.append(row)
+    
+    SearchQueryDaily.objects.bulk_update(changed, ['search_count', 'zero_result_count'], batch_size=500)
+    SearchQueryDaily.objects.bulk_create(created, batch_size=500)
+
+def rollup_search_logs(batch_size=5000):
+    """
+    Fold SearchLog rows added since the last run into SearchQueryDaily.
+    
+    Progress is kept as the highest folded SearchLog id. Rows younger than
+    ``ANALYTICS_ROLLUP_SETTLE_SECONDS`` are left for the next run, so a
+    buffer flush that commits late cannot slip in below the watermark.
+    Returns the number of log rows folded.
+    """
+    settle = getattr(settings, 'ANALYTICS_ROLLUP_SETTLE_SECONDS', 60)
+    cutoff = timezone.now() - timedelta(seconds=settle)
+    
+    with transaction.atomic():
+        watermark, created = RollupWatermark.objects.select_for_update().get_or_create(
+            name=SEARCH_WATERMARK
+        )
+        upper = SearchLog.objects.filter(
+            pk__gt=watermark.last_id, timestamp__lt=cutoff
+        ).aggregate(upper=Max('pk'))['upper']
+        if upper is None:
+            return 0
+        
+        logs = SearchLog.objects.filter(pk__gt=watermark.last_id, pk__lte=upper).order_by('pk')
+        folded = 0
+        last_id = watermark.last_id
+        while last_id < upper:
+            rows = list(logs.filter(pk__gt=last_id).values_list(
+                'pk', 'timestamp', 'search_query', 'results_count'
+            )[:batch_size])
+            if not rows:
+                break
+            apply_search_totals(fold_search_logs(row[1:] for row in rows))
+            folded += len(rows)
+            last_id = rows[-1][0]
+        
+        watermark.last_id = upper
+        watermark.save(update_fields=['last_id', 'updated_at'])
+    
+    return folded
@@ -0,0 +1,101 @@
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import DatabaseError, connection
+from .models import SearchLog
+
+logger = logging.getLogger(__name__)
+
+class SearchLogBuffer:
+    """
+    Collects search events in memory and writes them with ``bulk_create``.
+
+    The buffer is written once it holds ``max_size`` events or ``max_age``
+    seconds after the last flush, whichever comes first: at the end of a
+    request once the response has gone out, or by a background thread
+    while the process is idle. Requests never wait on the insert. An
+    ``atexit`` hook makes a last attempt at shutdown; a hard crash loses at
+    most one buffer.
+    """
+
+    def __init__(self, max_size=None, max_age=None):
+        self.max_size = max_size or getattr(settings, 'ANALYTICS_SEARCH_LOG_BATCH_SIZE', 100)
+        self.max_age = max_age or getattr(settings, 'ANALYTICS_SEARCH_LOG_FLUSH_INTERVAL', 5)
+        self.pending = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.worker = None
+        self.flushed_at = time.monotonic()
+
+    def record(self, user, search_query, results_count, ip_address=None):
+        entry = SearchLog(
+            user_id=getattr(user, 'pk', None),
+            search_query=search_query[:300],
+            results_count=results_count,
+            ip_address=ip_address,
+        )
+        with self.lock:
+            self.pending.append(entry)
+            full = len(self.pending) >= self.max_size
+            if self.worker is None or not self.worker.is_alive():
+                self.start()
+        if full:
+            self.wakeup.set()
+
+    def start(self):
+        if self.worker is None:
+            atexit.register(self.close)
+        self.worker = threading.Thread(target=self.run, name='search-log-writer', daemon=True)
+        self.worker.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.max_age)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not write buffered search log entries')
+            finally:
+                connection.close()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows."""
+        with self.lock:
+            entries, self.pending = self.pending, []
+            self.flushed_at = time.monotonic()
+        if entries:
+            SearchLog.objects.bulk_create(entries, batch_size=500)
+        return len(entries)
+
+    def is_due(self):
+        return bool(self.pending) and (
+            len(self.pending) >= self.max_size or time.monotonic() - self.flushed_at >= self.max_age
+        )
+
+    def flush_if_due(self):
+        """Flush when the buffer is full or ``max_age`` seconds old; returns the number of rows."""
+        if not self.is_due():
+            return 0
+        try:
+            return self.flush()
+        except Exception:
+            logger.exception('Could not write buffered search log entries')
+            return 0
+
+    def close(self):
+        """Last flush at exit; the database may already be gone by then."""
+        try:
+            self.flush()
+        except DatabaseError as e:
+            logger.debug('Dropped buffered search log entries at exit: %s', e)
+
+    def __len__(self):
+        return len(self.pending)
+
+search_log_buffer = SearchLogBuffer()
+
+def log_search(user, search_query, results_count, ip_address=None):
+    search_log_buffer.record(user, search_query, results_count, ip_address)
@@ -0,0 +1,7 @@
+from django.core.signals import request_finished
+from django.dispatch import receiver
+from analytics.search_log import search_log_buffer
+
+@receiver(request_finished)
+def flush_search_log(sender, **kwargs):
+    search_log_buffer.flush_if_due()
@@ -1,3 +1,100 @@
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.core.signals import request_finished
+from django.db import OperationalError
+from datetime import timedelta
+from unittest import mock
+from .models import SearchLog, SearchQueryDaily, RollupWatermark
+from .search_log import SearchLogBuffer
+from .rollups import rollup_search_logs
 
-# Create your tests here.
+class SearchLogBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.buffer = SearchLogBuffer(max_size=10, max_age=60)
+        self.buffer.start = lambda: None
+    
+    def test_record_does_not_touch_database(self):
+        with self.assertNumQueries(0):
+            self.buffer.record(self.user, 'dune', 3, '127.0.0.1')
+        self.assertEqual(len(self.buffer), 1)
+        self.assertFalse(SearchLog.objects.exists())
+    
+    def test_flush_writes_one_batch(self):
+        for i in range(5):
+            self.buffer.record(self.user, f'query {i}', i)
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 5)
+        
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(SearchLog.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(SearchLog.objects.get(search_query='query 4').results_count, 4)
+    
+    def test_full_buffer_wakes_writer(self):
+        for i in range(9):
+            self.buffer.record(self.user, 'dune', 1)
+        self.assertFalse(self.buffer.wakeup.is_set())
+        
+        self.buffer.record(self.user, 'dune', 1)
+        self.assertTrue(self.buffer.wakeup.is_set())
+    
+    def test_request_finished_flushes_when_due(self):
+        self.buffer.record(self.user, 'dune', 1)
+        with mock.patch('analytics.signals.search_log_buffer', self.buffer):
+            request_finished.send(sender=None)
+            self.assertEqual(len(self.buffer), 1)
+            
+            self.buffer.flushed_at -= 60
+            request_finished.send(sender=None)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertTrue(SearchLog.objects.exists())
+    
+    def test_close_is_quiet_without_table(self):
+        self.buffer.record(self.user, 'dune', 1)
+        with mock.patch.object(SearchLog.objects, 'bulk_create', side_effect=OperationalError('no such table')):
+            self.buffer.close()
+    
+    def test_anonymous_search(self):
+        self.buffer.record(None, 'dune', 0)
+        self.buffer.flush()
+        self.assertIsNone(SearchLog.objects.get().user)
+
+class SearchRollupTests(TestCase):
+    def setUp(self):
+        self.past = timezone.now() - timedelta(hours=1)
+    
+    def log(self, query, results_count):
+        entry = SearchLog.objects.create(search_query=query, results_count=results_count)
+        SearchLog.objects.filter(pk=entry.pk).update(timestamp=self.past)
+        return entry
+    
+    def totals(self):
+        return {
+            row.normalized_query: (row.search_count, row.zero_result_count)
+            for row in SearchQueryDaily.objects.all()
+        }
+    
+    def test_folds_normalized_queries(self):
+        self.log('Dune', 4)
+        self.log('  dune ', 4)
+        self.log('Dnue', 0)
+        
+        self.assertEqual(rollup_search_logs(), 3)
+        self.assertEqual(self.totals(), {'dune': (2, 0), 'dnue': (1, 1)})
+    
+    def test_incremental_since_watermark(self):
+        self.log('dune', 4)
+        rollup_search_logs()
+        
+        self.log('dune', 0)
+        self.assertEqual(rollup_search_logs(batch_size=1), 1)
+        self.assertEqual(rollup_search_logs(), 0)
+        self.assertEqual(self.totals(), {'dune': (2, 1)})
+    
+    def test_recent_rows_wait_for_next_run(self):
+        SearchLog.objects.create(search_query='dune', results_count=1)
+        self.assertEqual(rollup_search_logs(), 0)
+        self.assertEqual(RollupWatermark.objects.count(), 1)
+        self.assertEqual(RollupWatermark.objects.get().last_id, 0)
@@ -6,5 +6,6 @@ urlpatterns = [
     path('popular-books/', views.popular_books_report, name='popular_books'),
     path('members/', views.member_analytics, name='member_analytics'),
     path('statistics/', views.statistics_report, name='statistics_report'),
+    path('searches/', views.search_report, name='search_report'),
     path('my-stats/', views.my_reading_stats, name='my_reading_stats'),
 ]
@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.db.models import Count, Sum, Avg, Q
 from django.utils import timezone
 from datetime import timedelta
-from .models import BookPopularity, MemberActivity, LibraryStatistics
+from .models import BookPopularity, MemberActivity, LibraryStatistics, SearchQueryDaily
 from catalog.models import Book
 from circulation.models import Loan, Fine
 from accounts.models import MemberProfile
@@ -87,6 +87,30 @@ def statistics_report(request):
         'statistics': stats
     })
 
+@login_required
+@user_passes_test(is_librarian)
+def search_report(request):
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 365)
+    except ValueError:
+        days = 30
+    
+    totals = SearchQueryDaily.objects.filter(
+        date__gt=timezone.now().date() - timedelta(days=days)
+    ).values('normalized_query').annotate(
+        searches=Sum('search_count'),
+        zero_results=Sum('zero_result_count')
+    )
+    
+    context = {
+        'days': days,
+        'top_queries': totals.order_by('-searches', 'normalized_query')[:50],
+        'zero_result_queries': totals.filter(
+            zero_results__gt=0
+        ).order_by('-zero_results', 'normalized_query')[:50],
+    }
+    return render(request, 'analytics/search_report.html', context)
+
 @login_required
 def my_reading_stats(request):
     profile = MemberProfile.objects.get(user=request.user)
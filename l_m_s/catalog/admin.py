@@ -20,12 +20,17 @@ class PublisherAdmin(admin.ModelAdmin):
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
-    list_display = ['title', 'isbn', 'publisher', 'publication_date', 'language', 'average_rating']
+    list_display = ['title', 'isbn', 'publisher', 'publication_date', 'language', 'average_rating', 'available_copies', 'total_copies']
     list_filter = ['language', 'publication_date', 'genres']
-    search_fields = ['title', 'isbn', 'authors__first_name', 'authors__last_name']
+    search_fields = ['title', 'isbn', 'isbn13', 'authors__first_name', 'authors__last_name']
     filter_horizontal = ['authors', 'genres']
     date_hierarchy = 'publication_date'
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = [
+        'isbn13', 'total_copies', 'available_copies', 'on_loan_copies',
+        'average_rating', 'total_ratings', 'rating_sum',
+        'ratings_1', 'ratings_2', 'ratings_3', 'ratings_4', 'ratings_5',
+        'created_at', 'updated_at',
+    ]
 
 @admin.register(BookInstance)
 class BookInstanceAdmin(admin.ModelAdmin):
@@ -40,7 +45,7 @@ class ReviewAdmin(admin.ModelAdmin):
     list_filter = ['rating', 'created_at']
     search_fields = ['book__title', 'user__username', 'title']
     date_hierarchy = 'created_at'
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['helpful_count', 'created_at', 'updated_at']
 
 @admin.register(ReadingList)
 class ReadingListAdmin(admin.ModelAdmin):
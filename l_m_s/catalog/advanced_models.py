@@ -1,5 +1,12 @@
+import math
+import uuid
+import zlib
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
 from django.core.validators import FileExtensionValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Count, Max
+from django.utils import timezone
 from catalog.models import Book
 from accounts.models import MemberProfile
 
@@ -18,6 +25,35 @@ class BookRecommendation(models.Model):
     def __str__(self):
         return f"{self.book.title} for {self.member.user.username}"
 
+class RecommendationState(models.Model):
+    member = models.OneToOneField(MemberProfile, on_delete=models.CASCADE, related_name='recommendation_state')
+    is_stale = models.BooleanField(default=True, db_index=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.member.user.username} ({'stale' if self.is_stale else 'fresh'})"
+
+class BookNeighbor(models.Model):
+    KIND_CHOICES = [
+        ('LOAN', 'Borrowed Together'),
+        ('CONTENT', 'Similar Content'),
+    ]
+    
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='LOAN')
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['-score']
+        unique_together = ['book', 'neighbor', 'kind']
+        indexes = [
+            models.Index(fields=['kind', 'book', '-score']),
+        ]
+    
+    def __str__(self):
+        return f"{self.book.title} -> {self.neighbor.title} ({self.score:.3f})"
+
 class ReadingChallenge(models.Model):
     CHALLENGE_TYPES = [
         ('BOOKS_COUNT', 'Number of Books'),
@@ -52,7 +88,24 @@ class ChallengeParticipation(models.Model):
     def __str__(self):
         return f"{self.member.user.username} - {self.challenge.name}"
 
+# Scores count seconds from here rather than from 1970 to keep them small.
+HOT_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc).timestamp()
+
+def discussion_hot_score(comments_count, last_activity):
+    """
+    Rank by volume and recency: every tenfold increase in comments is worth
+    ``DISCUSSION_HOT_SECONDS`` of recency.
+    
+    The score only grows while a discussion is active, so it never has to
+    be decayed in the database and an index on it stays ordered.
+    """
+    scale = getattr(settings, 'DISCUSSION_HOT_SECONDS', 45000)
+    return round(math.log10(max(comments_count, 1)) + (last_activity.timestamp() - HOT_EPOCH) / scale, 7)
+
 class BookDiscussion(models.Model):
+    # Maintained by comment saves and deletes; excluded from ordinary saves.
+    ACTIVITY_FIELDS = ('comments_count', 'last_comment_at', 'hot_score')
+    
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='discussions')
     title = models.CharField(max_length=300)
     description = models.TextField()
@@ -60,27 +113,194 @@ class BookDiscussion(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     scheduled_date = models.DateTimeField(null=True, blank=True)
+    comments_count = models.IntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
+    hot_score = models.FloatField(default=0.0, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_active', '-hot_score', '-id']),
+            models.Index(fields=['is_active', '-last_comment_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.book.title}"
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.hot_score = discussion_hot_score(0, self.created_at or timezone.now())
+        elif kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.ACTIVITY_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def record_activity(cls, discussion_id, delta, at=None):
+        """
+        Move ``comments_count`` by ``delta`` with F() and rescore.
+        
+        ``at`` is the new comment's time; deletes pass ``None`` and keep the
+        last activity time. The count update locks the row, so the rescoring
+        read in the same transaction cannot interleave with another comment.
+        """
+        changes = {'comments_count': F('comments_count') + delta}
+        if at is not None:
+            changes['last_comment_at'] = at
+        
+        with transaction.atomic():
+            if not cls.objects.filter(pk=discussion_id).update(**changes):
+                return
+            count, last_comment_at, created_at = cls.objects.values_list(
+                'comments_count', 'last_comment_at', 'created_at'
+            ).get(pk=discussion_id)
+            cls.objects.filter(pk=discussion_id).update(
+                hot_score=discussion_hot_score(count, last_comment_at or created_at)
+            )
+    
+    @classmethod
+    def recount_activity(cls, discussion_ids=None):
+        """Recompute the activity fields from DiscussionComment."""
+        discussions = cls.objects.annotate(
+            counted=Count('comments'), latest=Max('comments__created_at')
+        ).only('pk', 'created_at')
+        if discussion_ids is not None:
+            discussions = discussions.filter(pk__in=discussion_ids)
+        
+        rows = []
+        for discussion in discussions.iterator(chunk_size=2000):
+            discussion.comments_count = discussion.counted
+            discussion.last_comment_at = discussion.latest
+            discussion.hot_score = discussion_hot_score(discussion.counted, discussion.latest or discussion.created_at)
+            rows.append(discussion)
+        cls.objects.bulk_update(rows, list(cls.ACTIVITY_FIELDS), batch_size=1000)
+        return len(rows)
 
 class DiscussionComment(models.Model):
+    # A comment's path is its ancestors' ids followed by its own, each
+    # zero-padded to PATH_STEP digits, so ordering by path walks a thread
+    # depth first and a subtree is one prefix range.
+    PATH_STEP = 10
+    
     discussion = models.ForeignKey(BookDiscussion, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     content = models.TextField()
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    replies_count = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     likes_count = models.IntegerField(default=0)
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['discussion', 'path']),
+            models.Index(fields=['discussion', 'depth', 'path']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} on {self.discussion.title}"
+    
+    @classmethod
+    def path_segment(cls, pk):
+        return f'{pk:0{cls.PATH_STEP}d}'
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            # Tree fields and likes_count are only changed by dedicated
+            # updates; never write back stale in-memory values over them.
+            if kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+                kwargs['update_fields'] = [
+                    f.name for f in self._meta.concrete_fields
+                    if not f.primary_key and f.name not in ('parent', 'path', 'depth', 'replies_count', 'likes_count')
+                ]
+            return super().save(*args, **kwargs)
+        
+        parent = None
+        if self.parent_id:
+            parent = DiscussionComment.objects.only('pk', 'path', 'depth', 'parent_id').get(pk=self.parent_id)
+            # Replies below the deepest level attach to the deepest ancestor.
+            # Roots always take replies, so the walk stops at a root.
+            max_depth = max(getattr(settings, 'DISCUSSION_MAX_DEPTH', 20), 2)
+            while parent.depth >= max_depth - 1:
+                parent = DiscussionComment.objects.only('pk', 'path', 'depth', 'parent_id').get(pk=parent.parent_id)
+            self.parent_id = parent.pk
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.path = (parent.path if parent else '') + self.path_segment(self.pk)
+            self.depth = parent.depth + 1 if parent else 0
+            DiscussionComment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+            if parent:
+                DiscussionComment.objects.filter(pk=parent.pk).update(replies_count=F('replies_count') + 1)
+            BookDiscussion.record_activity(self.discussion_id, 1, self.created_at)
+    
+    def add_like(self, user):
+        """Count ``user``'s like once; returns False if they already liked it."""
+        try:
+            with transaction.atomic():
+                CommentLike.objects.create(comment=self, user=user)
+                DiscussionComment.objects.filter(pk=self.pk).update(likes_count=F('likes_count') + 1)
+        except IntegrityError:
+            return False
+        return True
+    
+    def remove_like(self, user):
+        with transaction.atomic():
+            deleted, _ = CommentLike.objects.filter(comment=self, user=user).delete()
+            if deleted:
+                DiscussionComment.objects.filter(pk=self.pk).update(likes_count=F('likes_count') - 1)
+        return bool(deleted)
+    
+    def subtree(self, depth=None):
+        """Descendants of this comment in thread order, at most ``depth`` levels down."""
+        comments = DiscussionComment.objects.filter(
+            discussion_id=self.discussion_id,
+            path__startswith=self.path,
+        ).exclude(pk=self.pk)
+        if depth is not None:
+            comments = comments.filter(depth__lte=self.depth + depth)
+        return comments.order_by('path')
+    
+    @classmethod
+    def rebuild_paths(cls, discussion_ids=None):
+        """Recompute path, depth and replies_count, e.g. for comments written before paths existed."""
+        comments = cls.objects.order_by('pk')
+        if discussion_ids is not None:
+            comments = comments.filter(discussion_id__in=discussion_ids)
+        
+        # A parent is always saved before its replies, so walking in pk
+        # order meets every parent first.
+        paths, depths, replies = {}, {}, {}
+        for pk, parent_id in comments.values_list('pk', 'parent_id').iterator(chunk_size=5000):
+            if parent_id in paths:
+                paths[pk] = paths[parent_id] + cls.path_segment(pk)
+                depths[pk] = depths[parent_id] + 1
+                replies[parent_id] = replies.get(parent_id, 0) + 1
+            else:
+                paths[pk], depths[pk] = cls.path_segment(pk), 0
+        
+        rows = [
+            cls(pk=pk, path=paths[pk], depth=depths[pk], replies_count=replies.get(pk, 0))
+            for pk in paths
+        ]
+        cls.objects.bulk_update(rows, ['path', 'depth', 'replies_count'], batch_size=1000)
+        return len(rows)
+
+class CommentLike(models.Model):
+    comment = models.ForeignKey(DiscussionComment, on_delete=models.CASCADE, related_name='likes')
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['comment', 'user']
+    
+    def __str__(self):
+        return f"{self.user.username} likes comment {self.comment_id}"
 
 class EBookFile(models.Model):
     FORMAT_CHOICES = [
@@ -96,7 +316,15 @@ class EBookFile(models.Model):
         validators=[FileExtensionValidator(['pdf', 'epub', 'mobi', 'txt'])]
     )
     format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
-    file_size = models.BigIntegerField()
+    file_size = models.BigIntegerField(blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+    TEXT_STATUS_CHOICES = [
+        ('PENDING', 'Waiting for Indexing'),
+        ('INDEXED', 'Indexed'),
+        ('UNSUPPORTED', 'Format Not Searchable'),
+        ('FAILED', 'Extraction Failed'),
+    ]
+    text_status = models.CharField(max_length=12, choices=TEXT_STATUS_CHOICES, default='PENDING', db_index=True, editable=False)
     is_active = models.BooleanField(default=True)
     downloads_count = models.IntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -106,6 +334,97 @@ class EBookFile(models.Model):
     
     def __str__(self):
         return f"{self.book.title} - {self.format}"
+    
+    def save(self, *args, **kwargs):
+        # A freshly attached file is stored once under its SHA-256, however
+        # many editions or formats point at it.
+        # downloads_count is only changed by F() updates and text_status by
+        # the text indexer, unless a new file is attached here.
+        protected = {'downloads_count', 'text_status'}
+        if self.file and not self.file._committed:
+            from catalog.uploads import store_content
+            name, self.sha256, self.file_size = store_content(self.file, self.file.name)
+            self.file.name = name
+            self.file._committed = True
+            self.text_status = 'PENDING'
+            # Downloads send uploaded_at as Last-Modified.
+            self.uploaded_at = timezone.now()
+            protected.discard('text_status')
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {
+                    'file', 'sha256', 'file_size', 'text_status', 'uploaded_at'
+                }
+        
+        if kwargs.get('update_fields') is None and not self._state.adding and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in protected
+            ]
+        super().save(*args, **kwargs)
+    
+    @property
+    def etag(self):
+        # The storage name changes whenever a new file is uploaded.
+        return f'"{self.pk}-{self.file_size:x}-{zlib.crc32(self.file.name.encode()):08x}"'
+    
+    def record_download(self, user, ip_address):
+        EBookDownload.objects.create(ebook=self, user=user, ip_address=ip_address)
+        EBookFile.objects.filter(pk=self.pk).update(downloads_count=F('downloads_count') + 1)
+
+class EBookPassage(models.Model):
+    """A page or chapter of extracted e-book text, indexed for content search."""
+    
+    ebook = models.ForeignKey(EBookFile, on_delete=models.CASCADE, related_name='passages')
+    position = models.IntegerField()
+    label = models.CharField(max_length=200)
+    content = models.TextField()
+    
+    class Meta:
+        ordering = ['ebook', 'position']
+        indexes = [
+            models.Index(fields=['ebook', 'position']),
+        ]
+    
+    def __str__(self):
+        return f"{self.ebook} - {self.label}"
+
+class EBookUpload(models.Model):
+    """A chunked upload in progress; the bytes live in the local chunk store."""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='ebook_uploads')
+    format = models.CharField(max_length=10, choices=EBookFile.FORMAT_CHOICES)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    ebook = models.ForeignKey(EBookFile, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    created_by = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size})"
+    
+    @property
+    def is_complete(self):
+        return self.ebook_id is not None
+
+class ImageDerivative(models.Model):
+    """A resized copy of an uploaded image, keyed by the source's storage name."""
+    
+    source = models.CharField(max_length=255, db_index=True)
+    size = models.CharField(max_length=20)
+    format = models.CharField(max_length=10)
+    name = models.CharField(max_length=255)
+    width = models.IntegerField()
+    height = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['source', 'size', 'format']
+    
+    def __str__(self):
+        return f"{self.source} {self.size} {self.format}"
 
 class EBookDownload(models.Model):
     ebook = models.ForeignKey(EBookFile, on_delete=models.CASCADE)
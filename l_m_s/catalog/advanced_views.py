@@ -1,22 +1,40 @@
+from django.conf import settings
+from django.http import Http404, HttpResponseBadRequest
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q
+from django.db.models import Count, F, Q
 from catalog.advanced_models import (
     BookRecommendation, ReadingChallenge, ChallengeParticipation,
     BookDiscussion, DiscussionComment, EBookFile
 )
 from catalog.models import Book
+from catalog.ebook_text import search_ebook_text
+from catalog.downloads import file_download_response, parse_range
+from catalog.pagination import InvalidCursor
+from catalog.utils import get_thread_page
+from catalog.vector_store import get_store
 from accounts.models import MemberProfile
 
 @login_required
 def recommendations(request):
     profile = get_object_or_404(MemberProfile, user=request.user)
-    recommendations = BookRecommendation.objects.filter(
+    recommendations = list(BookRecommendation.objects.filter(
         member=profile
-    ).select_related('book')[:20]
+    ).select_related('book')[:20])
+    
+    # Members without loan history fall back to the most popular books in
+    # the shared vector store.
+    popular_books = []
+    store = get_store()
+    if not recommendations and store is not None:
+        popular_books = [
+            {'id': book_id, 'title': store.title(book_id)}
+            for book_id in store.popular(20)
+        ]
     
     return render(request, 'catalog/recommendations.html', {
-        'recommendations': recommendations
+        'recommendations': recommendations,
+        'popular_books': popular_books,
     })
 
 @login_required
@@ -49,16 +67,27 @@ def join_challenge(request, challenge_id):
     
     return redirect('reading_challenges')
 
+DISCUSSION_ORDERINGS = {
+    'hot': ('-hot_score', '-id'),
+    'active': (F('last_comment_at').desc(nulls_last=True), '-id'),
+    'newest': ('-created_at', '-id'),
+}
+
 @login_required
 def book_discussions(request):
+    sort = request.GET.get('sort', 'hot')
+    if sort not in DISCUSSION_ORDERINGS:
+        sort = 'hot'
+    
+    # comments_count and the sort keys are kept on BookDiscussion, so this
+    # is an ordered scan of the matching index.
     discussions = BookDiscussion.objects.filter(
         is_active=True
-    ).select_related('book', 'created_by').annotate(
-        comments_count=Count('comments')
-    )
+    ).select_related('book', 'created_by').order_by(*DISCUSSION_ORDERINGS[sort])
     
     return render(request, 'catalog/discussions.html', {
-        'discussions': discussions
+        'discussions': discussions,
+        'sort': sort,
     })
 
 @login_required
@@ -68,14 +97,11 @@ def discussion_detail(request, discussion_id):
         id=discussion_id
     )
     
-    comments = DiscussionComment.objects.filter(
-        discussion=discussion,
-        parent__isnull=True
-    ).select_related('user').prefetch_related('replies')
-    
     if request.method == 'POST':
         content = request.POST.get('content')
         parent_id = request.POST.get('parent_id')
+        if parent_id and not DiscussionComment.objects.filter(pk=parent_id, discussion=discussion).exists():
+            raise Http404("No such comment in this discussion")
         
         comment = DiscussionComment.objects.create(
             discussion=discussion,
@@ -85,9 +111,21 @@ def discussion_detail(request, discussion_id):
         )
         return redirect('discussion_detail', discussion_id=discussion_id)
     
+    try:
+        comments, next_cursor, previous_cursor = get_thread_page(
+            discussion.pk,
+            request.GET.get('cursor') or None,
+            getattr(settings, 'DISCUSSION_THREADS_PER_PAGE', 20),
+            getattr(settings, 'DISCUSSION_TREE_DEPTH', 3),
+        )
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid page cursor")
+    
     return render(request, 'catalog/discussion_detail.html', {
         'discussion': discussion,
-        'comments': comments
+        'comments': comments,
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
     })
 
 @login_required
@@ -108,24 +146,28 @@ def ebooks_library(request):
     if format_filter:
         ebooks = ebooks.filter(format=format_filter)
     
+    # Matches inside the files themselves, with page or chapter snippets.
+    text_query = request.GET.get('text', '').strip()
+    text_results = search_ebook_text(text_query) if text_query else []
+    if format_filter:
+        text_results = [result for result in text_results if result['ebook'].format == format_filter]
+    
     return render(request, 'catalog/ebooks.html', {
-        'ebooks': ebooks
+        'ebooks': ebooks,
+        'text_query': text_query,
+        'text_results': text_results,
     })
 
 @login_required
 def download_ebook(request, ebook_id):
-    from catalog.advanced_models import EBookDownload
-    from django.http import FileResponse
-    
     ebook = get_object_or_404(EBookFile, id=ebook_id, is_active=True)
     
-    EBookDownload.objects.create(
-        ebook=ebook,
-        user=request.user,
-        ip_address=request.META.get('REMOTE_ADDR')
-    )
-    
-    ebook.downloads_count += 1
-    ebook.save()
+    # Resumed transfers ask for a later range; count only the request that
+    # starts at the first byte.
+    byte_range = parse_range(request.headers.get('Range'), ebook.file_size)
+    if byte_range is None or (byte_range and byte_range[0] == 0):
+        ebook.record_download(request.user, request.META.get('REMOTE_ADDR'))
     
-    return FileResponse(ebook.file, as_attachment=True)
+    return file_download_response(
+        request, ebook.file, etag=ebook.etag, last_modified=ebook.uploaded_at.timestamp()
+    )
@@ -1,23 +1,75 @@
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
 import json
-from catalog.models import Book, BookInstance
+from catalog.models import Book, BookInstance, Review
+from catalog.advanced_models import DiscussionComment, EBookUpload
+from catalog.uploads import UploadOffsetMismatch, append_chunk
+from catalog.ebook_text import search_ebook_text
+from catalog.search import search_books
+from catalog.validators import normalize_isbn
+from catalog.decorators import require_api_key, paginate_queryset
+from catalog.pagination import BOOK_ORDERINGS, REVIEW_ORDERINGS, InvalidCursor
+from catalog.utils import get_availability_counts, get_review_page, build_comment_tree, comment_data
+from catalog.cache import get_book_summary
+from catalog.similarity import similar_books
+from catalog.vector_store import get_store
+from catalog import autocomplete
 from circulation.models import Loan
 from accounts.models import MemberProfile
 
+def book_summary(book):
+    return {
+        'id': book.id,
+        'title': book.title,
+        'isbn': book.isbn,
+        'language': book.language,
+        'pages': book.pages,
+        'average_rating': float(book.average_rating),
+    }
+
 @require_http_methods(["GET"])
 def api_books_list(request):
     search = request.GET.get('search', '')
     page = int(request.GET.get('page', 1))
     per_page = int(request.GET.get('per_page', 20))
+    sort = request.GET.get('sort', 'relevance' if search else 'title')
+    
+    if sort not in BOOK_ORDERINGS or (sort == 'relevance' and not search):
+        sort = 'title'
     
     books = Book.objects.all()
     
     if search:
-        books = books.filter(title__icontains=search)
+        books = search_books(books, search)
+    
+    if 'cursor' in request.GET:
+        try:
+            page_data = paginate_queryset(
+                books, None, per_page,
+                cursor=request.GET['cursor'] or None,
+                ordering=sort,
+                estimate_total=request.GET.get('estimate') == '1'
+            )
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        
+        data = {
+            'next_cursor': page_data['next_cursor'],
+            'previous_cursor': page_data['previous_cursor'],
+            'results': [book_summary(book) for book in page_data['results']],
+        }
+        if 'count' in page_data:
+            data['count'] = page_data['count']
+            data['count_exact'] = page_data['count_exact']
+        return JsonResponse(data)
+    
+    order_field, descending = BOOK_ORDERINGS[sort]
+    prefix = '-' if descending else ''
+    books = books.order_by(f'{prefix}{order_field}', f'{prefix}pk')
     
     paginator = Paginator(books, per_page)
     page_obj = paginator.get_page(page)
@@ -26,40 +78,40 @@ def api_books_list(request):
         'count': paginator.count,
         'pages': paginator.num_pages,
         'current_page': page,
-        'results': [
-            {
-                'id': book.id,
-                'title': book.title,
-                'isbn': book.isbn,
-                'language': book.language,
-                'pages': book.pages,
-                'average_rating': float(book.average_rating),
-            }
-            for book in page_obj
-        ]
+        'results': [book_summary(book) for book in page_obj]
     }
     
     return JsonResponse(data)
 
 @require_http_methods(["GET"])
 def api_book_detail(request, book_id):
-    try:
-        book = Book.objects.get(id=book_id)
-        data = {
-            'id': book.id,
-            'title': book.title,
-            'subtitle': book.subtitle,
-            'isbn': book.isbn,
-            'language': book.language,
-            'pages': book.pages,
-            'description': book.description,
-            'average_rating': float(book.average_rating),
-            'total_ratings': book.total_ratings,
-            'available_copies': book.instances.filter(status='AVAILABLE').count(),
-        }
-        return JsonResponse(data)
-    except Book.DoesNotExist:
+    book = get_book_summary(book_id)
+    if book is None:
         return JsonResponse({'error': 'Book not found'}, status=404)
+    
+    data = {
+        'id': book['id'],
+        'title': book['title'],
+        'subtitle': book['subtitle'],
+        'isbn': book['isbn'],
+        'language': book['language'],
+        'pages': book['pages'],
+        'description': book['description'],
+        'publisher': book['publisher'],
+        'authors': [author['name'] for author in book['authors']],
+        'genres': [genre['name'] for genre in book['genres']],
+        'average_rating': book['average_rating'],
+        'total_ratings': book['total_ratings'],
+        'rating_histogram': book['rating_histogram'],
+        'total_copies': book['total_copies'],
+        'available_copies': book['available_copies'],
+        'availability_status': book['availability_status'],
+        'reviews': [
+            dict(review, created_at=review['created_at'].isoformat())
+            for review in book['reviews']
+        ],
+    }
+    return JsonResponse(data)
 
 @login_required
 @require_http_methods(["GET"])
@@ -92,18 +144,308 @@ def api_my_loans(request):
 @require_http_methods(["GET"])
 def api_book_availability(request, book_id):
     try:
-        book = Book.objects.get(id=book_id)
-        instances = book.instances.all()
+        book = Book.objects.only('id', 'title').get(id=book_id)
+        counts = get_availability_counts([book.id])[book.id]
         
         data = {
             'book_id': book.id,
             'book_title': book.title,
-            'total_copies': instances.count(),
-            'available_copies': instances.filter(status='AVAILABLE').count(),
-            'on_loan': instances.filter(status='ON_LOAN').count(),
-            'reserved': instances.filter(status='RESERVED').count(),
-            'maintenance': instances.filter(status='MAINTENANCE').count(),
+            'total_copies': counts['total_copies'],
+            'available_copies': counts['available_copies'],
+            'on_loan': counts['on_loan'],
+            'reserved': counts['reserved'],
+            'maintenance': counts['maintenance'],
         }
         return JsonResponse(data)
     except Book.DoesNotExist:
         return JsonResponse({'error': 'Book not found'}, status=404)
+
+AVAILABILITY_BATCH_MAX = 500
+
+@require_http_methods(["GET"])
+def api_books_availability(request):
+    try:
+        book_ids = list(dict.fromkeys(
+            int(book_id) for book_id in request.GET.get('ids', '').split(',') if book_id.strip()
+        ))
+    except ValueError:
+        return JsonResponse({'error': 'ids must be a comma-separated list of integers'}, status=400)
+    
+    if not book_ids:
+        return JsonResponse({'error': 'ids required'}, status=400)
+    if len(book_ids) > AVAILABILITY_BATCH_MAX:
+        return JsonResponse({'error': f'At most {AVAILABILITY_BATCH_MAX} ids per request'}, status=400)
+    
+    counts = get_availability_counts(book_ids)
+    
+    return JsonResponse({
+        'results': {str(book_id): counts[book_id] for book_id in book_ids}
+    })
+
+@require_http_methods(["GET"])
+def api_suggest(request):
+    query = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 8)), 20))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+    
+    return JsonResponse({
+        'query': query,
+        'suggestions': autocomplete.suggest(query, limit),
+    })
+
+@require_http_methods(["GET"])
+def api_similar_books(request, pk):
+    store = get_store()
+    if (store is None or pk not in store) and not Book.objects.filter(pk=pk).exists():
+        return JsonResponse({'error': 'Book not found'}, status=404)
+    
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+    
+    return JsonResponse({
+        'book_id': pk,
+        'results': similar_books(pk, limit),
+    })
+
+@require_http_methods(["GET"])
+def api_book_reviews(request, pk):
+    sort = request.GET.get('sort', 'helpful')
+    if sort not in REVIEW_ORDERINGS:
+        return JsonResponse({'error': f"sort must be one of {', '.join(REVIEW_ORDERINGS)}"}, status=400)
+    
+    try:
+        per_page = min(int(request.GET.get('per_page', 10)), 50)
+        reviews, next_cursor, previous_cursor = get_review_page(
+            pk, sort, request.GET.get('cursor') or None, per_page
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor or per_page'}, status=400)
+    
+    return JsonResponse({
+        'book_id': pk,
+        'results': [dict(review, created_at=review['created_at'].isoformat()) for review in reviews],
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
+    })
+
+@login_required
+@require_http_methods(["POST", "DELETE"])
+def api_review_vote(request, review_id):
+    try:
+        review = Review.objects.get(pk=review_id)
+    except Review.DoesNotExist:
+        return JsonResponse({'error': 'Review not found'}, status=404)
+    
+    if review.user_id == request.user.pk:
+        return JsonResponse({'error': 'You cannot vote for your own review'}, status=400)
+    
+    if request.method == 'POST':
+        changed = review.add_helpful_vote(request.user)
+    else:
+        changed = review.remove_helpful_vote(request.user)
+    
+    return JsonResponse({
+        'review_id': review.pk,
+        'voted': request.method == 'POST',
+        'changed': changed,
+        'helpful_count': Review.objects.values_list('helpful_count', flat=True).get(pk=review.pk),
+    })
+
+@login_required
+@require_http_methods(["GET"])
+def api_comment_replies(request, comment_id):
+    """Expand a comment's replies that the thread page left out."""
+    try:
+        comment = DiscussionComment.objects.get(pk=comment_id)
+    except DiscussionComment.DoesNotExist:
+        return JsonResponse({'error': 'Comment not found'}, status=404)
+    
+    try:
+        depth = min(int(request.GET.get('depth', getattr(settings, 'DISCUSSION_TREE_DEPTH', 3))), 20)
+    except ValueError:
+        return JsonResponse({'error': 'depth must be a number'}, status=400)
+    
+    replies = build_comment_tree(comment.subtree(max(depth, 1)).select_related('user'))
+    return JsonResponse({
+        'comment_id': comment.pk,
+        'replies_count': comment.replies_count,
+        'results': [comment_data(reply) for reply in replies],
+    })
+
+@login_required
+@require_http_methods(["POST", "DELETE"])
+def api_comment_like(request, comment_id):
+    try:
+        comment = DiscussionComment.objects.get(pk=comment_id)
+    except DiscussionComment.DoesNotExist:
+        return JsonResponse({'error': 'Comment not found'}, status=404)
+    
+    if request.method == 'POST':
+        changed = comment.add_like(request.user)
+    else:
+        changed = comment.remove_like(request.user)
+    
+    return JsonResponse({
+        'comment_id': comment.pk,
+        'liked': request.method == 'POST',
+        'changed': changed,
+        'likes_count': DiscussionComment.objects.values_list('likes_count', flat=True).get(pk=comment.pk),
+    })
+
+EBOOK_EXTENSIONS = {'PDF': '.pdf', 'EPUB': '.epub', 'MOBI': '.mobi', 'TXT': '.txt'}
+
+def upload_status(upload):
+    return {
+        'upload_id': str(upload.pk),
+        'offset': upload.received_bytes,
+        'size': upload.total_size,
+        'complete': upload.is_complete,
+        'ebook_id': upload.ebook_id,
+    }
+
+@login_required
+@require_http_methods(["POST"])
+def api_ebook_upload_start(request):
+    """Open a resumable upload; chunks follow with PUT at increasing offsets."""
+    if not hasattr(request.user, 'librarian_profile'):
+        return JsonResponse({'error': 'Librarian access required'}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        book = Book.objects.get(pk=data['book_id'])
+        size = int(data['size'])
+        ebook_format = data['format'].upper()
+        filename = str(data['filename'])[:255]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'error': 'book_id, format, filename and size are required'}, status=400)
+    except Book.DoesNotExist:
+        return JsonResponse({'error': 'Book not found'}, status=404)
+    
+    if ebook_format not in EBOOK_EXTENSIONS or not filename.lower().endswith(EBOOK_EXTENSIONS[ebook_format]):
+        return JsonResponse({'error': f"format must be one of {', '.join(EBOOK_EXTENSIONS)} and match the file extension"}, status=400)
+    if not 0 < size <= getattr(settings, 'EBOOK_UPLOAD_MAX_SIZE', 1024 ** 3):
+        return JsonResponse({'error': 'File is empty or too large'}, status=400)
+    
+    upload = EBookUpload.objects.create(
+        book=book, format=ebook_format, filename=filename, total_size=size, created_by=request.user
+    )
+    status = upload_status(upload)
+    status['chunk_size'] = getattr(settings, 'EBOOK_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+    return JsonResponse(status, status=201)
+
+@login_required
+@require_http_methods(["GET", "PUT"])
+def api_ebook_upload_chunk(request, upload_id):
+    """
+    GET reports how many bytes arrived, so a client can resume there.
+    PUT appends the raw request body at ``?offset=``; a wrong offset gets
+    409 with the offset to resume from.
+    """
+    try:
+        upload = EBookUpload.objects.get(pk=upload_id, created_by=request.user)
+    except EBookUpload.DoesNotExist:
+        return JsonResponse({'error': 'Upload not found'}, status=404)
+    
+    if request.method == 'GET':
+        return JsonResponse(upload_status(upload))
+    
+    try:
+        offset = int(request.GET['offset'])
+        length = int(request.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'offset and Content-Length are required'}, status=400)
+    if not 0 < length <= getattr(settings, 'EBOOK_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024):
+        return JsonResponse({'error': 'Chunk is empty or too large'}, status=400)
+    
+    try:
+        upload = append_chunk(upload.pk, offset, request, length)
+    except UploadOffsetMismatch as e:
+        return JsonResponse({'error': str(e), 'offset': e.offset}, status=409)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse(upload_status(upload))
+
+@login_required
+@require_http_methods(["GET"])
+def api_ebook_text_search(request):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'q is required'}, status=400)
+    
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 50)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+    
+    results = search_ebook_text(query, limit=limit)
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'ebook_id': result['ebook'].pk,
+                'book_id': result['ebook'].book_id,
+                'title': result['ebook'].book.title,
+                'format': result['ebook'].format,
+                'hits': [
+                    {'position': hit['position'], 'label': hit['label'], 'snippet': str(hit['snippet'])}
+                    for hit in result['hits']
+                ],
+            }
+            for result in results
+        ],
+    })
+
+ISBN_LOOKUP_MAX = 5000
+ISBN_LOOKUP_BATCH = 500
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_api_key
+def api_isbn_lookup(request):
+    try:
+        isbns = json.loads(request.body).get('isbns', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    
+    if not isinstance(isbns, list):
+        return JsonResponse({'error': 'isbns must be a list'}, status=400)
+    if len(isbns) > ISBN_LOOKUP_MAX:
+        return JsonResponse({'error': f'At most {ISBN_LOOKUP_MAX} ISBNs per request'}, status=400)
+    
+    normalized = {}
+    invalid = []
+    for isbn in isbns:
+        isbn13 = normalize_isbn(str(isbn))
+        if isbn13:
+            normalized.setdefault(isbn13, []).append(isbn)
+        else:
+            invalid.append(isbn)
+    
+    keys = list(normalized)
+    found = {}
+    for start in range(0, len(keys), ISBN_LOOKUP_BATCH):
+        books = Book.objects.filter(
+            isbn13__in=keys[start:start + ISBN_LOOKUP_BATCH]
+        ).values('id', 'title', 'isbn', 'isbn13', 'language', 'pages')
+        for book in books:
+            found[book['isbn13']] = book
+    
+    results = {}
+    not_found = []
+    for isbn13, originals in normalized.items():
+        for original in originals:
+            if isbn13 in found:
+                results[original] = found[isbn13]
+            else:
+                not_found.append(original)
+    
+    return JsonResponse({
+        'results': results,
+        'not_found': not_found,
+        'invalid': invalid,
+    })
@@ -0,0 +1,306 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Max, Q, Value
+from django.db.models.functions import Concat
+from catalog.fuzzy import normalize
+
+logger = logging.getLogger(__name__)
+
+class TrieNode:
+    __slots__ = ('children', 'entries', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = set()
+        self.top = []
+
+class PrefixIndex:
+    """
+    Prefix tree over suggestion keys.
+
+    Every node keeps the ``top_k`` best ``(weight, entry_id)`` pairs of its
+    subtree, so a lookup is a walk down the prefix with no scan of the
+    matching entries. Keys deeper than ``max_depth`` characters share their
+    ancestor node, which keeps long titles from growing the tree.
+    """
+
+    def __init__(self, top_k=10, max_depth=24):
+        self.top_k = top_k
+        self.max_depth = max_depth
+        self.root = TrieNode()
+        self.entries = {}
+        self.lock = threading.RLock()
+
+    def _path(self, key, create=False):
+        node = self.root
+        path = []
+        for char in key[:self.max_depth]:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return path
+                child = node.children[char] = TrieNode()
+            node = child
+            path.append(node)
+        return path
+
+    def _offer(self, node, weight, entry_id):
+        if len(node.top) >= self.top_k and weight <= node.top[-1][0]:
+            return
+        top = [item for item in node.top if item[1] != entry_id]
+        top.append((weight, entry_id))
+        top.sort(key=lambda item: item[0], reverse=True)
+        node.top = top[:self.top_k]
+
+    def _recompute(self, node):
+        candidates = {entry_id: self.entries[entry_id][1] for entry_id in node.entries}
+        for child in node.children.values():
+            for weight, entry_id in child.top:
+                candidates[entry_id] = weight
+        top = sorted(((w, e) for e, w in candidates.items()), key=lambda item: item[0], reverse=True)
+        node.top = top[:self.top_k]
+
+    def add(self, entry_id, keys, weight, payload):
+        with self.lock:
+            if entry_id in self.entries:
+                self.remove(entry_id)
+
+            keys = [key for key in {normalize(k) for k in keys} if key]
+            self.entries[entry_id] = (keys, weight, payload)
+            for key in keys:
+                path = self._path(key, create=True)
+                path[-1].entries.add(entry_id)
+                for node in path:
+                    self._offer(node, weight, entry_id)
+
+    def remove(self, entry_id):
+        with self.lock:
+            entry = self.entries.get(entry_id)
+            if entry is None:
+                return
+
+            paths = []
+            for key in entry[0]:
+                path = self._path(key)
+                if path:
+                    path[-1].entries.discard(entry_id)
+                paths.append(path)
+            del self.entries[entry_id]
+
+            for path in paths:
+                for node in reversed(path):
+                    if any(item[1] == entry_id for item in node.top):
+                        self._recompute(node)
+
+    def set_weight(self, entry_id, weight):
+        with self.lock:
+            entry = self.entries.get(entry_id)
+            if entry is not None and entry[1] != weight:
+                keys, old_weight, payload = entry
+                self.add(entry_id, keys, weight, payload)
+
+    def lookup(self, prefix, limit=10):
+        key = normalize(prefix)
+        if not key:
+            return []
+
+        path = self._path(key)
+        if len(path) < min(len(key), self.max_depth):
+            return []
+
+        results = []
+        for weight, entry_id in path[-1].top:
+            entry = self.entries.get(entry_id)
+            if entry is None:
+                continue
+            if len(key) > self.max_depth and not any(k.startswith(key) for k in entry[0]):
+                continue
+            results.append(dict(entry[2], score=weight))
+            if len(results) >= limit:
+                break
+        return results
+
+    def __len__(self):
+        return len(self.entries)
+
+def title_keys(text):
+    """The full text plus every word-suffix, so inner words match too."""
+    words = normalize(text).split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+def book_weight(score):
+    return float(score or 0.0)
+
+def add_book(index, book_id, title, isbn, score, isbn13=None):
+    weight = book_weight(score)
+    index.add(('title', book_id), title_keys(title), weight, {
+        'type': 'title', 'text': title, 'book_id': book_id,
+    })
+    if isbn:
+        index.add(('isbn', book_id), [isbn, isbn13 or isbn], weight, {
+            'type': 'isbn', 'text': isbn, 'book_id': book_id,
+        })
+
+def add_author(index, author_id, first_name, last_name, score):
+    name = f"{first_name} {last_name}"
+    index.add(('author', author_id), title_keys(name), book_weight(score), {
+        'type': 'author', 'text': name, 'author_id': author_id,
+    })
+
+def build_index():
+    from catalog.models import Book, Author
+
+    index = PrefixIndex(
+        top_k=getattr(settings, 'CATALOG_AUTOCOMPLETE_TOP_K', 10),
+        max_depth=getattr(settings, 'CATALOG_AUTOCOMPLETE_MAX_DEPTH', 24),
+    )
+
+    books = Book.objects.values_list('pk', 'title', 'isbn', 'popularity__popularity_score', 'isbn13')
+    for book_id, title, isbn, score, isbn13 in books.iterator(chunk_size=5000):
+        add_book(index, book_id, title, isbn, score, isbn13)
+
+    authors = Author.objects.annotate(
+        score=Max('books__popularity__popularity_score')
+    ).values_list('pk', 'first_name', 'last_name', 'score')
+    for author_id, first_name, last_name, score in authors.iterator(chunk_size=5000):
+        add_author(index, author_id, first_name, last_name, score)
+
+    return index
+
+_index = None
+_built_at = 0
+_build_lock = threading.Lock()
+_rebuilding = False
+_generation = 0
+
+def get_index():
+    """
+    Return the process-wide index, or ``None`` until the first build is done.
+
+    Builds run in a background thread: the first on first use, then again
+    after ``CATALOG_AUTOCOMPLETE_MAX_AGE`` seconds to pick up changes made by
+    other processes. Lookups keep using the old index until the new one is
+    ready. Changes made in this process are applied incrementally by the
+    signal handlers.
+    """
+    global _rebuilding
+    max_age = getattr(settings, 'CATALOG_AUTOCOMPLETE_MAX_AGE', 3600)
+    if _index is not None and time.monotonic() - _built_at <= max_age:
+        return _index
+
+    with _build_lock:
+        if _rebuilding:
+            return _index
+        _rebuilding = True
+    threading.Thread(
+        target=rebuild_index, args=(_generation,), name='autocomplete-rebuild', daemon=True
+    ).start()
+    return _index
+
+def rebuild_index(generation):
+    global _index, _built_at, _rebuilding
+    try:
+        index = build_index()
+        with _build_lock:
+            # A reset while building means this snapshot is already stale.
+            if generation == _generation:
+                _index = index
+    except Exception:
+        logger.exception('Could not rebuild the autocomplete index')
+    finally:
+        # On failure, wait another max age before trying again.
+        _built_at = time.monotonic()
+        _rebuilding = False
+        connection.close()
+
+def loaded_index():
+    """The index if this process has built one, else ``None``."""
+    return _index
+
+def reset_index():
+    global _index, _rebuilding, _generation
+    with _build_lock:
+        _index = None
+        _rebuilding = False
+        _generation += 1
+
+def database_suggest(prefix, limit=10):
+    """
+    Plain prefix matches from the database, served until the index is built.
+
+    Only the start of a title or name matches here, where the index also
+    matches inner words.
+    """
+    from catalog.models import Book, Author
+
+    prefix = prefix.strip()
+    if not normalize(prefix):
+        return []
+
+    books = Book.objects.order_by(F('popularity__popularity_score').desc(nulls_last=True), 'title')
+    results = [
+        {'type': 'title', 'text': title, 'book_id': book_id, 'score': book_weight(score)}
+        for book_id, title, score in books.filter(
+            title__istartswith=prefix
+        ).values_list('pk', 'title', 'popularity__popularity_score')[:limit]
+    ]
+    results += [
+        {'type': 'isbn', 'text': isbn, 'book_id': book_id, 'score': book_weight(score)}
+        for book_id, isbn, score in books.filter(
+            Q(isbn__startswith=prefix) | Q(isbn13__startswith=prefix)
+        ).values_list('pk', 'isbn', 'popularity__popularity_score')[:limit]
+    ]
+
+    authors = Author.objects.annotate(
+        name=Concat('first_name', Value(' '), 'last_name'),
+        score=Max('books__popularity__popularity_score'),
+    ).filter(Q(name__istartswith=prefix) | Q(last_name__istartswith=prefix))
+    results += [
+        {'type': 'author', 'text': name, 'author_id': author_id, 'score': book_weight(score)}
+        for author_id, name, score in authors.values_list('pk', 'name', 'score')[:limit]
+    ]
+
+    results.sort(key=lambda result: result['score'], reverse=True)
+    return results[:limit]
+
+def suggest(prefix, limit=10):
+    index = get_index()
+    if index is None:
+        return database_suggest(prefix, limit)
+    return index.lookup(prefix, limit)
+
+def update_book(book):
+    index = loaded_index()
+    if index is None:
+        return
+    entry = index.entries.get(('title', book.pk))
+    score = entry[1] if entry else 0.0
+    add_book(index, book.pk, book.title, book.isbn, score, book.isbn13)
+
+def remove_book(book_id):
+    index = loaded_index()
+    if index is not None:
+        index.remove(('title', book_id))
+        index.remove(('isbn', book_id))
+
+def update_book_score(book_id, score):
+    index = loaded_index()
+    if index is not None:
+        index.set_weight(('title', book_id), book_weight(score))
+        index.set_weight(('isbn', book_id), book_weight(score))
+
+def update_author(author):
+    index = loaded_index()
+    if index is None:
+        return
+    entry = index.entries.get(('author', author.pk))
+    score = entry[1] if entry else 0.0
+    add_author(index, author.pk, author.first_name, author.last_name, score)
+
+def remove_author(author_id):
+    index = loaded_index()
+    if index is not None:
+        index.remove(('author', author_id))
@@ -0,0 +1,193 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from catalog.images import derivative_urls
+
+GENERATION_KEY = 'catalog_generation'
+
+def get_catalog_generation():
+    """
+    Current catalog generation; bumping it orphans every cached result.
+
+    A missing counter is seeded from the clock so that a value evicted from
+    the cache never restarts at a number older entries were stored under.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+def bump_catalog_generation():
+    """Orphan every cached result once the current transaction commits."""
+    def bump():
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            get_catalog_generation()
+    transaction.on_commit(bump)
+
+# Each expired key gets a new version token, so a value computed from data
+# read before the expiry is not stored after it.
+VERSION_TIMEOUT = 3600
+
+def version_key(key):
+    return f"{key}:version"
+
+def expire_keys(keys):
+    """Delete cached values and discard any computation of them in flight."""
+    keys = list(keys)
+    if keys:
+        token = time.time_ns()
+        cache.set_many({version_key(key): token for key in keys}, VERSION_TIMEOUT)
+        cache.delete_many(keys)
+
+def normalize_params(params, ignore=()):
+    """Sorted, stripped query parameters with the search text case-folded."""
+    items = []
+    for key in sorted(params):
+        if key in ignore:
+            continue
+        for value in params.getlist(key) if hasattr(params, 'getlist') else [params[key]]:
+            value = ' '.join(value.split())
+            if key == 'q':
+                value = value.lower()
+            if value:
+                items.append((key, value))
+    return items
+
+def result_cache_key(prefix, params, ignore=()):
+    digest = hashlib.sha1(urlencode(normalize_params(params, ignore)).encode()).hexdigest()
+    return f"{prefix}:{get_catalog_generation()}:{digest}"
+
+def get_or_compute(key, compute, timeout):
+    """
+    Read-through cache with single-flight recomputation.
+
+    The first worker to miss takes a short lock and rebuilds the entry;
+    the others poll for its result instead of all hitting the database.
+    If ``expire_keys`` runs while the entry is being rebuilt, the rebuilt
+    value is returned but not kept.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f"{key}:lock"
+    lock_timeout = getattr(settings, 'CATALOG_CACHE_LOCK_TIMEOUT', 10)
+
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            version = cache.get(version_key(key))
+            value = compute()
+            cache.set(key, value, timeout)
+            if cache.get(version_key(key)) != version:
+                cache.delete(key)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if not cache.get(lock_key):
+            break
+
+    return compute()
+
+class CachedBookList:
+    """
+    Sequence of books backed by a cached list of ids.
+
+    Lets ``Paginator`` page through a cached result: the page's books are
+    loaded by primary key, and pages past the cached ids fall back to
+    slicing ``queryset``.
+    """
+
+    def __init__(self, book_ids, count, queryset):
+        self.book_ids = book_ids
+        self.total = count
+        self.queryset = queryset
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        start, stop = index.start or 0, min(index.stop or self.total, self.total)
+        if stop <= len(self.book_ids):
+            ids = self.book_ids[start:stop]
+            books = self.queryset.model._default_manager.filter(pk__in=ids)
+            books = books.select_related('publisher').prefetch_related('authors', 'genres')
+            by_id = {book.pk: book for book in books}
+            return [by_id[pk] for pk in ids if pk in by_id]
+
+        return list(self.queryset[start:stop])
+
+def book_summary_cache_key(book_id):
+    return f"book_summary:{book_id}"
+
+def build_book_summary(book_id):
+    """Everything the detail views show about a book, as plain values."""
+    from catalog.models import Book
+    from catalog.utils import get_review_page
+
+    book = Book.objects.select_related('publisher').prefetch_related('authors', 'genres').filter(pk=book_id).first()
+    if book is None:
+        return None
+
+    reviews, next_cursor, previous_cursor = get_review_page(
+        book.pk, per_page=getattr(settings, 'CATALOG_BOOK_SUMMARY_REVIEWS', 10)
+    )
+
+    return {
+        'id': book.pk,
+        'title': book.title,
+        'subtitle': book.subtitle,
+        'isbn': book.isbn,
+        'language': book.language,
+        'language_display': book.get_language_display(),
+        'pages': book.pages,
+        'description': book.description,
+        'edition': book.edition,
+        'publication_date': book.publication_date,
+        'cover_image': book.cover_image.url if book.cover_image else '',
+        'cover_images': derivative_urls(book.cover_image),
+        'publisher': book.publisher.name if book.publisher else '',
+        'authors': [{'id': a.pk, 'name': f"{a.first_name} {a.last_name}"} for a in book.authors.all()],
+        'genres': [{'id': g.pk, 'name': g.name} for g in book.genres.all()],
+        'total_copies': book.total_copies,
+        'available_copies': book.available_copies,
+        'on_loan_copies': book.on_loan_copies,
+        'availability_status': book.get_availability_status(),
+        'average_rating': float(book.average_rating),
+        'total_ratings': book.total_ratings,
+        'rating_histogram': book.rating_histogram(),
+        'reviews': reviews,
+        'reviews_next_cursor': next_cursor,
+    }
+
+def get_book_summary(book_id):
+    """Cached ``build_book_summary``; ``None`` for a missing book."""
+    return get_or_compute(
+        book_summary_cache_key(book_id),
+        lambda: build_book_summary(book_id),
+        getattr(settings, 'CATALOG_BOOK_SUMMARY_TIMEOUT', 3600)
+    )
+
+def expire_book_summaries(book_ids):
+    """Expire the cached summaries once the current transaction commits."""
+    keys = [book_summary_cache_key(book_id) for book_id in book_ids]
+    if keys:
+        transaction.on_commit(lambda: expire_keys(keys))
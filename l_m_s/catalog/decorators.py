@@ -23,7 +23,17 @@ def require_api_key(func):
     
     return wrapper
 
-def paginate_queryset(queryset, page, per_page=20):
+def paginate_queryset(queryset, page, per_page=20, cursor=None, ordering=None, estimate_total=False):
+    """
+    Paginate by page number, or by cursor when ``ordering`` is given.
+    
+    ``ordering`` is a key of ``catalog.pagination.BOOK_ORDERINGS`` or an
+    ``(order_field, descending)`` pair; ``cursor`` is the opaque cursor from a
+    previous page (``None`` for the first page).
+    """
+    if ordering is not None:
+        return paginate_keyset(queryset, cursor, ordering, per_page, estimate_total)
+    
     from django.core.paginator import Paginator
     
     paginator = Paginator(queryset, per_page)
@@ -37,3 +47,25 @@ def paginate_queryset(queryset, page, per_page=20):
         'has_next': page_obj.has_next(),
         'has_previous': page_obj.has_previous(),
     }
+
+def paginate_keyset(queryset, cursor, ordering, per_page=20, estimate_total=False):
+    from catalog.pagination import BOOK_ORDERINGS, KeysetPaginator, estimate_count
+    
+    if isinstance(ordering, str):
+        ordering = BOOK_ORDERINGS[ordering]
+    order_field, descending = ordering
+    
+    page_obj = KeysetPaginator(queryset, order_field, descending, per_page).page(cursor)
+    
+    data = {
+        'results': page_obj,
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+        'has_next': page_obj.has_next(),
+        'has_previous': page_obj.has_previous(),
+    }
+    
+    if estimate_total:
+        data['count'], data['count_exact'] = estimate_count(queryset)
+    
+    return data
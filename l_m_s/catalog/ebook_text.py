@@ -0,0 +1,290 @@
+import html
+import importlib.util
+import logging
+import posixpath
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.safestring import mark_safe
+from catalog.search import TOKEN_RE
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'catalog_ebookpassage_fts'
+PASSAGE_CHARS = 4000
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+
+# Extraction runs in worker processes and must not touch settings or the
+# database; everything it needs is passed in.
+
+def split_passage(text, limit):
+    """Split long text at whitespace into pieces of at most ``limit`` characters."""
+    text = text.strip()
+    while len(text) > limit:
+        cut = text.rfind(' ', 0, limit)
+        if cut <= 0:
+            cut = limit
+        yield text[:cut].strip()
+        text = text[cut:].strip()
+    if text:
+        yield text
+
+def extract_txt(path, limit):
+    with open(path, 'rb') as handle:
+        raw = handle.read()
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        text = raw.decode('latin-1')
+
+    # Form feeds mark pages in text exports; otherwise page by size.
+    pages = text.split('\f') if '\f' in text else list(split_passage(text, limit))
+    return [(f'Page {number}', page) for number, page in enumerate(pages, 1) if page.strip()]
+
+class TextCollector(HTMLParser):
+    SKIP = {'script', 'style', 'head'}
+    HEADINGS = {'h1', 'h2', 'h3'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts, self.heading, self.skipping, self.in_heading = [], '', 0, False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skipping += 1
+        elif tag in self.HEADINGS and not self.heading:
+            self.in_heading = True
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self.skipping:
+            self.skipping -= 1
+        elif tag in self.HEADINGS:
+            self.in_heading = False
+        self.parts.append(' ')
+
+    def handle_data(self, data):
+        if self.skipping:
+            return
+        self.parts.append(data)
+        if self.in_heading:
+            self.heading += data
+
+    def text(self):
+        return re.sub(r'\s+', ' ', ''.join(self.parts)).strip()
+
+def extract_epub(path, limit):
+    """Chapters in spine order, labelled with their first heading."""
+    namespaces = {
+        'c': 'urn:oasis:names:tc:opendocument:xmlns:container',
+        'opf': 'http://www.idpf.org/2007/opf',
+    }
+    with zipfile.ZipFile(path) as epub:
+        container = ElementTree.fromstring(epub.read('META-INF/container.xml'))
+        opf_path = container.find('.//c:rootfile', namespaces).get('full-path')
+        opf = ElementTree.fromstring(epub.read(opf_path))
+        base = posixpath.dirname(opf_path)
+
+        manifest = {item.get('id'): item.get('href') for item in opf.iterfind('.//opf:manifest/opf:item', namespaces)}
+        sections = []
+        for number, itemref in enumerate(opf.iterfind('.//opf:spine/opf:itemref', namespaces), 1):
+            href = manifest.get(itemref.get('idref'))
+            if not href:
+                continue
+            collector = TextCollector()
+            collector.feed(epub.read(posixpath.join(base, href)).decode('utf-8', 'replace'))
+            label = collector.heading.strip()[:150] or f'Chapter {number}'
+            sections.extend((label, part) for part in split_passage(collector.text(), limit))
+    return sections
+
+def extract_pdf(path, limit):
+    # Without pypdf, PDFs stay pending until it is installed.
+    from pypdf import PdfReader
+
+    sections = []
+    for number, page in enumerate(PdfReader(path).pages, 1):
+        for part in split_passage(page.extract_text() or '', limit):
+            sections.append((f'Page {number}', part))
+    return sections
+
+EXTRACTORS = {
+    'TXT': extract_txt,
+    'EPUB': extract_epub,
+    'PDF': extract_pdf,
+}
+
+def extract_file(job):
+    """Worker entry point: ``(ebook_id, format, path, limit)`` -> ``(ebook_id, status, sections)``."""
+    ebook_id, ebook_format, path, limit = job
+    extractor = EXTRACTORS.get(ebook_format)
+    if extractor is None:
+        return ebook_id, 'UNSUPPORTED', []
+    try:
+        return ebook_id, 'INDEXED', extractor(path, limit)
+    except ImportError:
+        return ebook_id, 'PENDING', []
+    except Exception as e:
+        return ebook_id, 'FAILED', str(e)
+
+def pdf_supported():
+    return importlib.util.find_spec('pypdf') is not None
+
+def fts_supported():
+    return connection.vendor == 'sqlite'
+
+def ensure_text_table():
+    if not fts_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"content, content='catalog_ebookpassage', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+
+def remove_ebook_text(ebook_id):
+    """Drop a file's passages and their index entries."""
+    from catalog.advanced_models import EBookPassage
+
+    with transaction.atomic():
+        if fts_supported():
+            # External-content FTS tables are told what each deleted row held.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, content) "
+                    f"SELECT 'delete', id, content FROM catalog_ebookpassage WHERE ebook_id = %s",
+                    [ebook_id]
+                )
+        EBookPassage.objects.filter(ebook_id=ebook_id).delete()
+
+def save_ebook_text(ebook_id, status, sections):
+    from catalog.advanced_models import EBookFile, EBookPassage
+
+    with transaction.atomic():
+        # Deactivated while its text was being extracted.
+        if not EBookFile.objects.filter(pk=ebook_id, is_active=True).exists():
+            return
+        remove_ebook_text(ebook_id)
+        if status == 'INDEXED':
+            passages = EBookPassage.objects.bulk_create([
+                EBookPassage(ebook_id=ebook_id, position=position, label=label[:200], content=content)
+                for position, (label, content) in enumerate(sections)
+            ], batch_size=500)
+            if fts_supported() and passages:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"INSERT INTO {FTS_TABLE} (rowid, content) "
+                        f"SELECT id, content FROM catalog_ebookpassage WHERE ebook_id = %s",
+                        [ebook_id]
+                    )
+        EBookFile.objects.filter(pk=ebook_id).update(text_status=status)
+
+def index_pending_ebooks(workers=None, limit=None):
+    """
+    Extract and index every active file still waiting, in a process pool.
+
+    Files are marked PENDING when they are attached and when they are
+    deactivated, so each run extracts only new or changed files and never
+    rescans the library. Workers only parse files; passages are written
+    here. ``workers=0`` extracts in this process. Returns a
+    ``{status: count}`` summary.
+    """
+    from catalog.advanced_models import EBookFile
+
+    workers = getattr(settings, 'EBOOK_TEXT_WORKERS', 2) if workers is None else workers
+    if pdf_supported():
+        # Marked unsupported by a release that gave up on PDFs without pypdf.
+        EBookFile.objects.filter(format='PDF', text_status='UNSUPPORTED').update(text_status='PENDING')
+    pending = EBookFile.objects.filter(is_active=True, text_status='PENDING').order_by('pk')
+    if limit:
+        pending = pending[:limit]
+
+    jobs = []
+    for ebook_id, ebook_format, name in pending.values_list('pk', 'format', 'file'):
+        field = EBookFile._meta.get_field('file')
+        jobs.append((ebook_id, ebook_format, field.storage.path(name), PASSAGE_CHARS))
+
+    summary = {}
+    def save(result):
+        ebook_id, status, sections = result
+        if status == 'FAILED':
+            logger.warning('Could not extract text from e-book %s: %s', ebook_id, sections)
+            sections = []
+        save_ebook_text(ebook_id, status, sections)
+        summary[status] = summary.get(status, 0) + 1
+
+    if workers and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(extract_file, jobs):
+                save(result)
+    else:
+        for job in jobs:
+            save(extract_file(job))
+    return summary
+
+def highlight(snippet):
+    return mark_safe(
+        html.escape(snippet).replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+    )
+
+def plain_snippet(content, terms, width=120):
+    """Snippet around the first term for databases without FTS5."""
+    lowered = content.lower()
+    found = min((lowered.find(t) for t in terms if t in lowered), default=0)
+    start = max(found - width // 2, 0)
+    text = content[start:start + width]
+    for term in terms:
+        text = re.sub(f'({re.escape(term)})', f'{SNIPPET_START}\\1{SNIPPET_END}', text, flags=re.IGNORECASE)
+    return ('…' if start else '') + text + ('…' if start + width < len(content) else '')
+
+def search_ebook_text(query, limit=20, hits_per_file=3):
+    """
+    Active e-books whose text matches ``query``, best first.
+
+    Each result carries up to ``hits_per_file`` passages with their page or
+    chapter label and a highlighted snippet.
+    """
+    from catalog.advanced_models import EBookFile, EBookPassage
+
+    terms = TOKEN_RE.findall(query.lower())
+    if not terms:
+        return []
+    max_rows = limit * hits_per_file * 4
+
+    if fts_supported():
+        match = ' '.join(f'"{term}"*' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT p.ebook_id, p.position, p.label, "
+                f"snippet({FTS_TABLE}, 0, %s, %s, '…', 16) "
+                f"FROM {FTS_TABLE} JOIN catalog_ebookpassage p ON p.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}) LIMIT %s",
+                [SNIPPET_START, SNIPPET_END, match, max_rows]
+            )
+            rows = cursor.fetchall()
+    else:
+        passages = EBookPassage.objects.all()
+        for term in terms:
+            passages = passages.filter(content__icontains=term)
+        rows = [
+            (ebook_id, position, label, plain_snippet(content, terms))
+            for ebook_id, position, label, content in passages.values_list(
+                'ebook_id', 'position', 'label', 'content'
+            )[:max_rows]
+        ]
+
+    hits = {}
+    for ebook_id, position, label, snippet in rows:
+        file_hits = hits.setdefault(ebook_id, [])
+        if len(file_hits) < hits_per_file:
+            file_hits.append({'position': position, 'label': label, 'snippet': highlight(snippet)})
+
+    ebooks = EBookFile.objects.filter(pk__in=list(hits), is_active=True).select_related('book').in_bulk()
+    results = []
+    for ebook_id, file_hits in hits.items():
+        if ebook_id in ebooks and len(results) < limit:
+            results.append({'ebook': ebooks[ebook_id], 'hits': sorted(file_hits, key=lambda hit: hit['position'])})
+    return results
@@ -0,0 +1,87 @@
+from django.db.models import Case, CharField, Count, ExpressionWrapper, F, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, ExtractYear
+from catalog.models import Book
+
+AVAILABILITY_LABELS = {
+    'available': 'Available now',
+    'unavailable': 'All copies out',
+}
+
+def has_available_copy():
+    return Q(available_copies__gt=0)
+
+def publication_decade(field='publication_date'):
+    # EXTRACT gives a double on PostgreSQL; cast so the division truncates.
+    year = Cast(ExtractYear(field), IntegerField())
+    return ExpressionWrapper(year / 10 * 10, output_field=IntegerField())
+
+def _facet(queryset, name, value, label, count_field='pk'):
+    return queryset.annotate(
+        facet_value=Cast(value, CharField()),
+        facet_label=Cast(label, CharField()),
+    ).values('facet_value', 'facet_label').annotate(
+        facet=Value(name, output_field=CharField()),
+        count=Count(count_field, distinct=True),
+    ).values_list('facet', 'facet_value', 'facet_label', 'count').order_by()
+
+def facet_counts(queryset):
+    """
+    Count the books in ``queryset`` per genre, language, publisher,
+    publication decade and availability.
+
+    Every facet is a GROUP BY over the same result set and the groups are
+    combined with UNION ALL, so the whole breakdown costs one query.
+    """
+    books = Book.objects.filter(pk__in=queryset.order_by().values('pk'))
+    book_genres = Book.genres.through.objects.filter(book__in=books)
+    decade = publication_decade()
+    availability = Case(
+        When(has_available_copy(), then=Value('available')),
+        default=Value('unavailable'),
+        output_field=CharField()
+    )
+
+    parts = [
+        _facet(book_genres, 'genre', F('genre_id'), F('genre__name'), count_field='book_id'),
+        _facet(books, 'language', F('language'), F('language')),
+        _facet(books.filter(publisher__isnull=False), 'publisher', F('publisher_id'), F('publisher__name')),
+        _facet(books, 'decade', decade, decade),
+        _facet(books, 'availability', availability, availability),
+    ]
+
+    languages = dict(Book.LANGUAGE_CHOICES)
+    facets = {'genre': [], 'language': [], 'publisher': [], 'decade': [], 'availability': []}
+
+    for facet, value, label, count in parts[0].union(*parts[1:], all=True):
+        if facet == 'language':
+            label = languages.get(value, value)
+        elif facet == 'decade':
+            label = f"{value}s"
+        elif facet == 'availability':
+            label = AVAILABILITY_LABELS[value]
+        facets[facet].append({'value': value, 'label': label, 'count': count})
+
+    for values in facets.values():
+        values.sort(key=lambda v: (-v['count'], v['label']))
+
+    return facets
+
+def apply_facet_filters(queryset, params):
+    """Narrow ``queryset`` by the facet values selected in ``params``."""
+    if params.get('genre'):
+        queryset = queryset.filter(genres__id=params['genre'])
+    if params.get('language'):
+        queryset = queryset.filter(language=params['language'])
+    if params.get('publisher'):
+        queryset = queryset.filter(publisher_id=params['publisher'])
+    if params.get('decade', '').isdigit():
+        decade = int(params['decade'])
+        queryset = queryset.filter(
+            publication_date__year__gte=decade,
+            publication_date__year__lt=decade + 10
+        )
+    if params.get('availability') == 'available':
+        queryset = queryset.filter(has_available_copy())
+    elif params.get('availability') == 'unavailable':
+        queryset = queryset.filter(~has_available_copy())
+    return queryset
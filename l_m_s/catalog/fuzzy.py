@@ -0,0 +1,134 @@
+import math
+import unicodedata
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Case, When, IntegerField
+from catalog.models import Book, Author, SearchTerm, SearchTrigram
+
+def normalize(text):
+    """Lowercase, strip accents and collapse everything but word characters."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in text).split())
+
+def trigrams(text):
+    """Return the set of word trigrams, padded the same way as pg_trgm."""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def get_threshold():
+    return getattr(settings, 'CATALOG_FUZZY_THRESHOLD', 0.5)
+
+def index_term(kind, object_id, text):
+    SearchTerm.objects.filter(kind=kind, object_id=object_id).delete()
+
+    grams = trigrams(text)
+    if not grams:
+        return None
+
+    term = SearchTerm.objects.create(
+        kind=kind,
+        object_id=object_id,
+        text=text[:300],
+        trigram_count=len(grams)
+    )
+    SearchTrigram.objects.bulk_create(
+        [SearchTrigram(trigram=gram, term=term) for gram in grams]
+    )
+    return term
+
+def index_book(book):
+    return index_term('TITLE', book.pk, book.title)
+
+def index_author(author):
+    return index_term('AUTHOR', author.pk, f"{author.first_name} {author.last_name}")
+
+def remove_term(kind, object_id):
+    SearchTerm.objects.filter(kind=kind, object_id=object_id).delete()
+
+def rebuild():
+    with transaction.atomic():
+        SearchTrigram.objects.all().delete()
+        SearchTerm.objects.all().delete()
+
+        for book in Book.objects.only('pk', 'title').iterator(chunk_size=2000):
+            index_book(book)
+        for author in Author.objects.only('pk', 'first_name', 'last_name').iterator(chunk_size=2000):
+            index_author(author)
+
+def fuzzy_search(query, kinds=None, threshold=None, limit=20):
+    """
+    Return ``(term, similarity)`` pairs for terms that resemble ``query``.
+
+    Similarity is the share of the query's trigrams found in the term, so a
+    misspelt word still matches a longer title or full name. Candidates come
+    from the trigram index, so only terms sharing enough trigrams with the
+    query are ever read.
+    """
+    grams = trigrams(query)
+    if not grams:
+        return []
+
+    threshold = get_threshold() if threshold is None else threshold
+    min_shared = max(1, math.ceil(threshold * len(grams)))
+
+    postings = SearchTrigram.objects.filter(trigram__in=grams)
+    if kinds:
+        postings = postings.filter(term__kind__in=kinds)
+
+    shared_counts = dict(
+        postings.values('term').annotate(
+            shared=Count('id')
+        ).filter(shared__gte=min_shared).values_list('term', 'shared')
+    )
+    if not shared_counts:
+        return []
+
+    results = []
+    for term in SearchTerm.objects.filter(pk__in=shared_counts):
+        shared = shared_counts[term.pk]
+        similarity = shared / len(grams)
+        overlap = shared / (len(grams) + term.trigram_count - shared)
+        results.append((similarity, overlap, term))
+
+    results.sort(key=lambda r: (r[0], r[1]), reverse=True)
+    return [(term, similarity) for similarity, overlap, term in results[:limit]]
+
+def fuzzy_book_ids(query, threshold=None, limit=100):
+    """Book ids matching ``query`` by title or author name, best first."""
+    book_ids = []
+    author_ids = []
+    for term, similarity in fuzzy_search(query, threshold=threshold, limit=limit):
+        if term.kind == 'TITLE':
+            book_ids.append(term.object_id)
+        else:
+            author_ids.append(term.object_id)
+
+    if author_ids:
+        ranking = Case(
+            *[When(author_id=pk, then=position) for position, pk in enumerate(author_ids)],
+            output_field=IntegerField()
+        )
+        by_author = Book.authors.through.objects.filter(
+            author_id__in=author_ids
+        ).annotate(position=ranking).order_by('position').values_list('book_id', flat=True)
+        book_ids.extend(by_author[:limit])
+
+    return list(dict.fromkeys(book_ids))[:limit]
+
+def fuzzy_books(queryset, query, threshold=None):
+    """Typo-tolerant counterpart of ``catalog.search.search_books``."""
+    from catalog.search import rank_by_ids
+    return rank_by_ids(queryset, fuzzy_book_ids(query, threshold=threshold))
+
+def suggest(query, limit=5):
+    """'Did you mean' suggestions: close terms that differ from the query."""
+    normalized = normalize(query)
+    suggestions = []
+    for term, similarity in fuzzy_search(query, limit=limit * 2):
+        if normalize(term.text) != normalized and term.text not in suggestions:
+            suggestions.append(term.text)
+    return suggestions[:limit]
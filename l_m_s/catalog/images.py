@@ -0,0 +1,178 @@
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile, File
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = {
+    'thumb': (96, 144),
+    'small': (200, 300),
+    'medium': (400, 600),
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+def derivative_sizes():
+    return getattr(settings, 'IMAGE_DERIVATIVE_SIZES', DEFAULT_SIZES)
+
+def derivatives_cache_key(source):
+    return f"image_derivatives_{hashlib.md5(source.encode()).hexdigest()}"
+
+def encode(image, image_format):
+    pil_format, options = FORMATS[image_format]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha; flatten transparent images onto white.
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+def generate_derivatives(source, storage):
+    """
+    Write every configured size of ``source`` in WebP and JPEG.
+
+    Names carry a hash of the encoded bytes, so a derivative's URL changes
+    whenever its content does and can be cached for a year. Returns the
+    number of derivatives recorded.
+    """
+    from catalog.advanced_models import ImageDerivative
+
+    try:
+        with storage.open(source, 'rb') as handle:
+            original = ImageOps.exif_transpose(Image.open(handle))
+            original.load()
+    except (OSError, ValueError):
+        logger.warning('Could not open image %s for derivatives', source)
+        return 0
+
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info or original.mode in ('LA', 'PA') else 'RGB')
+
+    rows = []
+    for size, box in derivative_sizes().items():
+        resized = original.copy()
+        resized.thumbnail(box, Image.Resampling.LANCZOS)
+        for image_format in FORMATS:
+            data = encode(resized, image_format)
+            digest = hashlib.sha256(data).hexdigest()
+            name = f'derivatives/{size}/{digest[:2]}/{digest[:20]}.{image_format}'
+            if not storage.exists(name):
+                storage.save(name, ContentFile(data))
+            rows.append(ImageDerivative(
+                source=source, size=size, format=image_format, name=name,
+                width=resized.width, height=resized.height,
+            ))
+
+    with transaction.atomic():
+        ImageDerivative.objects.filter(source=source).delete()
+        ImageDerivative.objects.bulk_create(rows)
+    cache.delete(derivatives_cache_key(source))
+    return len(rows)
+
+def derivative_urls(fieldfile):
+    """``{size: {'webp': url, 'jpeg': url, 'width': w, 'height': h}}``, or ``{}`` until generated."""
+    if not fieldfile:
+        return {}
+    return derivative_urls_many([fieldfile])[fieldfile.name]
+
+def derivative_urls_many(fieldfiles):
+    """
+    ``{source name: derivative_urls()}`` for many images at once.
+
+    Cached entries come from one ``get_many``; the rest from a single
+    query, so listing a page of covers costs the same as listing one.
+    """
+    from catalog.advanced_models import ImageDerivative
+
+    files = {fieldfile.name: fieldfile for fieldfile in fieldfiles if fieldfile}
+    keys = {derivatives_cache_key(name): name for name in files}
+    found = {keys[key]: urls for key, urls in cache.get_many(keys).items()}
+
+    missing = {name: {} for name in files if name not in found}
+    if missing:
+        rows = ImageDerivative.objects.filter(source__in=list(missing)).values_list(
+            'source', 'size', 'format', 'name', 'width', 'height'
+        )
+        for source, size, image_format, name, width, height in rows:
+            entry = missing[source].setdefault(size, {'width': width, 'height': height})
+            entry[image_format] = files[source].storage.url(name)
+        # Images still waiting for derivatives are not cached: a worker can
+        # finish between the query and the set, and its cache delete would
+        # be overwritten with an empty entry.
+        cache.set_many(
+            {derivatives_cache_key(name): urls for name, urls in missing.items() if urls},
+            getattr(settings, 'IMAGE_DERIVATIVE_CACHE_TIMEOUT', 3600)
+        )
+        found.update(missing)
+    return found
+
+def image_changed(instance, field_name):
+    """
+    True if saving ``instance`` writes a new file into ``field_name``.
+
+    Call it from a ``pre_save`` receiver: a fresh upload is still
+    uncommitted there, while files loaded from the database are not.
+    """
+    value = instance.__dict__.get(field_name)
+    if not value:
+        return False
+    if instance._state.adding:
+        return True
+    return isinstance(value, File) and not getattr(value, '_committed', False)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2),
+                thread_name_prefix='image-derivatives',
+            )
+    return _pool
+
+def run_job(source, storage, on_done):
+    try:
+        if generate_derivatives(source, storage) and on_done:
+            on_done()
+    except Exception:
+        logger.exception('Could not build derivatives of %s', source)
+    finally:
+        connection.close()
+
+def schedule_derivatives(fieldfile, on_done=None):
+    """
+    Build derivatives of a saved image on the worker pool once the
+    transaction commits.
+
+    Pillow releases the GIL while it decodes, resizes and encodes, so a
+    small thread pool keeps the work off the request path. With
+    ``IMAGE_DERIVATIVE_WORKERS = 0`` the work runs inline.
+    """
+    from catalog.advanced_models import ImageDerivative
+
+    if not fieldfile or ImageDerivative.objects.filter(source=fieldfile.name).exists():
+        return
+    source, storage = fieldfile.name, fieldfile.storage
+
+    def submit():
+        if getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2):
+            get_pool().submit(run_job, source, storage, on_done)
+        elif generate_derivatives(source, storage) and on_done:
+            on_done()
+    transaction.on_commit(submit)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from catalog.models import Book
+from catalog.validators import normalize_isbn
+
+class Command(BaseCommand):
+    help = 'Populate the normalized ISBN-13 column for existing books'
+
+    def handle(self, *args, **options):
+        taken = set(
+            Book.objects.filter(isbn13__isnull=False).values_list('isbn13', flat=True)
+        )
+        
+        updated = []
+        conflicts = []
+        for book in Book.objects.filter(isbn13__isnull=True).only('pk', 'isbn').iterator(chunk_size=2000):
+            isbn13 = normalize_isbn(book.isbn)
+            if not isbn13:
+                continue
+            if isbn13 in taken:
+                conflicts.append(book)
+                continue
+            
+            taken.add(isbn13)
+            book.isbn13 = isbn13
+            updated.append(book)
+        
+        Book.objects.bulk_update(updated, ['isbn13'], batch_size=1000)
+        
+        for book in conflicts:
+            self.stdout.write(
+                self.style.WARNING(f'Book {book.pk} ({book.isbn}) duplicates an existing ISBN-13')
+            )
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Normalized {len(updated)} ISBNs, {len(conflicts)} conflicts')
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from catalog.models import Book, Author
+from catalog.advanced_models import ImageDerivative
+from catalog.images import generate_derivatives
+from catalog.cache import expire_book_summaries
+from accounts.models import MemberProfile
+from accounts.premium_models import Badge
+
+IMAGE_FIELDS = [
+    (Book, 'cover_image'),
+    (Author, 'photo'),
+    (MemberProfile, 'profile_picture'),
+    (Badge, 'icon'),
+]
+
+class Command(BaseCommand):
+    help = 'Generate thumbnail derivatives for covers, author photos, profile pictures and badge icons'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate images that already have derivatives')
+
+    def handle(self, *args, **options):
+        done = set() if options['force'] else set(ImageDerivative.objects.values_list('source', flat=True).distinct())
+        count = 0
+        for model, field_name in IMAGE_FIELDS:
+            storage = model._meta.get_field(field_name).storage
+            generated = []
+            names = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for name in names.values_list(field_name, flat=True).distinct().iterator():
+                if name in done:
+                    continue
+                done.add(name)
+                if generate_derivatives(name, storage):
+                    generated.append(name)
+            if model is Book and generated:
+                expire_book_summaries(Book.objects.filter(cover_image__in=generated).values_list('pk', flat=True))
+            count += len(generated)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Generated derivatives for {count} images')
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from catalog.recommendations import build_recommendations
+from catalog.vector_store import publish_store
+
+class Command(BaseCommand):
+    help = 'Rebuild item neighbours and member book recommendations from loan history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, help='Recommendations kept per member')
+        parser.add_argument('--neighbors', type=int, help='Neighbours kept per book')
+        parser.add_argument(
+            '--stale-only',
+            action='store_true',
+            help='Only rescore members whose history changed since their last refresh',
+        )
+
+    def handle(self, *args, **options):
+        members, written = build_recommendations(
+            top_n=options['top'],
+            neighbor_count=options['neighbors'],
+            stale_only=options['stale_only']
+        )
+        version = publish_store()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Wrote {written} recommendations for {members} members (store {version})')
+        )
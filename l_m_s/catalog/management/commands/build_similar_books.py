@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from catalog.similarity import build_similar_books
+from catalog.vector_store import publish_store
+
+class Command(BaseCommand):
+    help = 'Precompute content-based similar books from titles, descriptions, genres and authors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, help='Similar books kept per book')
+
+    def handle(self, *args, **options):
+        books, pairs = build_similar_books(k=options['top'])
+        version = publish_store()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Stored {pairs} similar-book pairs for {books} books (store {version})')
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from catalog.ebook_text import index_pending_ebooks
+
+class Command(BaseCommand):
+    help = 'Extract and index the text of e-books added or reactivated since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Extraction processes (0 to extract in this process)')
+        parser.add_argument('--limit', type=int, default=None, help='Index at most this many files')
+
+    def handle(self, *args, **options):
+        summary = index_pending_ebooks(options['workers'], options['limit'])
+        counts = ', '.join(f'{count} {status.lower()}' for status, count in sorted(summary.items())) or 'nothing pending'
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed e-book text: {counts}')
+        )
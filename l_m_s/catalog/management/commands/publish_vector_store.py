@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from catalog.vector_store import publish_store
+
+class Command(BaseCommand):
+    help = 'Publish neighbour lists, popularity and titles to the shared memory-mapped store'
+
+    def handle(self, *args, **options):
+        version = publish_store()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Published vector store {version}')
+        )
@@ -0,0 +1,17 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from catalog.uploads import purge_stale_uploads
+
+class Command(BaseCommand):
+    help = 'Delete unfinished chunked e-book uploads and their part files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Idle time before an upload is dropped')
+
+    def handle(self, *args, **options):
+        count = purge_stale_uploads(timezone.now() - timedelta(hours=options['hours']))
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Purged {count} stale uploads')
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from catalog.advanced_models import DiscussionComment
+
+class Command(BaseCommand):
+    help = 'Recompute materialized paths, depths and reply counts of discussion comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--discussion', type=int, action='append', help='Only this discussion (repeatable)')
+
+    def handle(self, *args, **options):
+        count = DiscussionComment.rebuild_paths(options['discussion'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt paths for {count} comments')
+        )
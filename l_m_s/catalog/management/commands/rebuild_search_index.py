@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from catalog.search import get_search_backend
+from catalog import fuzzy
+
+class Command(BaseCommand):
+    help = 'Rebuild the catalog full-text and trigram search indexes'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        fuzzy.rebuild()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt search index using {backend.__class__.__name__}')
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Q
+from catalog.models import Book
+
+class Command(BaseCommand):
+    help = 'Recount the denormalized copy counters on Book from BookInstance'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted books without fixing them',
+        )
+
+    def handle(self, *args, **options):
+        drifted = Book.objects.annotate(
+            actual_total=Count('instances'),
+            actual_available=Count('instances', filter=Q(instances__status='AVAILABLE')),
+            actual_on_loan=Count('instances', filter=Q(instances__status='ON_LOAN')),
+        ).exclude(
+            total_copies=F('actual_total'),
+            available_copies=F('actual_available'),
+            on_loan_copies=F('actual_on_loan'),
+        ).values_list('pk', flat=True)
+        
+        book_ids = list(drifted)
+        
+        if not options['dry_run']:
+            Book.recount_copies(book_ids)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{'Found' if options['dry_run'] else 'Reconciled'} {len(book_ids)} books with drifted copy counters"
+            )
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from catalog.advanced_models import BookDiscussion
+
+class Command(BaseCommand):
+    help = 'Recompute comment counts, last activity and hot scores of book discussions'
+
+    def handle(self, *args, **options):
+        count = BookDiscussion.recount_activity()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Recounted activity for {count} discussions')
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from catalog.models import Book
+
+class Command(BaseCommand):
+    help = 'Recompute the rating sum, count, average and histogram on Book from Review'
+
+    def handle(self, *args, **options):
+        book_ids = list(Book.objects.values_list('pk', flat=True))
+        Book.recount_ratings(book_ids)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Recounted ratings for {len(book_ids)} books')
+        )
@@ -0,0 +1,460 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:35
+
+import catalog.validators
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('date_of_birth', models.DateField(blank=True, null=True)),
+                ('date_of_death', models.DateField(blank=True, null=True)),
+                ('biography', models.TextField(blank=True)),
+                ('nationality', models.CharField(blank=True, max_length=100)),
+                ('website', models.URLField(blank=True)),
+                ('photo', models.ImageField(blank=True, null=True, upload_to='authors/')),
+            ],
+            options={
+                'ordering': ['last_name', 'first_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Publisher',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('country', models.CharField(max_length=100)),
+                ('website', models.URLField(blank=True)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReadingChallenge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('challenge_type', models.CharField(choices=[('BOOKS_COUNT', 'Number of Books'), ('PAGES_COUNT', 'Number of Pages'), ('GENRES', 'Different Genres'), ('AUTHORS', 'Different Authors')], max_length=20)),
+                ('target_value', models.IntegerField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('BOOK_CHECKOUT', 'Book Checkout'), ('BOOK_RETURN', 'Book Return'), ('FINE_PAID', 'Fine Paid'), ('MEMBER_REGISTERED', 'Member Registered')], max_length=30)),
+                ('payload', models.JSONField()),
+                ('url', models.URLField()),
+                ('status_code', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='APIKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Book',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(db_index=True, max_length=300)),
+                ('subtitle', models.CharField(blank=True, max_length=300)),
+                ('isbn', models.CharField(db_index=True, max_length=13, unique=True, validators=[catalog.validators.validate_isbn], verbose_name='ISBN')),
+                ('isbn13', models.CharField(blank=True, editable=False, max_length=13, null=True, unique=True, verbose_name='ISBN-13')),
+                ('publication_date', models.DateField()),
+                ('language', models.CharField(choices=[('EN', 'English'), ('ES', 'Spanish'), ('FR', 'French'), ('DE', 'German'), ('ZH', 'Chinese'), ('JA', 'Japanese'), ('HI', 'Hindi'), ('AR', 'Arabic')], default='EN', max_length=2)),
+                ('pages', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('description', models.TextField(blank=True)),
+                ('cover_image', models.ImageField(blank=True, null=True, upload_to='covers/')),
+                ('edition', models.CharField(blank=True, max_length=50)),
+                ('average_rating', models.DecimalField(decimal_places=2, default=0.0, max_digits=3)),
+                ('total_ratings', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0, editable=False)),
+                ('ratings_1', models.IntegerField(default=0, editable=False)),
+                ('ratings_2', models.IntegerField(default=0, editable=False)),
+                ('ratings_3', models.IntegerField(default=0, editable=False)),
+                ('ratings_4', models.IntegerField(default=0, editable=False)),
+                ('ratings_5', models.IntegerField(default=0, editable=False)),
+                ('dewey_decimal', models.CharField(blank=True, max_length=20)),
+                ('total_copies', models.IntegerField(default=0, editable=False)),
+                ('available_copies', models.IntegerField(default=0, editable=False)),
+                ('on_loan_copies', models.IntegerField(default=0, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('authors', models.ManyToManyField(related_name='books', to='catalog.author')),
+                ('genres', models.ManyToManyField(related_name='books', to='catalog.genre')),
+                ('publisher', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalog.publisher')),
+            ],
+            options={
+                'ordering': ['title'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookDiscussion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=300)),
+                ('description', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('scheduled_date', models.DateTimeField(blank=True, null=True)),
+                ('comments_count', models.IntegerField(default=0, editable=False)),
+                ('last_comment_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('hot_score', models.FloatField(default=0.0, editable=False)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discussions', to='catalog.book')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookInstance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unique_id', models.CharField(max_length=50, unique=True)),
+                ('barcode', models.CharField(blank=True, max_length=50, unique=True)),
+                ('status', models.CharField(choices=[('AVAILABLE', 'Available'), ('ON_LOAN', 'On Loan'), ('RESERVED', 'Reserved'), ('MAINTENANCE', 'Maintenance'), ('LOST', 'Lost'), ('DAMAGED', 'Damaged')], default='AVAILABLE', max_length=20)),
+                ('condition', models.CharField(choices=[('NEW', 'New'), ('EXCELLENT', 'Excellent'), ('GOOD', 'Good'), ('FAIR', 'Fair'), ('POOR', 'Poor')], default='GOOD', max_length=20)),
+                ('acquisition_date', models.DateField(default=django.utils.timezone.now)),
+                ('acquisition_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('location', models.CharField(max_length=100)),
+                ('notes', models.TextField(blank=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='instances', to='catalog.book')),
+            ],
+            options={
+                'ordering': ['book', 'unique_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('LOAN', 'Borrowed Together'), ('CONTENT', 'Similar Content')], default='LOAN', max_length=10)),
+                ('score', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='catalog.book')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.book')),
+            ],
+            options={
+                'ordering': ['-score'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0.0)),
+                ('reason', models.CharField(max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('is_viewed', models.BooleanField(default=False)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.book')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='accounts.memberprofile')),
+            ],
+            options={
+                'ordering': ['-score', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DiscussionComment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('path', models.CharField(blank=True, editable=False, max_length=255)),
+                ('depth', models.PositiveSmallIntegerField(default=0, editable=False)),
+                ('replies_count', models.IntegerField(default=0, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('likes_count', models.IntegerField(default=0)),
+                ('discussion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='catalog.bookdiscussion')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='catalog.discussioncomment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CommentLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='catalog.discussioncomment')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EBookFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='ebooks/', validators=[django.core.validators.FileExtensionValidator(['pdf', 'epub', 'mobi', 'txt'])])),
+                ('format', models.CharField(choices=[('PDF', 'PDF'), ('EPUB', 'EPUB'), ('MOBI', 'MOBI'), ('TXT', 'Text')], max_length=10)),
+                ('file_size', models.BigIntegerField(blank=True)),
+                ('sha256', models.CharField(blank=True, db_index=True, editable=False, max_length=64)),
+                ('text_status', models.CharField(choices=[('PENDING', 'Waiting for Indexing'), ('INDEXED', 'Indexed'), ('UNSUPPORTED', 'Format Not Searchable'), ('FAILED', 'Extraction Failed')], db_index=True, default='PENDING', editable=False, max_length=12)),
+                ('is_active', models.BooleanField(default=True)),
+                ('downloads_count', models.IntegerField(default=0)),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ebook_files', to='catalog.book')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EBookDownload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('downloaded_at', models.DateTimeField(auto_now_add=True)),
+                ('ip_address', models.GenericIPAddressField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('ebook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.ebookfile')),
+            ],
+            options={
+                'ordering': ['-downloaded_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EBookPassage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField()),
+                ('label', models.CharField(max_length=200)),
+                ('content', models.TextField()),
+                ('ebook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passages', to='catalog.ebookfile')),
+            ],
+            options={
+                'ordering': ['ebook', 'position'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EBookUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('format', models.CharField(choices=[('PDF', 'PDF'), ('EPUB', 'EPUB'), ('MOBI', 'MOBI'), ('TXT', 'Text')], max_length=10)),
+                ('filename', models.CharField(max_length=255)),
+                ('total_size', models.BigIntegerField()),
+                ('received_bytes', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ebook_uploads', to='catalog.book')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('ebook', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.ebookfile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, max_length=255)),
+                ('size', models.CharField(max_length=20)),
+                ('format', models.CharField(max_length=10)),
+                ('name', models.CharField(max_length=255)),
+                ('width', models.IntegerField()),
+                ('height', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('source', 'size', 'format')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ChallengeParticipation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current_progress', models.IntegerField(default=0)),
+                ('is_completed', models.BooleanField(default=False)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.memberprofile')),
+                ('challenge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.readingchallenge')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReadingList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('is_public', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('books', models.ManyToManyField(related_name='reading_lists', to='catalog.book')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecommendationState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_stale', models.BooleanField(db_index=True, default=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation_state', to='accounts.memberprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Review',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)])),
+                ('title', models.CharField(max_length=200)),
+                ('content', models.TextField()),
+                ('helpful_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='catalog.book')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewVote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='catalog.review')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('TITLE', 'Book Title'), ('AUTHOR', 'Author Name')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('text', models.CharField(max_length=300)),
+                ('trigram_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='catalog_sea_kind_3c13b8_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='catalog.searchterm')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bookdiscussion',
+            index=models.Index(fields=['is_active', '-hot_score', '-id'], name='catalog_boo_is_acti_7d1180_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookdiscussion',
+            index=models.Index(fields=['is_active', '-last_comment_at', '-id'], name='catalog_boo_is_acti_58709b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookneighbor',
+            index=models.Index(fields=['kind', 'book', '-score'], name='catalog_boo_kind_b15ff4_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='bookneighbor',
+            unique_together={('book', 'neighbor', 'kind')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='bookrecommendation',
+            unique_together={('member', 'book')},
+        ),
+        migrations.AddIndex(
+            model_name='discussioncomment',
+            index=models.Index(fields=['discussion', 'path'], name='catalog_dis_discuss_812bee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discussioncomment',
+            index=models.Index(fields=['discussion', 'depth', 'path'], name='catalog_dis_discuss_9687e0_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='commentlike',
+            unique_together={('comment', 'user')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='ebookfile',
+            unique_together={('book', 'format')},
+        ),
+        migrations.AddIndex(
+            model_name='ebookpassage',
+            index=models.Index(fields=['ebook', 'position'], name='catalog_ebo_ebook_i_398144_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title'], name='catalog_boo_title_3a1ffe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['isbn'], name='catalog_boo_isbn_43f845_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='challengeparticipation',
+            unique_together={('challenge', 'member')},
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', '-helpful_count', '-id'], name='catalog_rev_book_id_adbbf6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', '-created_at', '-id'], name='catalog_rev_book_id_b457c4_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.CheckConstraint(condition=models.Q(('rating__gte', 1), ('rating__lte', 5)), name='catalog_review_rating_range'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='review',
+            unique_together={('book', 'user')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='reviewvote',
+            unique_together={('review', 'user')},
+        ),
+        migrations.AddIndex(
+            model_name='searchtrigram',
+            index=models.Index(fields=['trigram', 'term'], name='catalog_sea_trigram_8da953_idx'),
+        ),
+    ]
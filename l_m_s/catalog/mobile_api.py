@@ -7,6 +7,9 @@ from catalog.models import Book, BookInstance
 from circulation.models import Loan, Fine, Reservation
 from accounts.models import MemberProfile
 from catalog.serializers import BookSerializer, LoanSerializer, FineSerializer
+from catalog.search import search_books
+from catalog.fuzzy import fuzzy_books, suggest
+from catalog.pagination import KeysetPaginator, InvalidCursor
 from django.utils import timezone
 from datetime import timedelta
 
@@ -46,21 +49,38 @@ def mobile_dashboard(request):
 
 @api_view(['GET'])
 def mobile_book_search(request):
-    """Optimized book search for mobile"""
+    """Optimized book search for mobile, one page per request via cursors"""
     query = request.GET.get('q', '')
-    page = int(request.GET.get('page', 1))
     per_page = 10
     
-    books = Book.objects.filter(
-        title__icontains=query
-    ).select_related('publisher')[:per_page * page]
+    books = Book.objects.select_related('publisher').prefetch_related('authors', 'genres')
+    suggestions = []
+    if query:
+        matches = search_books(books, query)
+        if not matches.exists():
+            suggestions = suggest(query)
+            matches = fuzzy_books(books, query)
+        books = matches
+    
+    paginator = KeysetPaginator(
+        books, 'search_rank' if query else 'title', per_page=per_page
+    )
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return Response(
+            {'error': 'Invalid cursor'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    serializer = BookSerializer(books, many=True)
+    page_books = list(page.object_list)
+    serializer = BookSerializer(page_books, many=True, context=BookSerializer.cover_images_context(page_books))
     
     return Response({
         'results': serializer.data,
-        'page': page,
-        'has_more': books.count() == per_page * page
+        'next_cursor': page.next_cursor,
+        'has_more': page.has_next(),
+        'suggestions': suggestions,
     })
 
 @api_view(['POST'])
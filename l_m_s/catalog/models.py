@@ -1,7 +1,12 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F, FloatField, DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-from .validators import validate_isbn
+from .validators import validate_isbn, normalize_isbn
+from .cache import bump_catalog_generation, expire_book_summaries
+from .utils import expire_availability_counts
 
 class Author(models.Model):
     first_name = models.CharField(max_length=100)
@@ -41,6 +46,8 @@ class Publisher(models.Model):
     def __str__(self):
         return self.name
 
+RATING_VALUES = range(1, 6)
+
 class Book(models.Model):
     LANGUAGE_CHOICES = [
         ('EN', 'English'),
@@ -57,6 +64,7 @@ class Book(models.Model):
     subtitle = models.CharField(max_length=300, blank=True)
     authors = models.ManyToManyField(Author, related_name='books')
     isbn = models.CharField('ISBN', max_length=13, unique=True, db_index=True, validators=[validate_isbn])
+    isbn13 = models.CharField('ISBN-13', max_length=13, unique=True, null=True, blank=True, editable=False)
     publisher = models.ForeignKey(Publisher, on_delete=models.SET_NULL, null=True)
     publication_date = models.DateField()
     genres = models.ManyToManyField(Genre, related_name='books')
@@ -67,10 +75,27 @@ class Book(models.Model):
     edition = models.CharField(max_length=50, blank=True)
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     total_ratings = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    ratings_1 = models.IntegerField(default=0, editable=False)
+    ratings_2 = models.IntegerField(default=0, editable=False)
+    ratings_3 = models.IntegerField(default=0, editable=False)
+    ratings_4 = models.IntegerField(default=0, editable=False)
+    ratings_5 = models.IntegerField(default=0, editable=False)
     dewey_decimal = models.CharField(max_length=20, blank=True)
+    total_copies = models.IntegerField(default=0, editable=False)
+    available_copies = models.IntegerField(default=0, editable=False)
+    on_loan_copies = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Maintained with F() updates elsewhere; a plain save() must not write
+    # back the stale in-memory values.
+    COUNTER_FIELDS = ['total_copies', 'available_copies', 'on_loan_copies']
+    RATING_FIELDS = [
+        'average_rating', 'total_ratings', 'rating_sum',
+        'ratings_1', 'ratings_2', 'ratings_3', 'ratings_4', 'ratings_5',
+    ]
+    
     class Meta:
         ordering = ['title']
         indexes = [
@@ -81,9 +106,74 @@ class Book(models.Model):
     def __str__(self):
         return self.title
     
+    def clean(self):
+        # isbn13 is not editable, so validate_unique() never looks at it.
+        isbn13 = normalize_isbn(self.isbn)
+        if isbn13 and Book.objects.filter(isbn13=isbn13).exclude(pk=self.pk).exists():
+            raise ValidationError({'isbn': 'A book with this ISBN already exists.'})
+    
+    def save(self, *args, **kwargs):
+        self.isbn13 = normalize_isbn(self.isbn)
+        if kwargs.get('update_fields') is not None and 'isbn' in kwargs['update_fields']:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'isbn13'}
+        elif kwargs.get('update_fields') is None and not self._state.adding and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS + self.RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def recount_copies(cls, book_ids):
+        """Recompute the copy counters of the given books from BookInstance."""
+        def count(status=None):
+            instances = BookInstance.objects.filter(book=OuterRef('pk'))
+            if status:
+                instances = instances.filter(status=status)
+            return Coalesce(Subquery(
+                instances.order_by().values('book').annotate(c=Count('pk')).values('c')
+            ), 0)
+        
+        book_ids = list(book_ids)
+        for start in range(0, len(book_ids), 500):
+            cls.objects.filter(pk__in=book_ids[start:start + 500]).update(
+                total_copies=count(),
+                available_copies=count('AVAILABLE'),
+                on_loan_copies=count('ON_LOAN'),
+            )
+        bump_catalog_generation()
+        expire_book_summaries(book_ids)
+        expire_availability_counts(book_ids)
+    
+    @classmethod
+    def recount_ratings(cls, book_ids):
+        """Recompute the rating aggregates of the given books from Review."""
+        def aggregate(function, rating=None):
+            reviews = Review.objects.filter(book=OuterRef('pk'))
+            if rating:
+                reviews = reviews.filter(rating=rating)
+            return Coalesce(Subquery(
+                reviews.order_by().values('book').annotate(value=function).values('value')
+            ), 0)
+        
+        book_ids = list(book_ids)
+        for start in range(0, len(book_ids), 500):
+            books = cls.objects.filter(pk__in=book_ids[start:start + 500])
+            books.update(
+                rating_sum=aggregate(Sum('rating')),
+                total_ratings=aggregate(Count('pk')),
+                **{f'ratings_{rating}': aggregate(Count('pk'), rating) for rating in RATING_VALUES}
+            )
+            books.update(average_rating=rating_average(F('rating_sum'), F('total_ratings')))
+        bump_catalog_generation()
+        expire_book_summaries(book_ids)
+    
+    def rating_histogram(self):
+        return {rating: getattr(self, f'ratings_{rating}') for rating in RATING_VALUES}
+    
     def get_availability_status(self):
-        total = self.instances.count()
-        available = self.instances.filter(status='AVAILABLE').count()
+        total = self.total_copies
+        available = self.available_copies
         
         if available == 0:
             return 'unavailable'
@@ -103,6 +193,84 @@ class Book(models.Model):
             return active_loans.due_date
         return None
 
+def copy_counter_deltas(status, sign):
+    deltas = {'total_copies': sign}
+    if status == 'AVAILABLE':
+        deltas['available_copies'] = sign
+    elif status == 'ON_LOAN':
+        deltas['on_loan_copies'] = sign
+    return deltas
+
+def adjust_copy_counters(changes):
+    """Apply ``[(book_id, status, sign), ...]`` to the Book copy counters."""
+    per_book = {}
+    for book_id, status, sign in changes:
+        deltas = per_book.setdefault(book_id, {})
+        for field, delta in copy_counter_deltas(status, sign).items():
+            deltas[field] = deltas.get(field, 0) + delta
+    
+    for book_id, deltas in per_book.items():
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if updates:
+            Book.objects.filter(pk=book_id).update(**updates)
+
+def rating_average(rating_sum, total):
+    return Cast(
+        Coalesce(Cast(rating_sum, FloatField()) / NullIf(total, 0), Value(0.0)),
+        DecimalField(max_digits=3, decimal_places=2)
+    )
+
+def adjust_rating_aggregates(changes):
+    """Apply ``[(book_id, rating, sign), ...]`` to the Book rating aggregates."""
+    from analytics.models import BookPopularity
+    
+    per_book = {}
+    for book_id, rating, sign in changes:
+        deltas = per_book.setdefault(book_id, {'rating_sum': 0, 'total_ratings': 0})
+        deltas['rating_sum'] += rating * sign
+        deltas['total_ratings'] += sign
+        # Only 1-5 have a histogram bucket; anything else is counted in the
+        # totals but not in a bucket rather than failing the save.
+        if rating in RATING_VALUES:
+            deltas[f'ratings_{rating}'] = deltas.get(f'ratings_{rating}', 0) + sign
+    
+    for book_id, deltas in per_book.items():
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if not updates:
+            continue
+        updates['average_rating'] = rating_average(
+            F('rating_sum') + deltas['rating_sum'], F('total_ratings') + deltas['total_ratings']
+        )
+        Book.objects.filter(pk=book_id).update(**updates)
+        
+        book = Book.objects.filter(pk=book_id)
+        BookPopularity.objects.filter(book_id=book_id).update(
+            total_reviews=Subquery(book.values('total_ratings')),
+            average_rating=Subquery(book.values('average_rating')),
+        )
+
+class BookInstanceQuerySet(models.QuerySet):
+    """Keeps the Book copy counters right for bulk writes, which skip save()."""
+    
+    def update(self, **kwargs):
+        if not {'status', 'book', 'book_id'}.intersection(kwargs):
+            return super().update(**kwargs)
+        
+        with transaction.atomic():
+            book_ids = set(self.order_by().values_list('book_id', flat=True).distinct())
+            rows = super().update(**kwargs)
+            new_book = kwargs.get('book', kwargs.get('book_id'))
+            if new_book is not None:
+                book_ids.add(getattr(new_book, 'pk', new_book))
+            Book.recount_copies(book_ids)
+        return rows
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic():
+            objs = super().bulk_create(objs, *args, **kwargs)
+            Book.recount_copies({obj.book_id for obj in objs})
+        return objs
+
 class BookInstance(models.Model):
     STATUS_CHOICES = [
         ('AVAILABLE', 'Available'),
@@ -131,11 +299,54 @@ class BookInstance(models.Model):
     location = models.CharField(max_length=100)
     notes = models.TextField(blank=True)
     
+    objects = BookInstanceQuerySet.as_manager()
+    
     class Meta:
         ordering = ['book', 'unique_id']
         
     def __str__(self):
         return f"{self.book.title} ({self.unique_id})"
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'status', 'book', 'book_id'}.intersection(update_fields):
+            return super().save(*args, **kwargs)
+        
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = BookInstance.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('book_id', 'status').first()
+            
+            super().save(*args, **kwargs)
+            
+            changes = [(self.book_id, self.status, 1)]
+            if previous:
+                changes.append((previous[0], previous[1], -1))
+            adjust_copy_counters(changes)
+
+class ReviewQuerySet(models.QuerySet):
+    """Keeps the Book rating aggregates right for bulk writes, which skip save()."""
+    
+    def update(self, **kwargs):
+        if not {'rating', 'book', 'book_id'}.intersection(kwargs):
+            return super().update(**kwargs)
+        
+        with transaction.atomic():
+            book_ids = set(self.order_by().values_list('book_id', flat=True).distinct())
+            rows = super().update(**kwargs)
+            new_book = kwargs.get('book', kwargs.get('book_id'))
+            if new_book is not None:
+                book_ids.add(getattr(new_book, 'pk', new_book))
+            Book.recount_ratings(book_ids)
+        return rows
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic():
+            objs = super().bulk_create(objs, *args, **kwargs)
+            Book.recount_ratings({obj.book_id for obj in objs})
+        return objs
 
 class Review(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='reviews')
@@ -147,12 +358,81 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ReviewQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         unique_together = ['book', 'user']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(rating__gte=1, rating__lte=5), name='catalog_review_rating_range'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['book', '-helpful_count', '-id']),
+            models.Index(fields=['book', '-created_at', '-id']),
+        ]
         
     def __str__(self):
         return f"{self.user.username} - {self.book.title}"
+    
+    def save(self, *args, **kwargs):
+        # helpful_count is only changed by F() updates; never write back a
+        # stale in-memory value.
+        if kwargs.get('update_fields') is None and not self._state.adding and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'helpful_count'
+            ]
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'rating', 'book', 'book_id'}.intersection(update_fields):
+            return super().save(*args, **kwargs)
+        
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = Review.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('book_id', 'rating').first()
+            
+            super().save(*args, **kwargs)
+            
+            changes = [(self.book_id, int(self.rating), 1)]
+            if previous:
+                changes.append((previous[0], previous[1], -1))
+            adjust_rating_aggregates(changes)
+    
+    def add_helpful_vote(self, user):
+        """Count ``user``'s vote once; returns False if they already voted."""
+        try:
+            with transaction.atomic():
+                ReviewVote.objects.create(review=self, user=user)
+                Review.objects.filter(pk=self.pk).update(helpful_count=F('helpful_count') + 1)
+        except IntegrityError:
+            return False
+        expire_book_summaries([self.book_id])
+        return True
+    
+    def remove_helpful_vote(self, user):
+        with transaction.atomic():
+            deleted, _ = ReviewVote.objects.filter(review=self, user=user).delete()
+            if deleted:
+                Review.objects.filter(pk=self.pk).update(helpful_count=F('helpful_count') - 1)
+        if deleted:
+            expire_book_summaries([self.book_id])
+        return bool(deleted)
+
+class ReviewVote(models.Model):
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='votes')
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['review', 'user']
+    
+    def __str__(self):
+        return f"{self.user.username} found review {self.review_id} helpful"
 
 class ReadingList(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
@@ -164,3 +444,34 @@ class ReadingList(models.Model):
     
     def __str__(self):
         return f"{self.name} - {self.user.username}"
+
+class SearchTerm(models.Model):
+    KIND_CHOICES = [
+        ('TITLE', 'Book Title'),
+        ('AUTHOR', 'Author Name'),
+    ]
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    text = models.CharField(max_length=300)
+    trigram_count = models.IntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'object_id']),
+        ]
+        
+    def __str__(self):
+        return f"{self.kind}: {self.text}"
+
+class SearchTrigram(models.Model):
+    trigram = models.CharField(max_length=3)
+    term = models.ForeignKey(SearchTerm, on_delete=models.CASCADE, related_name='trigrams')
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['trigram', 'term']),
+        ]
+        
+    def __str__(self):
+        return f"{self.trigram} -> {self.term_id}"
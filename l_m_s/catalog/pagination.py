@@ -0,0 +1,151 @@
+import base64
+import json
+from decimal import InvalidOperation
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
+from django.db.models import Q
+
+BOOK_ORDERINGS = {
+    'title': ('title', False),
+    'rating': ('average_rating', True),
+    'newest': ('publication_date', True),
+    'relevance': ('search_rank', False),
+}
+
+REVIEW_ORDERINGS = {
+    'helpful': ('helpful_count', True),
+    'newest': ('created_at', True),
+}
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(value, pk, direction='next'):
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    elif value is not None and not isinstance(value, (int, float, str)):
+        value = str(value)
+    payload = json.dumps([value, pk, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if direction not in ('next', 'previous'):
+        raise InvalidCursor('Invalid cursor')
+    return value, pk, direction
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+class KeysetPaginator:
+    """
+    Cursor pagination over ``(order_field, pk)``.
+
+    Each page is a single indexed range query for ``per_page + 1`` rows; the
+    extra row only tells whether another page exists. There is no COUNT and
+    no OFFSET, so the cost of a page does not depend on how deep it is.
+    """
+
+    def __init__(self, queryset, order_field, descending=False, per_page=20):
+        self.queryset = queryset
+        self.order_field = order_field
+        self.descending = descending
+        self.per_page = per_page
+
+    def _to_python(self, name, value):
+        """Convert a decoded cursor value with the field or annotation it orders by."""
+        meta = self.queryset.model._meta
+        if name == 'pk':
+            return meta.pk.to_python(value)
+        try:
+            field = meta.get_field(name)
+        except FieldDoesNotExist:
+            annotation = self.queryset.query.annotations.get(name)
+            if annotation is None:
+                return value
+            field = annotation.output_field
+        return field.to_python(value)
+
+    def _value(self, obj):
+        if isinstance(obj, dict):
+            return obj[self.order_field], obj['pk'] if 'pk' in obj else obj['id']
+        return getattr(obj, self.order_field), obj.pk
+
+    def page(self, cursor=None):
+        queryset = self.queryset
+        forward = True
+
+        if cursor:
+            value, pk, direction = decode_cursor(cursor)
+            forward = direction == 'next'
+            after = forward != self.descending
+            lookup = 'gt' if after else 'lt'
+            # Cursors come from the client; a tampered value must not reach
+            # the database as anything but a 400.
+            try:
+                value = self._to_python(self.order_field, value)
+                pk = self._to_python('pk', pk)
+                queryset = queryset.filter(
+                    Q(**{f'{self.order_field}__{lookup}': value}) |
+                    Q(**{self.order_field: value, f'pk__{lookup}': pk})
+                )
+            except (ValueError, TypeError, ValidationError, InvalidOperation):
+                raise InvalidCursor('Invalid cursor')
+
+        descending = self.descending if forward else not self.descending
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.order_field}', f'{prefix}pk')
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if not forward:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or not forward:
+                next_cursor = encode_cursor(*self._value(rows[-1]), 'next')
+            if cursor and (forward or has_more):
+                previous_cursor = encode_cursor(*self._value(rows[0]), 'previous')
+
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+def estimate_count(queryset, cap=10000):
+    """
+    Cheap stand-in for ``queryset.count()``.
+
+    PostgreSQL reports the planner's row estimate; other databases count at
+    most ``cap`` rows. Returns ``(count, exact)``.
+    """
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), False
+
+    count = queryset.order_by()[:cap].count()
+    return count, count < cap
@@ -0,0 +1,284 @@
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from catalog.models import Book, Review
+from catalog.advanced_models import BookRecommendation, BookNeighbor, RecommendationState
+from catalog.vector_store import get_store
+from circulation.models import Loan
+
+def load_loan_matrix(chunk_size=50000):
+    """
+    Binary member x book matrix of everything ever borrowed.
+
+    Returns ``(matrix, member_ids, book_ids)`` where row ``r`` belongs to
+    ``member_ids[r]`` and column ``c`` to ``book_ids[c]``.
+    """
+    pairs = Loan.objects.order_by().values_list('member_id', 'book_instance__book_id').distinct()
+
+    members, books, chunk = [], [], []
+    for pair in pairs.iterator(chunk_size=chunk_size):
+        chunk.append(pair)
+        if len(chunk) >= chunk_size:
+            array = np.array(chunk, dtype=np.int64)
+            members.append(array[:, 0])
+            books.append(array[:, 1])
+            chunk = []
+    if chunk:
+        array = np.array(chunk, dtype=np.int64)
+        members.append(array[:, 0])
+        books.append(array[:, 1])
+
+    if not members:
+        empty = np.array([], dtype=np.int64)
+        return sparse.csr_matrix((0, 0), dtype=np.float32), empty, empty
+
+    member_ids, rows = np.unique(np.concatenate(members), return_inverse=True)
+    book_ids, cols = np.unique(np.concatenate(books), return_inverse=True)
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(member_ids), len(book_ids))
+    )
+    matrix.sum_duplicates()
+    matrix.data.fill(1)
+    return matrix, member_ids, book_ids
+
+def top_k_per_row(matrix, k):
+    """Keep only the ``k`` largest entries of every row of a sparse matrix."""
+    matrix = sparse.csr_matrix(matrix)
+    matrix.eliminate_zeros()
+    lengths = np.diff(matrix.indptr)
+    keep = np.ones(matrix.nnz, dtype=bool)
+
+    for row in np.flatnonzero(lengths > k):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        drop = np.argpartition(-matrix.data[start:end], k)[k:]
+        keep[start + drop] = False
+
+    rows = np.repeat(np.arange(matrix.shape[0]), lengths)[keep]
+    return sparse.csr_matrix(
+        (matrix.data[keep], (rows, matrix.indices[keep])), shape=matrix.shape
+    )
+
+def cosine_neighbors(vectors, k=20, block_size=2000):
+    """
+    Top ``k`` neighbours of every row of L2-normalized sparse ``vectors``.
+
+    Similarities are computed one block of rows at a time, so memory stays
+    bounded by ``block_size`` rows of the product rather than the full
+    row x row matrix. The result is a sparse row x row matrix.
+    """
+    vectors = sparse.csr_matrix(vectors)
+    transposed = vectors.T.tocsr()
+
+    n_rows = vectors.shape[0]
+    blocks = []
+    for start in range(0, n_rows, block_size):
+        block = (vectors[start:start + block_size] @ transposed).tocoo()
+        off_diagonal = block.col != block.row + start
+        block = sparse.csr_matrix(
+            (block.data[off_diagonal], (block.row[off_diagonal], block.col[off_diagonal])),
+            shape=block.shape
+        )
+        blocks.append(top_k_per_row(block, k))
+
+    if not blocks:
+        return sparse.csr_matrix((0, 0), dtype=np.float32)
+    return sparse.vstack(blocks, format='csr')
+
+def item_neighbors(matrix, k=20, block_size=2000):
+    """Top ``k`` co-borrowing neighbours of every book by cosine similarity."""
+    counts = np.asarray(matrix.sum(axis=0)).ravel()
+    norms = np.sqrt(counts)
+    norms[norms == 0] = 1
+    normalized = sparse.csr_matrix(matrix @ sparse.diags(1.0 / norms).astype(np.float32))
+    return cosine_neighbors(normalized.T, k, block_size)
+
+def reviewed_matrix(member_ids, book_ids):
+    """
+    Member x book matrix of reviews, aligned with the sorted ``member_ids``
+    and ``book_ids`` of a loan matrix block.
+    """
+    pairs = Review.objects.filter(
+        user__profile__id__in=[int(member_id) for member_id in member_ids]
+    ).values_list('user__profile__id', 'book_id')
+    pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+
+    cols = np.searchsorted(book_ids, pairs[:, 1])
+    # Reviewed books nobody borrowed have no column and are never scored.
+    known = cols < len(book_ids)
+    known[known] = book_ids[cols[known]] == pairs[known, 1]
+    rows = np.searchsorted(member_ids, pairs[known, 0])
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols[known])),
+        shape=(len(member_ids), len(book_ids))
+    )
+    matrix.sum_duplicates()
+    return matrix
+
+def score_members(history, neighbors, top_n, seen=None):
+    """
+    Top ``top_n`` unseen books for each row of ``history``.
+
+    A book's score is the summed similarity to everything the member has
+    borrowed. Borrowed books, and anything marked in ``seen``, are left out.
+    """
+    scores = sparse.csr_matrix(history @ neighbors)
+    if seen is not None:
+        history = history.maximum(seen)
+    scores = scores - scores.multiply(history)
+    return top_k_per_row(scores, top_n)
+
+def best_reason(history_books, neighbors_by_target, book):
+    """Index of the borrowed book that contributes most to ``book``'s score."""
+    start, end = neighbors_by_target.indptr[book], neighbors_by_target.indptr[book + 1]
+    sources = neighbors_by_target.indices[start:end]
+    weights = neighbors_by_target.data[start:end]
+    mask = np.isin(sources, history_books)
+    return sources[mask][np.argmax(weights[mask])]
+
+def save_neighbors(neighbors, book_ids, kind='LOAN', batch_size=5000):
+    coo = neighbors.tocoo()
+    with transaction.atomic():
+        BookNeighbor.objects.filter(kind=kind).delete()
+        for start in range(0, coo.nnz, batch_size):
+            end = start + batch_size
+            BookNeighbor.objects.bulk_create([
+                BookNeighbor(book_id=int(book_ids[row]), neighbor_id=int(book_ids[col]), kind=kind, score=float(score))
+                for row, col, score in zip(coo.row[start:end], coo.col[start:end], coo.data[start:end])
+            ])
+
+def save_recommendations(member_ids, book_ids, history, scores, neighbors_by_target):
+    """Replace the stored recommendations of the members in this block."""
+    rows = []
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        history_books = history.indices[history.indptr[row]:history.indptr[row + 1]]
+        for book, score in zip(scores.indices[start:end], scores.data[start:end]):
+            reason = best_reason(history_books, neighbors_by_target, book)
+            rows.append((int(member_ids[row]), int(book_ids[book]), float(score), int(book_ids[reason])))
+
+    titles = dict(Book.objects.filter(pk__in={row[3] for row in rows}).values_list('pk', 'title'))
+
+    with transaction.atomic():
+        BookRecommendation.objects.filter(member_id__in=[int(m) for m in member_ids]).delete()
+        BookRecommendation.objects.bulk_create([
+            BookRecommendation(
+                member_id=member_id,
+                book_id=book_id,
+                score=score,
+                reason=f"Because you borrowed {titles.get(reason_id, 'a similar book')}"[:200],
+            )
+            for member_id, book_id, score, reason_id in rows
+        ], batch_size=1000)
+    return len(rows)
+
+def mark_stale(member_id):
+    RecommendationState.objects.update_or_create(member_id=member_id, defaults={'is_stale': True})
+
+def mark_refreshed(member_ids):
+    member_ids = [int(member_id) for member_id in member_ids]
+    now = timezone.now()
+    RecommendationState.objects.filter(member_id__in=member_ids).update(is_stale=False, refreshed_at=now)
+    RecommendationState.objects.bulk_create([
+        RecommendationState(member_id=member_id, is_stale=False, refreshed_at=now)
+        for member_id in member_ids
+    ], ignore_conflicts=True)
+
+def build_recommendations(top_n=None, neighbor_count=None, block_size=5000, stale_only=False):
+    """
+    Rebuild item neighbours and members' recommendations from loans.
+
+    With ``stale_only`` only members whose history changed since their last
+    refresh are scored again. Returns ``(members, recommendations)`` written.
+    """
+    top_n = top_n or getattr(settings, 'CATALOG_RECOMMENDATIONS_PER_MEMBER', 20)
+    neighbor_count = neighbor_count or getattr(settings, 'CATALOG_RECOMMENDATION_NEIGHBORS', 20)
+
+    matrix, member_ids, book_ids = load_loan_matrix()
+    neighbors = item_neighbors(matrix, neighbor_count)
+    save_neighbors(neighbors, book_ids)
+
+    rows = np.arange(len(member_ids))
+    if stale_only:
+        fresh = RecommendationState.objects.filter(is_stale=False).values_list('member_id', flat=True)
+        rows = rows[~np.isin(member_ids, np.fromiter(fresh, dtype=np.int64))]
+
+    neighbors_by_target = neighbors.T.tocsr()
+    written = 0
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        history = matrix[block]
+        # Borrowed and reviewed books are excluded, as in refresh_member().
+        seen = reviewed_matrix(member_ids[block], book_ids)
+        scores = score_members(history, neighbors, top_n, seen)
+        written += save_recommendations(
+            member_ids[block], book_ids, history, scores, neighbors_by_target
+        )
+        mark_refreshed(member_ids[block])
+
+    return len(rows), written
+
+def refresh_member(member_id, top_n=None):
+    """
+    Recompute one member's recommendations from the stored neighbour table.
+
+    Reads the member's borrowed and reviewed books, then the neighbours of
+    the borrowed ones from the shared vector store (or BookNeighbor when
+    nothing is published), instead of rebuilding the whole matrix. Like
+    build_recommendations(), it leaves out borrowed and reviewed books.
+    Returns the number of recommendations written.
+    """
+    top_n = top_n or getattr(settings, 'CATALOG_RECOMMENDATIONS_PER_MEMBER', 20)
+
+    borrowed = set(
+        Loan.objects.filter(member_id=member_id).values_list('book_instance__book_id', flat=True)
+    )
+    seen = borrowed | set(
+        Review.objects.filter(user__profile__id=member_id).values_list('book_id', flat=True)
+    )
+
+    store = get_store()
+    if store is not None:
+        neighbors = [
+            (book_id, neighbor_id, score)
+            for book_id in borrowed
+            for neighbor_id, score in store.neighbors('LOAN', book_id)
+        ]
+    else:
+        neighbors = BookNeighbor.objects.filter(kind='LOAN', book_id__in=borrowed).values_list(
+            'book_id', 'neighbor_id', 'score'
+        )
+    
+    scores, reasons = {}, {}
+    for book_id, neighbor_id, score in neighbors:
+        if neighbor_id in seen:
+            continue
+        scores[neighbor_id] = scores.get(neighbor_id, 0.0) + score
+        if score > reasons.get(neighbor_id, (None, 0.0))[1]:
+            reasons[neighbor_id] = (book_id, score)
+
+    top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_n]
+    reason_ids = {reasons[book_id][0] for book_id, score in top}
+    if store is not None:
+        titles = {book_id: store.title(book_id) for book_id in reason_ids}
+    else:
+        titles = dict(Book.objects.filter(pk__in=reason_ids).values_list('pk', 'title'))
+
+    with transaction.atomic():
+        BookRecommendation.objects.filter(member_id=member_id).delete()
+        BookRecommendation.objects.bulk_create([
+            BookRecommendation(
+                member_id=member_id,
+                book_id=book_id,
+                score=score,
+                reason=f"Because you borrowed {titles.get(reasons[book_id][0], 'a similar book')}"[:200],
+            )
+            for book_id, score in top
+        ])
+        mark_refreshed([member_id])
+
+    return len(top)
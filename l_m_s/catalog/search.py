@@ -0,0 +1,181 @@
+import re
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, When, IntegerField, Q, Value
+from django.utils.module_loading import import_string
+from .validators import normalize_isbn
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_backend = None
+
+def get_search_backend():
+    """Return the configured catalog search backend (cached per process)."""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'CATALOG_SEARCH_BACKEND', 'catalog.search.SQLiteFTSBackend')
+        backend_class = import_string(path)
+        if not backend_class.is_supported():
+            backend_class = DatabaseSearchBackend
+        _backend = backend_class()
+    return _backend
+
+def search_books(queryset, query, backend=None):
+    """
+    Restrict a Book queryset to the matches for ``query``.
+
+    The queryset is annotated with ``search_rank`` (0 is the best match) so
+    callers can order by relevance.
+    """
+    isbn13 = normalize_isbn(query.strip())
+    if isbn13:
+        matches = queryset.filter(isbn13=isbn13)
+        # A number that only looks like an ISBN may still appear in the text.
+        if matches.exists():
+            return matches.annotate(search_rank=Value(0))
+
+    backend = backend or get_search_backend()
+    return rank_by_ids(queryset, backend.search(query))
+
+def rank_by_ids(queryset, book_ids):
+    """Filter to ``book_ids`` and annotate ``search_rank`` with their position."""
+    if not book_ids:
+        return queryset.none().annotate(search_rank=Value(0))
+
+    ranking = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(book_ids)],
+        output_field=IntegerField()
+    )
+    return queryset.filter(pk__in=book_ids).annotate(search_rank=ranking)
+
+def get_book_document(book):
+    """Collect the searchable text of a book."""
+    authors = ' '.join(f"{a.first_name} {a.last_name}" for a in book.authors.all())
+    genres = ' '.join(g.name for g in book.genres.all())
+
+    return {
+        'title': book.title,
+        'subtitle': book.subtitle,
+        'description': book.description,
+        'authors': authors,
+        'genres': genres,
+        'publisher': book.publisher.name if book.publisher_id else '',
+    }
+
+class BaseSearchBackend:
+    max_results = 1000
+
+    def __init__(self):
+        self.max_results = getattr(settings, 'CATALOG_SEARCH_MAX_RESULTS', self.max_results)
+
+    @classmethod
+    def is_supported(cls):
+        return True
+
+    def search(self, query, limit=None):
+        """Return matching book ids, best match first."""
+        raise NotImplementedError
+
+    def index_book(self, book):
+        pass
+
+    def remove_book(self, book_id):
+        pass
+
+    def ensure_table(self):
+        pass
+
+    def rebuild(self):
+        pass
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Portable fallback using ``icontains`` lookups, ordered by title."""
+
+    def search(self, query, limit=None):
+        from catalog.models import Book
+
+        terms = TOKEN_RE.findall(query)
+        if not terms:
+            return []
+
+        books = Book.objects.all()
+        for term in terms:
+            books = books.filter(
+                Q(title__icontains=term) |
+                Q(subtitle__icontains=term) |
+                Q(authors__first_name__icontains=term) |
+                Q(authors__last_name__icontains=term) |
+                Q(genres__name__icontains=term) |
+                Q(publisher__name__icontains=term)
+            )
+
+        book_ids = books.order_by('title').values_list('pk', flat=True).distinct()
+        return list(book_ids[:limit or self.max_results])
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    Ranked search over an FTS5 virtual table.
+
+    The table is created after ``migrate`` and kept in sync by the signal
+    handlers in ``catalog.signals``.
+    """
+    table = 'catalog_book_fts'
+    columns = ['title', 'subtitle', 'description', 'authors', 'genres', 'publisher']
+    weights = [10.0, 4.0, 1.0, 6.0, 2.0, 1.5]
+
+    @classmethod
+    def is_supported(cls):
+        return connection.vendor == 'sqlite'
+
+    def ensure_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                f"{', '.join(self.columns)}, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def build_match(self, query):
+        """Turn free text into an FTS5 expression of quoted prefix terms."""
+        terms = TOKEN_RE.findall(query.lower())
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, query, limit=None):
+        match = self.build_match(query)
+        if not match:
+            return []
+
+        weights = ', '.join(str(w) for w in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT %s",
+                [match, limit or self.max_results]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index_book(self, book):
+        document = get_book_document(book)
+        placeholders = ', '.join(['%s'] * len(self.columns))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [book.pk])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, {', '.join(self.columns)}) "
+                f"VALUES (%s, {placeholders})",
+                [book.pk] + [document[column] for column in self.columns]
+            )
+
+    def remove_book(self, book_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [book_id])
+
+    def rebuild(self):
+        from catalog.models import Book
+
+        self.ensure_table()
+        books = Book.objects.select_related('publisher').prefetch_related('authors', 'genres')
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table}")
+            for book in books.iterator(chunk_size=2000):
+                self.index_book(book)
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from catalog.models import Book, BookInstance, Author, Genre
 from circulation.models import Loan, Fine
 from accounts.models import MemberProfile
+from catalog.images import derivative_urls, derivative_urls_many
 
 class AuthorSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,17 +18,30 @@ class BookSerializer(serializers.ModelSerializer):
     authors = AuthorSerializer(many=True, read_only=True)
     genres = GenreSerializer(many=True, read_only=True)
     available_copies = serializers.SerializerMethodField()
+    cover_images = serializers.SerializerMethodField()
     
     class Meta:
         model = Book
         fields = [
             'id', 'title', 'subtitle', 'isbn', 'publication_date',
             'pages', 'language', 'description', 'average_rating',
-            'total_ratings', 'authors', 'genres', 'available_copies'
+            'total_ratings', 'authors', 'genres', 'available_copies',
+            'cover_images'
         ]
     
     def get_available_copies(self, obj):
-        return obj.instances.filter(status='AVAILABLE').count()
+        return obj.available_copies
+    
+    @staticmethod
+    def cover_images_context(books):
+        """Serializer context that looks up every cover of ``books`` at once."""
+        return {'cover_images': derivative_urls_many(book.cover_image for book in books)}
+    
+    def get_cover_images(self, obj):
+        cover_images = self.context.get('cover_images')
+        if cover_images is None:
+            return derivative_urls(obj.cover_image)
+        return cover_images.get(obj.cover_image.name, {})
 
 class BookInstanceSerializer(serializers.ModelSerializer):
     book_title = serializers.CharField(source='book.title', read_only=True)
@@ -0,0 +1,202 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from catalog.models import (
+    Book, BookInstance, Author, Genre, Publisher, Review, adjust_copy_counters, adjust_rating_aggregates
+)
+from catalog.advanced_models import BookDiscussion, DiscussionComment, EBookFile
+from catalog.ebook_text import ensure_text_table, remove_ebook_text
+from catalog.tasks import queue_ebook_text, queue_member_refresh
+from catalog.images import image_changed, schedule_derivatives
+from catalog.cache import bump_catalog_generation, expire_book_summaries
+from catalog.search import get_search_backend
+from catalog.utils import expire_availability_counts
+from catalog import fuzzy, autocomplete
+from catalog.recommendations import mark_stale
+from analytics.models import BookPopularity
+from accounts.models import MemberProfile
+from circulation.models import Loan
+
+def reindex_books(books):
+    backend = get_search_backend()
+    for book in books.select_related('publisher').prefetch_related('authors', 'genres'):
+        backend.index_book(book)
+
+def create_search_table(sender, **kwargs):
+    get_search_backend().ensure_table()
+    ensure_text_table()
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, **kwargs):
+    get_search_backend().index_book(instance)
+    fuzzy.index_book(instance)
+    autocomplete.update_book(instance)
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    get_search_backend().remove_book(instance.pk)
+    fuzzy.remove_term('TITLE', instance.pk)
+    autocomplete.remove_book(instance.pk)
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+def reindex_book_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # post_clear gets no pk_set, so remember which books are affected.
+        instance._cleared_book_ids = list(instance.books.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    bump_catalog_generation()
+
+    if not reverse:
+        expire_book_summaries([instance.pk])
+        get_search_backend().index_book(instance)
+        return
+
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_book_ids', [])
+    if pk_set:
+        expire_book_summaries(pk_set)
+        reindex_books(Book.objects.filter(pk__in=pk_set))
+
+@receiver(post_save, sender=Author)
+def reindex_author_books(sender, instance, created, **kwargs):
+    fuzzy.index_author(instance)
+    autocomplete.update_author(instance)
+    if not created:
+        bump_catalog_generation()
+        expire_book_summaries(instance.books.values_list('pk', flat=True))
+        reindex_books(instance.books.all())
+
+@receiver(post_delete, sender=Author)
+def unindex_author(sender, instance, **kwargs):
+    fuzzy.remove_term('AUTHOR', instance.pk)
+    autocomplete.remove_author(instance.pk)
+
+@receiver(post_save, sender=Genre)
+def reindex_genre_books(sender, instance, created, **kwargs):
+    if not created:
+        bump_catalog_generation()
+        expire_book_summaries(instance.books.values_list('pk', flat=True))
+        reindex_books(instance.books.all())
+
+@receiver(post_save, sender=Publisher)
+def reindex_publisher_books(sender, instance, created, **kwargs):
+    if not created:
+        bump_catalog_generation()
+        expire_book_summaries(Book.objects.filter(publisher=instance).values_list('pk', flat=True))
+        reindex_books(Book.objects.filter(publisher=instance))
+
+@receiver(post_save, sender=BookPopularity)
+def reweight_suggestions(sender, instance, **kwargs):
+    autocomplete.update_book_score(instance.book_id, instance.popularity_score)
+
+@receiver(post_delete, sender=BookInstance)
+def release_copy_counters(sender, instance, **kwargs):
+    adjust_copy_counters([(instance.book_id, instance.status, -1)])
+
+@receiver(post_delete, sender=Review)
+def release_rating(sender, instance, **kwargs):
+    adjust_rating_aggregates([(instance.book_id, instance.rating, -1)])
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def expire_availability(sender, instance, **kwargs):
+    expire_availability_counts([instance.book_id])
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def expire_book_list_results(sender, **kwargs):
+    bump_catalog_generation()
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def expire_book_summary(sender, instance, **kwargs):
+    expire_book_summaries([instance.pk])
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def expire_related_book_summary(sender, instance, **kwargs):
+    expire_book_summaries([instance.book_id])
+
+# The books of a deleted author, genre or publisher are collected before the
+# delete and reindexed after it, once their links are gone.
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+def collect_relation_books(sender, instance, **kwargs):
+    instance._deleted_book_ids = list(instance.books.values_list('pk', flat=True))
+
+@receiver(pre_delete, sender=Publisher)
+def collect_publisher_books(sender, instance, **kwargs):
+    instance._deleted_book_ids = list(Book.objects.filter(publisher=instance).values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Publisher)
+def reindex_deleted_relation_books(sender, instance, **kwargs):
+    book_ids = instance.__dict__.pop('_deleted_book_ids', [])
+    if book_ids:
+        bump_catalog_generation()
+        expire_book_summaries(book_ids)
+        reindex_books(Book.objects.filter(pk__in=book_ids))
+
+@receiver(post_save, sender=Loan)
+def flag_stale_recommendations(sender, instance, created, **kwargs):
+    if created:
+        mark_stale(instance.member_id)
+
+@receiver(post_save, sender=Review)
+def refresh_reviewer_recommendations(sender, instance, **kwargs):
+    member_id = MemberProfile.objects.filter(user_id=instance.user_id).values_list('pk', flat=True).first()
+    if member_id is not None:
+        queue_member_refresh(member_id)
+
+@receiver(post_delete, sender=DiscussionComment)
+def release_comment_counters(sender, instance, **kwargs):
+    if instance.parent_id:
+        DiscussionComment.objects.filter(pk=instance.parent_id).update(replies_count=F('replies_count') - 1)
+    BookDiscussion.record_activity(instance.discussion_id, -1)
+
+@receiver(post_save, sender=EBookFile)
+def unindex_inactive_ebook(sender, instance, **kwargs):
+    # Reactivated files are extracted again by the next indexing run.
+    if not instance.is_active:
+        remove_ebook_text(instance.pk)
+        EBookFile.objects.filter(pk=instance.pk).update(text_status='PENDING')
+
+@receiver(post_save, sender=EBookFile)
+def index_new_ebook(sender, instance, **kwargs):
+    if instance.is_active and instance.text_status == 'PENDING':
+        transaction.on_commit(queue_ebook_text)
+
+@receiver(pre_delete, sender=EBookFile)
+def unindex_deleted_ebook(sender, instance, **kwargs):
+    remove_ebook_text(instance.pk)
+
+@receiver(pre_save, sender=Book)
+def note_new_cover(sender, instance, **kwargs):
+    instance._new_cover = image_changed(instance, 'cover_image')
+
+@receiver(post_save, sender=Book)
+def build_cover_derivatives(sender, instance, **kwargs):
+    if instance.__dict__.pop('_new_cover', False):
+        book_id = instance.pk
+        schedule_derivatives(instance.cover_image, lambda: expire_book_summaries([book_id]))
+
+@receiver(pre_save, sender=Author)
+def note_new_photo(sender, instance, **kwargs):
+    instance._new_photo = image_changed(instance, 'photo')
+
+@receiver(post_save, sender=Author)
+def build_photo_derivatives(sender, instance, **kwargs):
+    if instance.__dict__.pop('_new_photo', False):
+        schedule_derivatives(instance.photo)
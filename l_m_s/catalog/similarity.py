@@ -0,0 +1,116 @@
+import re
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from catalog.models import Book
+from catalog.advanced_models import BookNeighbor
+from catalog.fuzzy import normalize
+from catalog.recommendations import cosine_neighbors, save_neighbors
+from catalog.vector_store import get_store
+
+WORD_RE = re.compile(r'[^\W\d_]{3,}', re.UNICODE)
+
+STOP_WORDS = frozenset('''
+    about after again all also and any are because been before being between both but
+    can could did does during each few for from had has have her here him his how into
+    its just more most not now off once only other our out over own same she should some
+    such than that the their them then there these they this those through too under
+    until very was were what when where which while who whom why will with would you your
+'''.split())
+
+# Repeat counts: how much a term from each field weighs against a
+# description term.
+FIELD_WEIGHTS = {'title': 3, 'genre': 2, 'author': 2, 'description': 1}
+
+def book_terms(title, description, genres, authors):
+    """Weighted term counts for one book; genres and authors are whole tokens."""
+    counts = {}
+
+    def add(term, weight):
+        counts[term] = counts.get(term, 0) + weight
+
+    for field, text in (('title', title), ('description', description)):
+        for word in WORD_RE.findall(normalize(text or '')):
+            if word not in STOP_WORDS:
+                add(word, FIELD_WEIGHTS[field])
+    for genre_id in genres:
+        add(f'genre:{genre_id}', FIELD_WEIGHTS['genre'])
+    for author_id in authors:
+        add(f'author:{author_id}', FIELD_WEIGHTS['author'])
+    return counts
+
+def load_documents():
+    """Return ``(book_ids, term_counts)`` for the whole catalog."""
+    genres, authors = {}, {}
+    for book_id, genre_id in Book.genres.through.objects.values_list('book_id', 'genre_id').iterator(chunk_size=20000):
+        genres.setdefault(book_id, []).append(genre_id)
+    for book_id, author_id in Book.authors.through.objects.values_list('book_id', 'author_id').iterator(chunk_size=20000):
+        authors.setdefault(book_id, []).append(author_id)
+
+    book_ids, documents = [], []
+    books = Book.objects.order_by('pk').values_list('pk', 'title', 'description')
+    for book_id, title, description in books.iterator(chunk_size=5000):
+        book_ids.append(book_id)
+        documents.append(book_terms(title, description, genres.get(book_id, ()), authors.get(book_id, ())))
+    return np.array(book_ids, dtype=np.int64), documents
+
+def tfidf_matrix(documents, max_df=0.5):
+    """
+    L2-normalized TF-IDF rows (sublinear tf, smoothed idf).
+
+    Terms found in a single book cannot make two books similar, and terms
+    in more than ``max_df`` of the books barely separate them, so both are
+    dropped before weighting.
+    """
+    vocabulary = {}
+    rows, cols, values = [], [], []
+    for row, counts in enumerate(documents):
+        for term, count in counts.items():
+            rows.append(row)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+            values.append(count)
+
+    shape = (len(documents), len(vocabulary))
+    counts = sparse.csr_matrix(
+        (np.array(values, dtype=np.float32), (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64))),
+        shape=shape
+    )
+
+    df = np.bincount(counts.indices, minlength=shape[1])
+    keep = (df > 1) & (df <= max(max_df * shape[0], 2))
+    counts = counts[:, np.flatnonzero(keep)]
+    df = df[keep]
+
+    tf = counts.copy()
+    tf.data = 1 + np.log(tf.data)
+    idf = np.log((1 + shape[0]) / (1 + df)) + 1
+    weighted = sparse.csr_matrix(tf @ sparse.diags(idf.astype(np.float32)))
+
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ weighted)
+
+def build_similar_books(k=None):
+    """Precompute the top ``k`` content neighbours of every book."""
+    k = k or getattr(settings, 'CATALOG_SIMILAR_BOOKS', 10)
+    book_ids, documents = load_documents()
+    vectors = tfidf_matrix(documents)
+    neighbors = cosine_neighbors(vectors, k)
+    save_neighbors(neighbors, book_ids, kind='CONTENT')
+    return len(book_ids), neighbors.nnz
+
+def similar_books(book_id, limit=None):
+    """Precomputed neighbours, read from the shared vector store when it has the book."""
+    limit = limit or getattr(settings, 'CATALOG_SIMILAR_BOOKS', 10)
+    store = get_store()
+    if store is not None and book_id in store:
+        return [
+            {'id': neighbor_id, 'title': store.title(neighbor_id), 'score': round(score, 4)}
+            for neighbor_id, score in store.neighbors('CONTENT', book_id, limit)
+        ]
+    
+    neighbors = BookNeighbor.objects.filter(book_id=book_id, kind='CONTENT').order_by('-score')
+    return [
+        {'id': neighbor_id, 'title': title, 'score': round(score, 4)}
+        for neighbor_id, title, score in neighbors.values_list('neighbor_id', 'neighbor__title', 'score')[:limit]
+    ]
@@ -0,0 +1,38 @@
+import logging
+from celery import shared_task
+from django.db import transaction
+from catalog.ebook_text import index_pending_ebooks
+from catalog.recommendations import refresh_member
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def index_ebook_text():
+    summary = index_pending_ebooks()
+    return f'Indexed e-book text: {summary}'
+
+def queue_ebook_text():
+    """Ask a worker to index pending e-book text; the beat catch-up covers a missed queue."""
+    try:
+        index_ebook_text.delay()
+    except Exception:
+        logger.exception('Could not queue e-book text indexing')
+
+@shared_task
+def refresh_member_recommendations(member_id):
+    try:
+        return refresh_member(member_id)
+    except Exception:
+        # The member stays stale and the next build_recommendations run
+        # picks them up.
+        logger.exception('Could not refresh recommendations of member %s', member_id)
+        return 0
+
+def queue_member_refresh(member_id):
+    """Refresh ``member_id``'s recommendations on a worker once the transaction commits."""
+    def queue():
+        try:
+            refresh_member_recommendations.delay(member_id)
+        except Exception:
+            logger.exception('Could not queue a recommendation refresh for member %s', member_id)
+    transaction.on_commit(queue)
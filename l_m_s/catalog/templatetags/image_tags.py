@@ -0,0 +1,31 @@
+from django import template
+from django.utils.html import format_html
+from catalog.images import derivative_urls
+
+register = template.Library()
+
+@register.simple_tag
+def image_url(image, size='small', image_format='jpeg'):
+    """URL of a derivative, or of the original until derivatives exist."""
+    if not image:
+        return ''
+    derivative = derivative_urls(image).get(size, {})
+    return derivative.get(image_format) or image.url
+
+@register.simple_tag
+def picture(image, size='small', alt='', css_class=''):
+    """
+    ``<picture>`` offering the WebP derivative with a JPEG fallback.
+
+    Usage: ``{% load image_tags %}{% picture book.cover_image 'small' alt=book.title %}``
+    """
+    if not image:
+        return ''
+    derivative = derivative_urls(image).get(size)
+    if not derivative:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', image.url, alt, css_class)
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">'
+        '<img src="{}" width="{}" height="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        derivative['webp'], derivative['jpeg'], derivative['width'], derivative['height'], alt, css_class
+    )
@@ -1,7 +1,58 @@
-from django.test import TestCase
-from django.contrib.auth.models import User
-from catalog.models import Book, Author, Genre, Publisher, BookInstance, Review
+from django.test import RequestFactory, TestCase, override_settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, QueryDict
+from django.utils.http import http_date
+from django.template import Context, Template
+from rest_framework.test import APIRequestFactory
+from catalog.models import (
+    Author, Book, BookInstance, Genre, Publisher, Review, ReviewVote, adjust_rating_aggregates,
+)
+from catalog.advanced_models import (
+    BookDiscussion, BookNeighbor, BookRecommendation, CommentLike, DiscussionComment, EBookDownload,
+    EBookFile, EBookPassage, EBookUpload, ImageDerivative, RecommendationState,
+)
+from catalog import advanced_views, api_views, autocomplete, views
+from catalog.api_models import APIKey
+from catalog.autocomplete import PrefixIndex, reset_index
+from catalog.cache import expire_keys, get_catalog_generation, get_or_compute, result_cache_key
+from catalog.downloads import parse_range
+from catalog.ebook_text import extract_epub, index_pending_ebooks, search_ebook_text
+from catalog.facets import apply_facet_filters, facet_counts
+from catalog.fuzzy import fuzzy_books, suggest, trigrams
+from catalog.images import derivative_urls, derivative_urls_many, derivatives_cache_key
+from catalog.mobile_api import mobile_book_search
+from catalog.pagination import InvalidCursor, KeysetPaginator, encode_cursor, estimate_count
+from catalog.recommendations import build_recommendations, refresh_member, top_k_per_row
+from catalog.search import search_books
+from catalog.serializers import BookSerializer
+from catalog.similarity import build_similar_books, similar_books, tfidf_matrix
+from catalog.utils import get_thread_page
+from catalog.validators import normalize_isbn
+from catalog.vector_store import get_store, publish_store, read_arrays, reset_store, write_arrays
+from accounts.models import LibrarianProfile
+from analytics.models import BookPopularity
+from circulation import views as circulation_views
+from circulation.models import Loan
 from datetime import date
+from io import StringIO
+from unittest import mock
+from PIL import Image
+from scipy import sparse
+import numpy as np
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
 
 class BookModelTests(TestCase):
     def setUp(self):
@@ -82,3 +133,1556 @@ class ReviewTests(TestCase):
         )
         self.assertEqual(review.rating, 5)
         self.assertEqual(review.title, 'Great book!')
+
+class BookSearchTests(TestCase):
+    def setUp(self):
+        self.publisher = Publisher.objects.create(name='Scribner', country='USA')
+        self.author = Author.objects.create(first_name='Ernest', last_name='Hemingway')
+        self.book = Book.objects.create(
+            title='The Old Man and the Sea',
+            isbn='9780684801223',
+            publisher=self.publisher,
+            publication_date=date.today(),
+            pages=127
+        )
+        self.book.authors.add(self.author)
+        self.other = Book.objects.create(
+            title='Fishing Stories',
+            isbn='9780000000002',
+            publication_date=date.today(),
+            pages=200,
+            description='Tales of the old sea and the men who fish it.'
+        )
+    
+    def search(self, query):
+        return list(search_books(Book.objects.all(), query).order_by('search_rank'))
+    
+    def test_search_by_author_name(self):
+        self.assertEqual(self.search('hemingway'), [self.book])
+    
+    def test_title_match_ranks_above_description(self):
+        self.assertEqual(self.search('old sea'), [self.book, self.other])
+    
+    def test_search_by_isbn(self):
+        self.assertEqual(self.search('978-0-684-80122-3'), [self.book])
+    
+    def test_author_rename_updates_index(self):
+        self.author.last_name = 'Hemmingway'
+        self.author.save()
+        self.assertEqual(self.search('hemmingway'), [self.book])
+        self.assertEqual(self.search('hemingway'), [])
+    
+    def test_deleted_book_is_removed(self):
+        self.other.delete()
+        self.assertEqual(self.search('fishing'), [])
+    
+    def test_deleted_relations_are_unindexed(self):
+        self.author.delete()
+        self.assertEqual(self.search('hemingway'), [])
+        
+        self.assertEqual(self.search('scribner'), [self.book])
+        self.publisher.delete()
+        self.assertEqual(self.search('scribner'), [])
+    
+    def test_reverse_clear_reindexes_books(self):
+        genre = Genre.objects.create(name='Nautical')
+        genre.books.add(self.book, self.other)
+        self.assertEqual(len(self.search('nautical')), 2)
+        
+        genre.books.clear()
+        self.assertEqual(self.search('nautical'), [])
+
+class FuzzySearchTests(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(first_name='F. Scott', last_name='Fitzgerald')
+        self.book = Book.objects.create(
+            title='The Great Gatsby',
+            isbn='9780743273565',
+            publication_date=date.today(),
+            pages=180
+        )
+        self.book.authors.add(self.author)
+    
+    def fuzzy(self, query):
+        return list(fuzzy_books(Book.objects.all(), query).order_by('search_rank'))
+    
+    def test_trigrams_are_padded_per_word(self):
+        self.assertEqual(trigrams('Ab'), {'  a', ' ab', 'ab '})
+    
+    def test_misspelt_author_matches(self):
+        self.assertEqual(self.fuzzy('Fitzgerld'), [self.book])
+    
+    def test_misspelt_title_word_matches(self):
+        self.assertEqual(self.fuzzy('gatsbi'), [self.book])
+    
+    def test_unrelated_query_matches_nothing(self):
+        self.assertEqual(self.fuzzy('xylophone'), [])
+    
+    def test_did_you_mean(self):
+        self.assertEqual(suggest('Fitzgerld'), ['F. Scott Fitzgerald'])
+    
+    def test_renamed_title_is_reindexed(self):
+        self.book.title = 'Trimalchio'
+        self.book.save()
+        self.assertEqual(self.fuzzy('gatsbi'), [])
+        self.assertEqual(self.fuzzy('trimalcio'), [self.book])
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        self.fiction = Genre.objects.create(name='Fiction')
+        self.history = Genre.objects.create(name='History')
+        self.publisher = Publisher.objects.create(name='Penguin', country='UK')
+        self.first = Book.objects.create(
+            title='First', isbn='9780000000001', publisher=self.publisher,
+            publication_date=date(1995, 5, 1), pages=100, language='EN'
+        )
+        self.second = Book.objects.create(
+            title='Second', isbn='9780000000002',
+            publication_date=date(2003, 1, 1), pages=100, language='FR'
+        )
+        self.first.genres.add(self.fiction, self.history)
+        self.second.genres.add(self.fiction)
+        BookInstance.objects.create(book=self.first, unique_id='C1', barcode='B1', location='A1')
+    
+    def counts(self, facets, name):
+        return {v['value']: v['count'] for v in facets[name]}
+    
+    def test_counts_come_from_one_query(self):
+        with self.assertNumQueries(1):
+            facets = facet_counts(Book.objects.all())
+        
+        self.assertEqual(self.counts(facets, 'genre'), {str(self.fiction.pk): 2, str(self.history.pk): 1})
+        self.assertEqual(self.counts(facets, 'language'), {'EN': 1, 'FR': 1})
+        self.assertEqual(self.counts(facets, 'publisher'), {str(self.publisher.pk): 1})
+        self.assertEqual(self.counts(facets, 'decade'), {'1990': 1, '2000': 1})
+        self.assertEqual(self.counts(facets, 'availability'), {'available': 1, 'unavailable': 1})
+    
+    def test_counts_follow_filtered_result_set(self):
+        books = apply_facet_filters(Book.objects.all(), {'decade': '2000'})
+        facets = facet_counts(books)
+        self.assertEqual(self.counts(facets, 'genre'), {str(self.fiction.pk): 1})
+        self.assertEqual(facets['language'], [{'value': 'FR', 'label': 'French', 'count': 1}])
+
+class PrefixIndexTests(TestCase):
+    def setUp(self):
+        self.index = PrefixIndex(top_k=2)
+        self.index.add('a', ['The Hobbit'], 5.0, {'text': 'The Hobbit'})
+        self.index.add('b', ['Hobbies for Beginners'], 1.0, {'text': 'Hobbies for Beginners'})
+        self.index.add('c', ['Homer'], 3.0, {'text': 'Homer'})
+    
+    def texts(self, prefix):
+        return [s['text'] for s in self.index.lookup(prefix)]
+    
+    def test_lookup_returns_top_k_by_weight(self):
+        self.assertEqual(self.texts('ho'), ['Homer', 'Hobbies for Beginners'])
+        self.assertEqual(self.texts('the h'), ['The Hobbit'])
+    
+    def test_remove_promotes_next_best(self):
+        self.index.remove('c')
+        self.assertEqual(self.texts('ho'), ['Hobbies for Beginners'])
+    
+    def test_set_weight_reorders(self):
+        self.index.set_weight('b', 10.0)
+        self.assertEqual(self.texts('hobb'), ['Hobbies for Beginners'])
+        self.assertEqual(self.texts('ho'), ['Hobbies for Beginners', 'Homer'])
+
+class SuggestEndpointTests(TestCase):
+    def setUp(self):
+        reset_index()
+        thread = mock.patch.object(autocomplete.threading, 'Thread')
+        self.thread = thread.start()
+        self.addCleanup(thread.stop)
+        self.popular = Book.objects.create(
+            title='Dune', isbn='9780441013593', publication_date=date.today(), pages=412
+        )
+        self.other = Book.objects.create(
+            title='Dubliners', isbn='9780140186475', publication_date=date.today(), pages=152
+        )
+        BookPopularity.objects.create(book=self.popular, popularity_score=50.0)
+    
+    def tearDown(self):
+        reset_index()
+    
+    def suggest(self, q):
+        response = self.client.get('/catalog/api/suggest/', {'q': q})
+        return [s['text'] for s in response.json()['suggestions']]
+    
+    def test_suggestions_ranked_by_popularity(self):
+        self.assertEqual(self.suggest('du'), ['Dune', 'Dubliners'])
+    
+    def test_isbn_prefix(self):
+        self.assertEqual(self.suggest('978044'), ['9780441013593'])
+    
+    def run_build(self):
+        call = self.thread.call_args
+        with mock.patch.object(autocomplete, 'connection'):
+            call.kwargs['target'](*call.kwargs['args'])
+    
+    def test_database_is_served_until_index_is_built(self):
+        Book.objects.create(
+            title='Children of Dune', isbn='9780441104024', publication_date=date.today(), pages=444
+        )
+        with self.assertNumQueries(3):
+            self.assertEqual(self.suggest('dune'), ['Dune'])
+        self.assertIsNone(autocomplete.loaded_index())
+        self.thread.assert_called_once()
+        
+        self.run_build()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('dune'), ['Dune', 'Children of Dune'])
+    
+    @override_settings(CATALOG_AUTOCOMPLETE_MAX_AGE=-1)
+    def test_stale_index_is_served_while_rebuilding(self):
+        autocomplete.get_index()
+        self.run_build()
+        stale = autocomplete.loaded_index()
+        fresh = PrefixIndex()
+        with mock.patch.object(autocomplete, 'build_index', return_value=fresh):
+            self.assertIs(autocomplete.get_index(), stale)
+            self.assertIs(autocomplete.get_index(), stale)
+            self.assertEqual(self.thread.call_count, 2)
+            self.run_build()
+        self.assertIs(autocomplete.loaded_index(), fresh)
+    
+    def test_reset_discards_build_in_flight(self):
+        autocomplete.get_index()
+        reset_index()
+        self.run_build()
+        self.assertIsNone(autocomplete.loaded_index())
+    
+    def test_limit_is_clamped(self):
+        response = self.client.get('/catalog/api/suggest/', {'q': 'du', 'limit': 'many'})
+        self.assertEqual(response.status_code, 400)
+        for limit, expected in [('0', 1), ('-5', 1), ('500', 2)]:
+            response = self.client.get('/catalog/api/suggest/', {'q': 'du', 'limit': limit})
+            self.assertEqual(len(response.json()['suggestions']), expected)
+    
+    def test_catalog_changes_are_applied_incrementally(self):
+        self.suggest('du')
+        Book.objects.create(
+            title='Duma Key', isbn='9781416552963', publication_date=date.today(), pages=611
+        )
+        self.other.delete()
+        self.assertEqual(self.suggest('du'), ['Dune', 'Duma Key'])
+
+class NormalizedISBNTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='The Old Man and the Sea',
+            isbn='0684801221',
+            publication_date=date.today(),
+            pages=127
+        )
+        self.user = User.objects.create_user(username='partner')
+        APIKey.objects.create(name='Partner', key='partner-key', user=self.user)
+    
+    def test_normalize_isbn(self):
+        self.assertEqual(normalize_isbn('0-684-80122-1'), '9780684801223')
+        self.assertEqual(normalize_isbn('978 0684 801223'), '9780684801223')
+        self.assertIsNone(normalize_isbn('not an isbn'))
+    
+    def test_isbn13_populated_on_save(self):
+        self.assertEqual(self.book.isbn13, '9780684801223')
+    
+    def test_search_matches_hyphenated_isbn13(self):
+        books = search_books(Book.objects.all(), '978-0-684-80122-3')
+        self.assertEqual(list(books), [self.book])
+    
+    def test_search_falls_back_when_no_isbn_matches(self):
+        other = Book.objects.create(
+            title='Catalogue 9780306406157', isbn='9781861972712', publication_date=date.today(), pages=10
+        )
+        books = search_books(Book.objects.all(), '9780306406157')
+        self.assertEqual(list(books), [other])
+    
+    def test_clean_rejects_equivalent_isbn(self):
+        duplicate = Book(title='Again', isbn='9780684801223', publication_date=date.today(), pages=127)
+        with self.assertRaises(ValidationError) as caught:
+            duplicate.clean()
+        self.assertIn('isbn', caught.exception.message_dict)
+        self.book.clean()
+    
+    def test_bulk_lookup(self):
+        response = self.client.post(
+            '/catalog/api/books/isbn-lookup/',
+            json.dumps({'isbns': ['978-0684801223', '0684801221', '9780000000000', 'abc']}),
+            content_type='application/json',
+            HTTP_X_API_KEY='partner-key'
+        )
+        data = response.json()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['results']['978-0684801223']['id'], self.book.pk)
+        self.assertEqual(data['results']['0684801221']['id'], self.book.pk)
+        self.assertEqual(data['not_found'], ['9780000000000'])
+        self.assertEqual(data['invalid'], ['abc'])
+    
+    def test_bulk_lookup_requires_api_key(self):
+        response = self.client.post(
+            '/catalog/api/books/isbn-lookup/', '{}', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        for i, rating in enumerate([4.5, 3.0, 4.5, 2.0, 5.0]):
+            Book.objects.create(
+                title=f'Book {i}', isbn=f'978000000000{i}',
+                publication_date=date.today(), pages=100, average_rating=rating
+            )
+    
+    def titles(self, page):
+        return [book.title for book in page]
+    
+    def test_walk_forward_and_back(self):
+        paginator = KeysetPaginator(Book.objects.all(), 'title', per_page=2)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        
+        self.assertEqual(self.titles(first), ['Book 0', 'Book 1'])
+        self.assertEqual(self.titles(second), ['Book 2', 'Book 3'])
+        self.assertEqual(self.titles(third), ['Book 4'])
+        self.assertFalse(third.has_next())
+        self.assertEqual(self.titles(paginator.page(third.previous_cursor)), ['Book 2', 'Book 3'])
+        self.assertFalse(first.has_previous())
+    
+    def test_descending_ties_break_on_pk(self):
+        paginator = KeysetPaginator(Book.objects.all(), 'average_rating', descending=True, per_page=2)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        
+        self.assertEqual(self.titles(first), ['Book 4', 'Book 2'])
+        self.assertEqual(self.titles(second), ['Book 0', 'Book 1'])
+    
+    def test_each_page_is_one_query(self):
+        paginator = KeysetPaginator(Book.objects.all(), 'title', per_page=2)
+        cursor = paginator.page().next_cursor
+        with self.assertNumQueries(1):
+            paginator.page(cursor)
+    
+    def test_estimate_count_is_capped(self):
+        self.assertEqual(estimate_count(Book.objects.all(), cap=3), (3, False))
+        self.assertEqual(estimate_count(Book.objects.all()), (5, True))
+
+class TamperedCursorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.book = Book.objects.create(title='Cursor', isbn='9780000000001', publication_date=date.today(), pages=100)
+        Review.objects.create(book=self.book, user=self.user, rating=4, title='T', content='C')
+        self.bad_date = encode_cursor('not-a-date', self.book.pk)
+        self.bad_pk = encode_cursor('Cursor', 'x')
+    
+    def get(self, view, params, *args):
+        request = RequestFactory().get('/', params)
+        request.user = self.user
+        with mock.patch.object(views, 'render', return_value=HttpResponse()), \
+                mock.patch.object(advanced_views, 'render', return_value=HttpResponse()):
+            return view(request, *args)
+    
+    def test_paginator_rejects_unconvertible_values(self):
+        for order_field, cursor in [('publication_date', self.bad_date), ('title', self.bad_pk), ('average_rating', encode_cursor('abc', 1))]:
+            with self.assertRaises(InvalidCursor):
+                KeysetPaginator(Book.objects.all(), order_field).page(cursor)
+    
+    def test_book_list(self):
+        for sort, cursor in [('newest', self.bad_date), ('rating', encode_cursor('abc', 1)), ('title', self.bad_pk)]:
+            self.assertEqual(self.get(views.book_list, {'sort': sort, 'cursor': cursor}).status_code, 400)
+        response = self.get(views.book_list, {'q': 'cursor', 'sort': 'relevance', 'cursor': encode_cursor('abc', 1)})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_book_detail_and_review_api(self):
+        response = self.get(views.book_detail, {'reviews': 'newest', 'cursor': self.bad_date}, self.book.pk)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(f'/catalog/book/{self.book.pk}/reviews/', {'sort': 'newest', 'cursor': self.bad_date})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_mobile_search(self):
+        request = APIRequestFactory().get('/catalog/api/mobile/search/', {'cursor': self.bad_pk})
+        self.assertEqual(mobile_book_search(request).status_code, 400)
+    
+    def test_discussion_detail(self):
+        discussion = BookDiscussion.objects.create(book=self.book, title='D', description='D', created_by=self.user)
+        response = self.get(advanced_views.discussion_detail, {'cursor': encode_cursor(['nested'], 'x')}, discussion.pk)
+        self.assertEqual(response.status_code, 400)
+
+class MobileBookSearchTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        for i in range(12):
+            Book.objects.create(
+                title=f'Sea Story {i:02d}', isbn=f'97800000000{i:02d}',
+                publication_date=date.today(), pages=100
+            )
+    
+    def search(self, **params):
+        return mobile_book_search(self.factory.get('/catalog/api/mobile/search/', params)).data
+    
+    def test_returns_one_page_with_cursor(self):
+        first = self.search(q='sea')
+        self.assertEqual(len(first['results']), 10)
+        self.assertTrue(first['has_more'])
+        
+        second = self.search(q='sea', cursor=first['next_cursor'])
+        self.assertEqual(len(second['results']), 2)
+        self.assertFalse(second['has_more'])
+        
+        ids = [b['id'] for b in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 12)
+    
+    def test_empty_query_lists_by_title(self):
+        data = self.search()
+        self.assertEqual(data['results'][0]['title'], 'Sea Story 00')
+
+class CopyCounterTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Counted', isbn='9780000000001', publication_date=date.today(), pages=100
+        )
+        self.first = BookInstance.objects.create(book=self.book, unique_id='C1', barcode='B1', location='A1')
+        self.second = BookInstance.objects.create(book=self.book, unique_id='C2', barcode='B2', location='A1')
+    
+    def counters(self):
+        book = Book.objects.get(pk=self.book.pk)
+        return book.total_copies, book.available_copies, book.on_loan_copies
+    
+    def test_create_counts_copies(self):
+        self.assertEqual(self.counters(), (2, 2, 0))
+    
+    def test_status_change_moves_counters(self):
+        self.first.status = 'ON_LOAN'
+        self.first.save()
+        self.assertEqual(self.counters(), (2, 1, 1))
+        
+        self.first.status = 'AVAILABLE'
+        self.first.save()
+        self.assertEqual(self.counters(), (2, 2, 0))
+    
+    def test_bulk_update_recounts(self):
+        BookInstance.objects.filter(book=self.book).update(status='ON_LOAN')
+        self.assertEqual(self.counters(), (2, 0, 2))
+    
+    def test_delete_decrements(self):
+        self.second.delete()
+        self.assertEqual(self.counters(), (1, 1, 0))
+    
+    def test_book_save_keeps_counters(self):
+        stale = Book.objects.get(pk=self.book.pk)
+        BookInstance.objects.create(book=self.book, unique_id='C3', barcode='B3', location='A1')
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(self.counters(), (3, 3, 0))
+    
+    def test_reconcile_command_fixes_drift(self):
+        Book.objects.filter(pk=self.book.pk).update(available_copies=7)
+        out = StringIO()
+        call_command('reconcile_copy_counters', stdout=out)
+        self.assertIn('Reconciled 1 books', out.getvalue())
+        self.assertEqual(self.counters(), (2, 2, 0))
+
+class BatchAvailabilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.books = [
+            Book.objects.create(
+                title=f'Book {i}', isbn=f'978000000000{i}', publication_date=date.today(), pages=100
+            )
+            for i in range(3)
+        ]
+        BookInstance.objects.create(book=self.books[0], unique_id='C1', barcode='B1', location='A1')
+        BookInstance.objects.create(
+            book=self.books[0], unique_id='C2', barcode='B2', location='A1', status='ON_LOAN'
+        )
+        BookInstance.objects.create(
+            book=self.books[1], unique_id='C3', barcode='B3', location='A1', status='MAINTENANCE'
+        )
+    
+    def fetch(self, ids):
+        return self.client.get('/catalog/api/books/availability/', {'ids': ids})
+    
+    def test_counts_per_status(self):
+        ids = ','.join(str(b.pk) for b in self.books)
+        with self.assertNumQueries(1):
+            results = self.fetch(ids).json()['results']
+        
+        first = results[str(self.books[0].pk)]
+        self.assertEqual((first['total_copies'], first['available_copies'], first['on_loan']), (2, 1, 1))
+        self.assertEqual(results[str(self.books[1].pk)]['maintenance'], 1)
+        self.assertEqual(results[str(self.books[2].pk)]['total_copies'], 0)
+        
+        with self.assertNumQueries(0):
+            self.fetch(ids)
+    
+    def test_status_change_expires_cache(self):
+        self.fetch(str(self.books[1].pk))
+        instance = BookInstance.objects.get(unique_id='C3')
+        instance.status = 'AVAILABLE'
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.save()
+        
+        results = self.fetch(str(self.books[1].pk)).json()['results']
+        self.assertEqual(results[str(self.books[1].pk)]['available_copies'], 1)
+    
+    def test_bulk_update_expires_cache(self):
+        ids = ','.join(str(b.pk) for b in self.books[:2])
+        self.fetch(ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            BookInstance.objects.filter(unique_id='C2').update(status='AVAILABLE')
+            BookInstance.objects.filter(unique_id='C3').update(book=self.books[2])
+        
+        results = self.fetch(','.join(str(b.pk) for b in self.books)).json()['results']
+        self.assertEqual(results[str(self.books[0].pk)]['available_copies'], 2)
+        self.assertEqual(results[str(self.books[1].pk)]['total_copies'], 0)
+        self.assertEqual(results[str(self.books[2].pk)]['maintenance'], 1)
+    
+    def test_rejects_bad_ids(self):
+        self.assertEqual(self.fetch('1,x').status_code, 400)
+        self.assertEqual(self.fetch(','.join(str(i) for i in range(501))).status_code, 400)
+
+class BookListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(
+            title='Cached Book', isbn='9780000000001', publication_date=date.today(), pages=100
+        )
+    
+    def get_context(self, **params):
+        request = RequestFactory().get('/catalog/', params)
+        request.user = AnonymousUser()
+        with mock.patch.object(views, 'render', return_value=HttpResponse()) as render:
+            views.book_list(request)
+        return render.call_args[0][2]
+    
+    def test_key_ignores_parameter_order_and_case(self):
+        first = result_cache_key('book_list', QueryDict('q=Dune&sort=title'))
+        second = result_cache_key('book_list', QueryDict('sort=title&q=%20dune%20&page=3'), ignore=('page',))
+        self.assertEqual(first, second)
+    
+    def test_caches_ids_not_model_instances(self):
+        self.get_context()
+        entry = cache.get(result_cache_key('book_list', QueryDict('')))
+        self.assertEqual(entry['book_ids'], [self.book.pk])
+    
+    def test_writes_bump_generation(self):
+        generation = get_catalog_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='Another', isbn='9780000000002', publication_date=date.today(), pages=50)
+            self.assertEqual(get_catalog_generation(), generation)
+        self.assertGreater(get_catalog_generation(), generation)
+    
+    def test_new_book_visible_after_write(self):
+        self.get_context()
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='Brand New', isbn='9780000000002', publication_date=date.today(), pages=50)
+        titles = [book.title for book in self.get_context()['page_obj']]
+        self.assertEqual(titles, ['Brand New', 'Cached Book'])
+    
+    def test_cached_page_skips_search(self):
+        self.get_context()
+        with mock.patch.object(views, 'book_list_result') as compute:
+            context = self.get_context()
+        compute.assert_not_called()
+        self.assertEqual([book.pk for book in context['page_obj']], [self.book.pk])
+    
+    def test_waiting_worker_reuses_result(self):
+        cache.add('result:lock', 1, 10)
+        threading.Timer(0.1, lambda: cache.set('result', [1, 2], 60)).start()
+        compute = mock.Mock(return_value=[3])
+        
+        self.assertEqual(get_or_compute('result', compute, 60), [1, 2])
+        compute.assert_not_called()
+
+class BookSummaryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        self.book = Book.objects.create(
+            title='The Dispossessed', isbn='9780000000001', publication_date=date.today(), pages=100
+        )
+        self.book.authors.add(self.author)
+        BookInstance.objects.create(book=self.book, unique_id='C1', barcode='B1', location='A1')
+        self.user = User.objects.create_user(username='reader', password='pass')
+    
+    def fetch(self, book_id=None):
+        request = RequestFactory().get('/')
+        response = api_views.api_book_detail(request, book_id or self.book.pk)
+        return json.loads(response.content)
+    
+    def test_served_from_cache(self):
+        data = self.fetch()
+        self.assertEqual(data['authors'], ['Ursula Le Guin'])
+        self.assertEqual(data['available_copies'], 1)
+        
+        with self.assertNumQueries(0):
+            self.fetch()
+    
+    def test_instance_change_expires_summary(self):
+        self.fetch()
+        with self.captureOnCommitCallbacks(execute=True):
+            BookInstance.objects.create(book=self.book, unique_id='C2', barcode='B2', location='A1')
+            # Nothing is expired before the counters are committed.
+            self.assertEqual(self.fetch()['total_copies'], 1)
+        self.assertEqual(self.fetch()['total_copies'], 2)
+    
+    def test_review_expires_summary(self):
+        self.fetch()
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(book=self.book, user=self.user, rating=5, title='Great', content='Loved it')
+        reviews = self.fetch()['reviews']
+        self.assertEqual([review['user'] for review in reviews], ['reader'])
+    
+    def test_author_rename_expires_summary(self):
+        self.fetch()
+        self.author.last_name = 'K. Le Guin'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        self.assertEqual(self.fetch()['authors'], ['Ursula K. Le Guin'])
+    
+    def test_missing_book(self):
+        self.assertEqual(self.fetch(999999), {'error': 'Book not found'})
+    
+    def test_expiry_during_rebuild_is_not_overwritten(self):
+        def compute():
+            expire_keys(['summary'])
+            return 'stale'
+        self.assertEqual(get_or_compute('summary', compute, 60), 'stale')
+        self.assertIsNone(cache.get('summary'))
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.books = {}
+        for i, title in enumerate(['Alpha', 'Beta', 'Gamma', 'Delta']):
+            book = Book.objects.create(
+                title=title, isbn=f'978000000000{i}', publication_date=date.today(), pages=100
+            )
+            BookInstance.objects.create(book=book, unique_id=f'C{i}', barcode=f'B{i}', location='A1')
+            self.books[title] = book
+        
+        self.members = {}
+        for name, titles in [('ann', 'Alpha Beta'), ('bob', 'Alpha Beta Gamma'), ('cat', 'Alpha')]:
+            member = User.objects.create_user(username=name, password='pass').profile
+            for title in titles.split():
+                Loan.objects.create(
+                    book_instance=self.books[title].instances.get(),
+                    member=member,
+                    due_date=date.today(),
+                    status='RETURNED'
+                )
+            self.members[name] = member
+    
+    def recommended(self, name):
+        return [
+            rec.book.title
+            for rec in BookRecommendation.objects.filter(member=self.members[name]).order_by('-score')
+        ]
+    
+    def test_top_k_per_row(self):
+        matrix = sparse.csr_matrix(np.array([[0.1, 0.9, 0.5], [0.2, 0, 0]]))
+        self.assertEqual(top_k_per_row(matrix, 2).toarray().tolist(), [[0, 0.9, 0.5], [0.2, 0, 0]])
+    
+    def test_recommends_co_borrowed_books(self):
+        members, written = build_recommendations()
+        
+        self.assertEqual(members, 3)
+        self.assertEqual(self.recommended('cat'), ['Beta', 'Gamma'])
+        self.assertEqual(self.recommended('ann'), ['Gamma'])
+        self.assertEqual(self.recommended('bob'), [])
+        
+        reason = BookRecommendation.objects.get(member=self.members['cat'], book=self.books['Beta']).reason
+        self.assertEqual(reason, 'Because you borrowed Alpha')
+    
+    def test_rebuild_replaces_rows(self):
+        build_recommendations()
+        build_recommendations()
+        
+        self.assertEqual(BookRecommendation.objects.count(), 3)
+        neighbors = BookNeighbor.objects.filter(book=self.books['Alpha']).order_by('-score')
+        self.assertEqual(neighbors[0].neighbor, self.books['Beta'])
+    
+    def test_top_n_limit(self):
+        build_recommendations(top_n=1)
+        self.assertEqual(self.recommended('cat'), ['Beta'])
+    
+    def test_refresh_member_uses_neighbor_table(self):
+        build_recommendations()
+        Loan.objects.create(
+            book_instance=self.books['Beta'].instances.get(),
+            member=self.members['cat'],
+            due_date=date.today()
+        )
+        self.assertTrue(RecommendationState.objects.get(member=self.members['cat']).is_stale)
+        
+        with self.assertNumQueries(10):
+            refresh_member(self.members['cat'].pk)
+        
+        self.assertEqual(self.recommended('cat'), ['Gamma'])
+        self.assertFalse(RecommendationState.objects.get(member=self.members['cat']).is_stale)
+    
+    def test_review_refreshes_member(self):
+        build_recommendations()
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(
+                book=self.books['Beta'], user=self.members['cat'].user, rating=4, title='Good', content='Good'
+            )
+            self.assertEqual(self.recommended('cat'), ['Beta', 'Gamma'])
+        self.assertEqual(self.recommended('cat'), ['Gamma'])
+    
+    def test_batch_and_refresh_exclude_the_same_books(self):
+        Review.objects.create(
+            book=self.books['Beta'], user=self.members['cat'].user, rating=4, title='Good', content='Good'
+        )
+        build_recommendations()
+        self.assertEqual(self.recommended('cat'), ['Gamma'])
+        refresh_member(self.members['cat'].pk)
+        self.assertEqual(self.recommended('cat'), ['Gamma'])
+    
+    def test_failed_refresh_does_not_fail_the_return(self):
+        librarian = User.objects.create_user(username='librarian', password='pass')
+        LibrarianProfile.objects.create(
+            user=librarian, employee_id='E1', department='Circulation', designation='Librarian',
+            phone_number='+1000000000', hire_date=date.today()
+        )
+        loan = Loan.objects.create(
+            book_instance=self.books['Delta'].instances.get(), member=self.members['cat'], due_date=date.today()
+        )
+        request = RequestFactory().post(f'/circulation/return/{loan.pk}/')
+        request.user = librarian
+        with mock.patch('catalog.recommendations.get_store', side_effect=OSError('corrupt store')), \
+                mock.patch.object(circulation_views, 'redirect', return_value=HttpResponse()), \
+                self.assertLogs('catalog.tasks', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            response = circulation_views.return_book(request, loan.pk)
+        self.assertEqual(response.status_code, 200)
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, 'RETURNED')
+    
+    def test_stale_only_skips_untouched_members(self):
+        build_recommendations()
+        BookRecommendation.objects.filter(member=self.members['ann']).delete()
+        Loan.objects.create(
+            book_instance=self.books['Delta'].instances.get(),
+            member=self.members['cat'],
+            due_date=date.today()
+        )
+        
+        members, written = build_recommendations(stale_only=True)
+        self.assertEqual(members, 1)
+        self.assertEqual(self.recommended('ann'), [])
+
+class SimilarBooksTests(TestCase):
+    def setUp(self):
+        genre = Genre.objects.create(name='Science Fiction')
+        specs = [
+            ('Dune', 'A desert planet, giant sandworms and the spice melange.'),
+            ('Children of Dune', 'Heirs of the desert planet fight over the spice.'),
+            ('Salt Fat Acid Heat', 'Cooking lessons about salt, fat, acid and heat.'),
+            ('Kitchen Confidential', 'A chef on restaurant kitchens, cooking and heat.'),
+        ]
+        self.books = []
+        for i, (title, description) in enumerate(specs):
+            book = Book.objects.create(
+                title=title, description=description, isbn=f'978000000000{i}',
+                publication_date=date.today(), pages=100
+            )
+            if i < 2:
+                book.genres.add(genre)
+            self.books.append(book)
+    
+    def test_tfidf_rows_are_normalized(self):
+        matrix = tfidf_matrix([
+            {'spice': 2, 'desert': 1}, {'spice': 1, 'desert': 3}, {'worm': 1, 'rare': 1}, {'worm': 2}
+        ])
+        self.assertEqual(matrix.shape, (4, 3))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        self.assertTrue(np.allclose(norms, 1))
+    
+    def test_nearest_book_shares_content(self):
+        build_similar_books()
+        
+        response = self.client.get(f'/catalog/book/{self.books[0].pk}/similar/')
+        results = response.json()['results']
+        self.assertEqual(results[0]['id'], self.books[1].pk)
+        self.assertNotIn(self.books[0].pk, [result['id'] for result in results])
+        
+        results = self.client.get(f'/catalog/book/{self.books[2].pk}/similar/').json()['results']
+        self.assertEqual(results[0]['title'], 'Kitchen Confidential')
+    
+    def test_rebuild_keeps_loan_neighbors(self):
+        BookNeighbor.objects.create(book=self.books[0], neighbor=self.books[2], kind='LOAN', score=0.5)
+        build_similar_books()
+        build_similar_books()
+        
+        self.assertEqual(BookNeighbor.objects.filter(kind='LOAN').count(), 1)
+        self.assertEqual(
+            BookNeighbor.objects.filter(kind='CONTENT', book=self.books[0], neighbor=self.books[1]).count(), 1
+        )
+    
+    def test_unknown_book(self):
+        self.assertEqual(self.client.get('/catalog/book/999999/similar/').status_code, 404)
+
+class VectorStoreTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(
+            CATALOG_VECTOR_STORE_DIR=self.directory.name, CATALOG_VECTOR_STORE_CHECK_INTERVAL=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_store()
+        self.addCleanup(reset_store)
+        
+        self.books = [
+            Book.objects.create(
+                title=title, isbn=f'978000000000{i}', publication_date=date.today(), pages=100
+            )
+            for i, title in enumerate(['Dune', 'Dune Messiah', 'Émile'])
+        ]
+        BookNeighbor.objects.create(book=self.books[0], neighbor=self.books[1], kind='CONTENT', score=0.9)
+        BookNeighbor.objects.create(book=self.books[0], neighbor=self.books[2], kind='CONTENT', score=0.2)
+        BookNeighbor.objects.create(book=self.books[1], neighbor=self.books[0], kind='LOAN', score=0.5)
+        BookPopularity.objects.create(book=self.books[2], popularity_score=5.0)
+    
+    def test_arrays_round_trip(self):
+        path = os.path.join(self.directory.name, 'arrays.bin')
+        write_arrays(path, {'ids': np.arange(5, dtype=np.int64), 'scores': np.array([0.5], dtype=np.float32)})
+        arrays, meta = read_arrays(path)
+        self.assertEqual(arrays['ids'].tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(arrays['scores'].tolist(), [0.5])
+    
+    def test_nothing_published(self):
+        self.assertIsNone(get_store())
+    
+    def test_reads_published_store(self):
+        publish_store()
+        store = get_store()
+        
+        self.assertEqual(store.title(self.books[2].pk), 'Émile')
+        self.assertEqual(store.neighbors('LOAN', self.books[1].pk), [(self.books[0].pk, 0.5)])
+        self.assertEqual(store.neighbors('LOAN', self.books[0].pk), [])
+        self.assertEqual(store.popular(1), [self.books[2].pk])
+        
+        with self.assertNumQueries(0):
+            results = similar_books(self.books[0].pk)
+        self.assertEqual([r['title'] for r in results], ['Dune Messiah', 'Émile'])
+    
+    def test_publish_swaps_version(self):
+        publish_store()
+        first = get_store()
+        BookNeighbor.objects.filter(kind='CONTENT').delete()
+        publish_store(keep=1)
+        
+        self.assertNotEqual(get_store().path, first.path)
+        self.assertEqual(similar_books(self.books[0].pk), [])
+        self.assertEqual(first.neighbors('CONTENT', self.books[0].pk)[0][0], self.books[1].pk)
+        self.assertEqual(len([f for f in os.listdir(self.directory.name) if f.endswith('.bin')]), 1)
+    
+    def test_unreadable_version_falls_back_to_database(self):
+        BookNeighbor.objects.create(book=self.books[1], neighbor=self.books[2], kind='CONTENT', score=0.4)
+        publish_store()
+        os.remove(get_store().path)
+        reset_store()
+        
+        with self.assertLogs('catalog.vector_store', 'ERROR'):
+            self.assertIsNone(get_store())
+            self.assertEqual([r['title'] for r in similar_books(self.books[1].pk)], ['Émile'])
+        
+        with open(os.path.join(self.directory.name, 'CURRENT'), 'w') as handle:
+            handle.write('garbage.bin')
+        with open(os.path.join(self.directory.name, 'garbage.bin'), 'wb') as handle:
+            handle.write(b'not a store')
+        with self.assertLogs('catalog.vector_store', 'ERROR'):
+            self.assertIsNone(get_store())
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Rated', isbn='9780000000001', publication_date=date.today(), pages=100
+        )
+        self.popularity = BookPopularity.objects.create(book=self.book)
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass') for i in range(3)]
+    
+    def review(self, user, rating):
+        return Review.objects.create(book=self.book, user=user, rating=rating, title='T', content='C')
+    
+    def assertAggregates(self, total, rating_sum, average, histogram):
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_ratings, self.book.rating_sum), (total, rating_sum))
+        self.assertEqual(float(self.book.average_rating), average)
+        self.assertEqual(self.book.rating_histogram(), histogram)
+    
+    def test_create_edit_delete(self):
+        first = self.review(self.users[0], 5)
+        self.review(self.users[1], 2)
+        self.assertAggregates(2, 7, 3.5, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+        
+        first.rating = 4
+        first.save()
+        self.assertAggregates(2, 6, 3.0, {1: 0, 2: 1, 3: 0, 4: 1, 5: 0})
+        
+        first.delete()
+        self.assertAggregates(1, 2, 2.0, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+    
+    def test_stale_book_save_keeps_aggregates(self):
+        stale = Book.objects.get(pk=self.book.pk)
+        self.review(self.users[0], 4)
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertAggregates(1, 4, 4.0, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0})
+    
+    def test_feeds_popularity(self):
+        self.review(self.users[0], 3)
+        self.popularity.refresh_from_db()
+        self.assertEqual(self.popularity.total_reviews, 1)
+        self.assertEqual(float(self.popularity.average_rating), 3.0)
+    
+    def test_bulk_writes_recount(self):
+        Review.objects.bulk_create([
+            Review(book=self.book, user=user, rating=rating, title='T', content='C')
+            for user, rating in zip(self.users, [1, 3, 5])
+        ])
+        self.assertAggregates(3, 9, 3.0, {1: 1, 2: 0, 3: 1, 4: 0, 5: 1})
+        
+        Review.objects.filter(rating=1).update(rating=2)
+        self.assertAggregates(3, 10, 3.33, {1: 0, 2: 1, 3: 1, 4: 0, 5: 1})
+    
+    def test_out_of_range_rating_has_no_bucket(self):
+        adjust_rating_aggregates([(self.book.pk, 1, 1), (self.book.pk, 6, 1)])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.total_ratings, 2)
+        self.assertEqual(self.book.rating_histogram()[1], 1)
+        
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.review(self.users[0], 0)
+    
+    def test_add_review_rejects_bad_rating(self):
+        for rating in ['abc', '0', '6', '']:
+            request = RequestFactory().post('/', {'rating': rating, 'title': 'T', 'content': 'C'})
+            request.user = self.users[0]
+            response = views.add_review(request, self.book.pk)
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Review.objects.exists())
+
+class ReviewVoteTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Reviewed', isbn='9780000000001', publication_date=date.today(), pages=100
+        )
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass') for i in range(5)]
+        self.reviews = [
+            Review.objects.create(book=self.book, user=user, rating=4, title=f'Review {i}', content='C')
+            for i, user in enumerate(self.users)
+        ]
+    
+    def vote(self, user, review, method='post'):
+        self.client.force_login(user)
+        return getattr(self.client, method)(f'/catalog/reviews/{review.pk}/helpful/').json()
+    
+    def test_votes_are_deduplicated(self):
+        self.assertEqual(self.vote(self.users[1], self.reviews[0])['helpful_count'], 1)
+        data = self.vote(self.users[1], self.reviews[0])
+        self.assertEqual((data['changed'], data['helpful_count']), (False, 1))
+        self.assertEqual(self.vote(self.users[2], self.reviews[0])['helpful_count'], 2)
+        
+        self.assertEqual(self.vote(self.users[1], self.reviews[0], 'delete')['helpful_count'], 1)
+        self.assertEqual(ReviewVote.objects.count(), 1)
+    
+    def test_own_review(self):
+        self.client.force_login(self.users[0])
+        response = self.client.post(f'/catalog/reviews/{self.reviews[0].pk}/helpful/')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_stale_save_keeps_votes(self):
+        stale = Review.objects.get(pk=self.reviews[0].pk)
+        self.reviews[0].add_helpful_vote(self.users[1])
+        stale.content = 'Edited'
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual(stale.helpful_count, 1)
+    
+    def test_keyset_listing_by_helpfulness(self):
+        for voter in self.users[1:4]:
+            self.reviews[3].add_helpful_vote(voter)
+        self.reviews[1].add_helpful_vote(self.users[0])
+        
+        url = f'/catalog/book/{self.book.pk}/reviews/'
+        first = self.client.get(url, {'sort': 'helpful', 'per_page': 2}).json()
+        self.assertEqual([r['title'] for r in first['results']], ['Review 3', 'Review 1'])
+        
+        second = self.client.get(url, {'sort': 'helpful', 'per_page': 2, 'cursor': first['next_cursor']}).json()
+        self.assertEqual([r['helpful_count'] for r in second['results']], [0, 0])
+        self.assertNotIn('Review 3', [r['title'] for r in second['results']])
+    
+    def test_invalid_sort_and_cursor(self):
+        url = f'/catalog/book/{self.book.pk}/reviews/'
+        self.assertEqual(self.client.get(url, {'sort': 'rating'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 400)
+
+class DiscussionTreeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass')
+        book = Book.objects.create(title='Talked About', isbn='9780000000002', publication_date=date.today(), pages=100)
+        self.discussion = BookDiscussion.objects.create(book=book, title='Chapter 1', description='D', created_by=self.user)
+    
+    def comment(self, parent=None, content='C'):
+        return DiscussionComment.objects.create(discussion=self.discussion, user=self.user, content=content, parent=parent)
+    
+    def test_paths_and_reply_counts(self):
+        root = self.comment()
+        reply = self.comment(root)
+        nested = self.comment(reply)
+        
+        nested.refresh_from_db()
+        self.assertEqual(nested.path, root.path + reply.path[-10:] + nested.path[-10:])
+        self.assertEqual(nested.depth, 2)
+        root.refresh_from_db()
+        self.assertEqual(root.replies_count, 1)
+        
+        nested.delete()
+        reply.refresh_from_db()
+        self.assertEqual(reply.replies_count, 0)
+    
+    def test_thread_page_loads_whole_tree_in_order(self):
+        first, second, third = self.comment(content='1'), self.comment(content='2'), self.comment(content='3')
+        a = self.comment(first, '1a')
+        self.comment(second, '2a')
+        self.comment(a, '1a-i')
+        self.comment(first, '1b')
+        
+        # One query for the page of roots, one for every comment under them.
+        with self.assertNumQueries(2):
+            threads, next_cursor, _ = get_thread_page(self.discussion.pk, per_page=2)
+            [reply.user.username for thread in threads for reply in thread.children]
+        self.assertEqual([t.content for t in threads], ['1', '2'])
+        self.assertEqual([c.content for c in threads[0].children], ['1a', '1b'])
+        self.assertEqual([c.content for c in threads[0].children[0].children], ['1a-i'])
+        
+        threads, next_cursor, previous_cursor = get_thread_page(self.discussion.pk, next_cursor, per_page=2)
+        self.assertEqual([t.pk for t in threads], [third.pk])
+        self.assertEqual(threads[0].children, [])
+        self.assertIsNone(next_cursor)
+        self.assertIsNotNone(previous_cursor)
+    
+    def test_depth_limit_and_expansion(self):
+        root = self.comment()
+        child = self.comment(root, 'child')
+        grandchild = self.comment(child, 'grandchild')
+        self.comment(grandchild, 'deep')
+        
+        threads, _, _ = get_thread_page(self.discussion.pk, depth=1)
+        child = threads[0].children[0]
+        self.assertEqual((child.children, child.replies_count), ([], 1))
+        
+        self.client.force_login(self.user)
+        data = self.client.get(f'/catalog/discussions/comments/{child.pk}/replies/', {'depth': 5}).json()
+        self.assertEqual(data['results'][0]['content'], 'grandchild')
+        self.assertEqual(data['results'][0]['replies'][0]['content'], 'deep')
+    
+    @override_settings(DISCUSSION_MAX_DEPTH=2)
+    def test_replies_past_max_depth_attach_to_deepest_ancestor(self):
+        root = self.comment()
+        child = self.comment(root)
+        too_deep = self.comment(child)
+        self.assertEqual((too_deep.parent_id, too_deep.depth), (root.pk, 1))
+    
+    @override_settings(DISCUSSION_MAX_DEPTH=1)
+    def test_replies_attach_to_root_when_max_depth_is_one(self):
+        root = self.comment()
+        reply = self.comment(root)
+        reply_to_reply = self.comment(reply)
+        self.assertEqual((reply.parent_id, reply.depth), (root.pk, 1))
+        self.assertEqual((reply_to_reply.parent_id, reply_to_reply.depth), (root.pk, 1))
+    
+    def test_rebuild_paths(self):
+        root = self.comment()
+        reply = self.comment(root)
+        DiscussionComment.objects.update(path='', depth=0, replies_count=0)
+        
+        call_command('rebuild_comment_paths', stdout=StringIO())
+        reply.refresh_from_db()
+        root.refresh_from_db()
+        self.assertEqual((reply.path, reply.depth, root.replies_count), (root.path + reply.path[-10:], 1, 1))
+    
+    def test_detail_view_rejects_foreign_parent(self):
+        other = BookDiscussion.objects.create(book=self.discussion.book, title='Other', description='D', created_by=self.user)
+        foreign = DiscussionComment.objects.create(discussion=other, user=self.user, content='x')
+        
+        request = RequestFactory().post('/', {'content': 'hi', 'parent_id': foreign.pk})
+        request.user = self.user
+        with self.assertRaises(Http404):
+            advanced_views.discussion_detail(request, self.discussion.pk)
+        self.assertFalse(self.discussion.comments.exists())
+
+class DiscussionActivityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.book = Book.objects.create(title='Talked About', isbn='9780000000003', publication_date=date.today(), pages=100)
+    
+    def discussion(self, title):
+        return BookDiscussion.objects.create(book=self.book, title=title, description='D', created_by=self.user)
+    
+    def comment(self, discussion, **kwargs):
+        return DiscussionComment.objects.create(discussion=discussion, user=self.user, content='C', **kwargs)
+    
+    def test_counters_follow_comments(self):
+        discussion = self.discussion('Busy')
+        root = self.comment(discussion)
+        reply = self.comment(discussion, parent=root)
+        
+        discussion.refresh_from_db()
+        self.assertEqual(discussion.comments_count, 2)
+        self.assertEqual(discussion.last_comment_at, reply.created_at)
+        
+        reply.delete()
+        discussion.refresh_from_db()
+        self.assertEqual(discussion.comments_count, 1)
+    
+    def test_stale_save_keeps_counters(self):
+        discussion = self.discussion('Busy')
+        stale = BookDiscussion.objects.get(pk=discussion.pk)
+        self.comment(discussion)
+        stale.title = 'Renamed'
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual((stale.title, stale.comments_count), ('Renamed', 1))
+    
+    def test_hot_ranking_without_counting(self):
+        quiet, busy = self.discussion('Quiet'), self.discussion('Busy')
+        for _ in range(12):
+            self.comment(busy)
+        
+        request = RequestFactory().get('/', {'sort': 'hot'})
+        request.user = self.user
+        with mock.patch.object(advanced_views, 'render', return_value=HttpResponse()) as render:
+            advanced_views.book_discussions(request)
+        discussions = render.call_args[0][2]['discussions']
+        self.assertNotIn('COUNT(', str(discussions.query).upper())
+        self.assertEqual(list(discussions), [busy, quiet])
+        
+        quiet.refresh_from_db()
+        busy.refresh_from_db()
+        self.assertGreater(busy.hot_score, quiet.hot_score)
+    
+    def test_recount_activity(self):
+        discussion = self.discussion('Busy')
+        self.comment(discussion)
+        BookDiscussion.objects.update(comments_count=0, last_comment_at=None, hot_score=0)
+        
+        call_command('recount_discussions', stdout=StringIO())
+        discussion.refresh_from_db()
+        self.assertEqual(discussion.comments_count, 1)
+        self.assertGreater(discussion.hot_score, 0)
+    
+    def test_likes_are_deduplicated(self):
+        comment = self.comment(self.discussion('Busy'))
+        other = User.objects.create_user(username='other', password='pass')
+        self.client.force_login(other)
+        url = f'/catalog/discussions/comments/{comment.pk}/like/'
+        
+        self.assertEqual(self.client.post(url).json()['likes_count'], 1)
+        self.assertEqual(self.client.post(url).json()['likes_count'], 1)
+        
+        comment.content = 'Edited'
+        comment.save()
+        comment.refresh_from_db()
+        self.assertEqual(comment.likes_count, 1)
+        
+        self.assertEqual(self.client.delete(url).json()['likes_count'], 0)
+        self.assertFalse(CommentLike.objects.exists())
+
+class EBookDownloadTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        
+        self.user = User.objects.create_user(username='reader', password='pass')
+        book = Book.objects.create(title='Readable', isbn='9780000000004', publication_date=date.today(), pages=100)
+        self.content = bytes(range(256)) * 4
+        self.ebook = EBookFile(book=book, format='PDF', file_size=len(self.content))
+        self.ebook.file.save('readable.pdf', ContentFile(self.content), save=False)
+        self.ebook.save()
+    
+    def download(self, **headers):
+        request = RequestFactory().get('/', headers=headers)
+        request.user = self.user
+        return advanced_views.download_ebook(request, self.ebook.pk)
+    
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=500-5000', 1000), (500, 999))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1000))
+        self.assertFalse(parse_range('bytes=1000-', 1000))
+    
+    def test_full_download_counts_once(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        
+        self.ebook.refresh_from_db()
+        self.assertEqual(self.ebook.downloads_count, 1)
+        self.assertEqual(EBookDownload.objects.count(), 1)
+    
+    def test_resumed_range(self):
+        response = self.download(Range='bytes=1000-', If_Range=self.ebook.etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1023/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[1000:])
+        
+        # Continuing a transfer is not a new download.
+        self.ebook.refresh_from_db()
+        self.assertEqual(self.ebook.downloads_count, 0)
+    
+    def test_stale_if_range_sends_whole_file(self):
+        response = self.download(Range='bytes=1000-', If_Range='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+    
+    def test_if_range_date(self):
+        last_modified = self.download()['Last-Modified']
+        self.assertEqual(last_modified, http_date(self.ebook.uploaded_at.timestamp()))
+        self.assertEqual(self.download(Range='bytes=1000-', If_Range=last_modified).status_code, 206)
+        
+        self.ebook.file = ContentFile(self.content[::-1], name='revised.pdf')
+        self.ebook.save(update_fields=['file'])
+        response = self.download(Range='bytes=1000-', If_Range=http_date(self.ebook.uploaded_at.timestamp() - 60))
+        self.assertEqual(response.status_code, 200)
+    
+    def test_unsatisfiable_range(self):
+        response = self.download(Range='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+    
+    @override_settings(EBOOK_SENDFILE_BACKEND='nginx')
+    def test_accel_redirect(self):
+        response = self.download()
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.ebook.file.name)
+        self.assertEqual(response.content, b'')
+    
+    @override_settings(EBOOK_SENDFILE_BACKEND='xsendfile')
+    def test_xsendfile(self):
+        self.assertEqual(self.download()['X-Sendfile'], self.ebook.file.path)
+
+class EBookUploadTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmp.name, 'media'),
+            EBOOK_UPLOAD_DIR=os.path.join(self.tmp.name, 'uploads'),
+            EBOOK_UPLOAD_CHUNK_SIZE=1000,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        
+        self.user = User.objects.create_user(username='librarian', password='pass')
+        LibrarianProfile.objects.create(
+            user=self.user, employee_id='E1', department='Digital', designation='Librarian',
+            phone_number='+1000000000', hire_date=date.today()
+        )
+        self.client.force_login(self.user)
+        self.first = Book.objects.create(title='First Edition', isbn='9780000000005', publication_date=date.today(), pages=100)
+        self.second = Book.objects.create(title='Second Edition', isbn='9780000000006', publication_date=date.today(), pages=100)
+        self.content = os.urandom(2500)
+    
+    def start(self, book, size=None):
+        return self.client.post('/catalog/api/ebooks/uploads/', json.dumps({
+            'book_id': book.pk, 'format': 'pdf', 'filename': 'book.pdf', 'size': size or len(self.content)
+        }), content_type='application/json')
+    
+    def put(self, upload_id, offset, chunk):
+        return self.client.put(
+            f'/catalog/api/ebooks/uploads/{upload_id}/?offset={offset}', chunk,
+            content_type='application/octet-stream'
+        )
+    
+    def upload(self, book):
+        upload_id = self.start(book).json()['upload_id']
+        for offset in range(0, len(self.content), 1000):
+            response = self.put(upload_id, offset, self.content[offset:offset + 1000])
+        return response.json()
+    
+    def test_chunked_upload_is_content_addressed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            data = self.upload(self.first)
+        self.assertTrue(data['complete'])
+        
+        ebook = EBookFile.objects.get(pk=data['ebook_id'])
+        digest = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual((ebook.sha256, ebook.file_size), (digest, len(self.content)))
+        self.assertTrue(ebook.file.name.endswith(f'{digest}.pdf'))
+        with ebook.file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'uploads')), [])
+    
+    def test_stored_in_the_file_fields_storage(self):
+        storage = FileSystemStorage(location=os.path.join(self.tmp.name, 'ebooks'))
+        with mock.patch.object(EBookFile._meta.get_field('file'), 'storage', storage), \
+                self.captureOnCommitCallbacks(execute=True):
+            data = self.upload(self.first)
+            ebook = EBookFile.objects.get(pk=data['ebook_id'])
+            self.assertTrue(storage.exists(ebook.file.name))
+            with ebook.file.open('rb') as handle:
+                self.assertEqual(handle.read(), self.content)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'media', 'ebooks')))
+    
+    def test_chunks_are_hashed_as_they_arrive(self):
+        with mock.patch('catalog.uploads.hash_file') as hash_file:
+            data = self.upload(self.first)
+        hash_file.assert_not_called()
+        self.assertEqual(EBookFile.objects.get(pk=data['ebook_id']).sha256, hashlib.sha256(self.content).hexdigest())
+    
+    def test_retry_after_failed_store(self):
+        upload_id = self.start(self.first).json()['upload_id']
+        self.put(upload_id, 0, self.content[:1000])
+        self.put(upload_id, 1000, self.content[1000:2000])
+        with mock.patch('catalog.uploads.store_content', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.put(upload_id, 2000, self.content[2000:])
+        self.assertEqual(EBookUpload.objects.get(pk=upload_id).received_bytes, len(self.content))
+        
+        data = self.put(upload_id, 2000, self.content[2000:]).json()
+        self.assertTrue(data['complete'])
+        self.assertEqual(EBookFile.objects.get(pk=data['ebook_id']).sha256, hashlib.sha256(self.content).hexdigest())
+    
+    def test_identical_files_are_stored_once(self):
+        first = EBookFile.objects.get(pk=self.upload(self.first)['ebook_id'])
+        second = EBookFile.objects.get(pk=self.upload(self.second)['ebook_id'])
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(len(os.listdir(os.path.dirname(first.file.path))), 1)
+    
+    def test_resume_after_wrong_offset(self):
+        upload_id = self.start(self.first).json()['upload_id']
+        self.put(upload_id, 0, self.content[:1000])
+        
+        response = self.put(upload_id, 2000, self.content[2000:])
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 1000))
+        self.assertEqual(self.client.get(f'/catalog/api/ebooks/uploads/{upload_id}/').json()['offset'], 1000)
+        
+        self.put(upload_id, 1000, self.content[1000:2000])
+        self.assertTrue(self.put(upload_id, 2000, self.content[2000:]).json()['complete'])
+    
+    def test_validation(self):
+        self.assertEqual(self.start(self.first, size=10 ** 12).status_code, 400)
+        upload_id = self.start(self.first).json()['upload_id']
+        self.assertEqual(self.put(upload_id, 0, b'x' * 1001).status_code, 400)
+        
+        self.client.force_login(User.objects.create_user(username='member', password='pass'))
+        self.assertEqual(self.start(self.first).status_code, 403)
+        self.assertEqual(self.client.get(f'/catalog/api/ebooks/uploads/{upload_id}/').status_code, 404)
+    
+    def test_form_upload_is_deduplicated(self):
+        ebook = EBookFile.objects.create(book=self.first, format='PDF', file=SimpleUploadedFile('first.pdf', self.content))
+        self.assertEqual(ebook.file_size, len(self.content))
+        
+        chunked = EBookFile.objects.get(pk=self.upload(self.second)['ebook_id'])
+        self.assertEqual(ebook.file.name, chunked.file.name)
+    
+    def test_purge_stale_uploads(self):
+        upload_id = self.start(self.first).json()['upload_id']
+        self.put(upload_id, 0, self.content[:1000])
+        EBookUpload.objects.update(updated_at=date(2020, 1, 1))
+        
+        call_command('purge_stale_uploads', stdout=StringIO())
+        self.assertFalse(EBookUpload.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'uploads')), [])
+
+def make_epub(path, chapters):
+    with zipfile.ZipFile(path, 'w') as epub:
+        epub.writestr('META-INF/container.xml', (
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+            '<rootfile full-path="OEBPS/content.opf"/></rootfiles></container>'
+        ))
+        items = ''.join(f'<item id="c{i}" href="c{i}.xhtml"/>' for i in range(len(chapters)))
+        spine = ''.join(f'<itemref idref="c{i}"/>' for i in range(len(chapters)))
+        epub.writestr('OEBPS/content.opf', (
+            f'<package xmlns="http://www.idpf.org/2007/opf"><manifest>{items}</manifest>'
+            f'<spine>{spine}</spine></package>'
+        ))
+        for i, (heading, body) in enumerate(chapters):
+            epub.writestr(f'OEBPS/c{i}.xhtml', f'<html><head><title>x</title></head><body><h1>{heading}</h1><p>{body}</p></body></html>')
+
+class EBookTextSearchTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.book = Book.objects.create(title='Whales', isbn='9780000000007', publication_date=date.today(), pages=100)
+        self.txt = EBookFile.objects.create(book=self.book, format='TXT', file=SimpleUploadedFile(
+            'whales.txt', 'Call me Ishmael.\fThe white whale surfaced near the Pequod.\fThe end.'.encode()
+        ))
+        epub_path = os.path.join(self.tmp.name, 'source.epub')
+        make_epub(epub_path, [('Loomings', 'Dry land and <b>harpoon</b> practice.'), ('The Chase', 'A harpoon flies at the whale.')])
+        with open(epub_path, 'rb') as handle:
+            self.epub = EBookFile.objects.create(book=self.book, format='EPUB', file=SimpleUploadedFile('whales.epub', handle.read()))
+    
+    def test_extract_epub_chapters(self):
+        sections = extract_epub(self.epub.file.path, 4000)
+        self.assertEqual(sections, [('Loomings', 'Loomings Dry land and harpoon practice.'), ('The Chase', 'The Chase A harpoon flies at the whale.')])
+    
+    def test_search_reports_pages_and_chapters(self):
+        self.assertEqual(index_pending_ebooks(workers=0), {'INDEXED': 2})
+        
+        results = {r['ebook'].format: r['hits'] for r in search_ebook_text('whale')}
+        self.assertEqual([hit['label'] for hit in results['TXT']], ['Page 2'])
+        self.assertIn('<mark>whale</mark>', results['TXT'][0]['snippet'])
+        self.assertEqual([hit['label'] for hit in results['EPUB']], ['The Chase'])
+        
+        self.assertEqual([r['ebook'].pk for r in search_ebook_text('harpoon')], [self.epub.pk])
+    
+    def test_process_pool_indexing(self):
+        self.assertEqual(index_pending_ebooks(workers=2), {'INDEXED': 2})
+        self.assertEqual(EBookPassage.objects.filter(ebook=self.txt).count(), 3)
+    
+    def test_incremental_updates(self):
+        index_pending_ebooks(workers=0)
+        # Indexed files are not extracted again.
+        self.assertEqual(index_pending_ebooks(workers=0), {})
+        
+        self.epub.is_active = False
+        self.epub.save()
+        self.assertFalse(EBookPassage.objects.filter(ebook=self.epub).exists())
+        self.assertEqual(search_ebook_text('harpoon'), [])
+        
+        self.epub.is_active = True
+        self.epub.save()
+        self.assertEqual(index_pending_ebooks(workers=0), {'INDEXED': 1})
+        self.assertEqual(len(search_ebook_text('harpoon')), 1)
+        
+        self.txt.delete()
+        self.assertEqual([r['ebook'].pk for r in search_ebook_text('whale')], [self.epub.pk])
+    
+    def test_unsupported_format(self):
+        EBookFile.objects.create(book=self.book, format='MOBI', file=SimpleUploadedFile('whales.mobi', b'binary'))
+        self.assertEqual(index_pending_ebooks(workers=0)['UNSUPPORTED'], 1)
+    
+    def test_pdf_waits_for_pypdf(self):
+        pdf = EBookFile.objects.create(book=self.book, format='PDF', file=SimpleUploadedFile('whales.pdf', b'%PDF-1.4'))
+        with mock.patch.dict('sys.modules', {'pypdf': None}):
+            index_pending_ebooks(workers=0)
+        pdf.refresh_from_db()
+        self.assertEqual(pdf.text_status, 'PENDING')
+        
+        EBookFile.objects.filter(pk=pdf.pk).update(text_status='UNSUPPORTED')
+        with mock.patch('catalog.ebook_text.pdf_supported', return_value=True), \
+                mock.patch('catalog.ebook_text.extract_file', return_value=(pdf.pk, 'INDEXED', [('Page 1', 'Moby')])):
+            self.assertEqual(index_pending_ebooks(workers=0), {'INDEXED': 1})
+        pdf.refresh_from_db()
+        self.assertEqual(pdf.text_status, 'INDEXED')
+    
+    def test_new_file_is_queued_on_commit(self):
+        with mock.patch('catalog.tasks.index_ebook_text.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                EBookFile.objects.create(book=self.book, format='MOBI', file=SimpleUploadedFile('whales.mobi', b'binary'))
+        delay.assert_called_once_with()
+    
+    def test_api(self):
+        call_command('index_ebook_text', workers=0, stdout=StringIO())
+        self.client.force_login(self.user)
+        data = self.client.get('/catalog/api/ebooks/search/', {'q': 'Ishmael'}).json()
+        self.assertEqual(data['results'][0]['hits'][0]['label'], 'Page 1')
+        self.assertEqual(self.client.get('/catalog/api/ebooks/search/').status_code, 400)
+
+def png_upload(name, size=(800, 1200), mode='RGBA'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+@override_settings(IMAGE_DERIVATIVE_WORKERS=0, IMAGE_DERIVATIVE_SIZES={'thumb': (96, 144), 'small': (200, 300)})
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+    
+    def make_book(self, isbn='9780000000008'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Book.objects.create(
+                title='Covered', isbn=isbn, publication_date=date.today(), pages=100,
+                cover_image=png_upload('cover.png')
+            )
+    
+    def test_derivatives_on_upload(self):
+        book = self.make_book()
+        urls = derivative_urls(book.cover_image)
+        
+        self.assertEqual(ImageDerivative.objects.filter(source=book.cover_image.name).count(), 4)
+        self.assertEqual((urls['thumb']['width'], urls['thumb']['height']), (96, 144))
+        self.assertTrue(urls['small']['webp'].endswith('.webp'))
+        
+        derivative = ImageDerivative.objects.get(source=book.cover_image.name, size='small', format='jpeg')
+        with book.cover_image.storage.open(derivative.name) as handle:
+            image = Image.open(handle)
+            self.assertEqual((image.format, image.mode, image.size), ('JPEG', 'RGB', (200, 300)))
+    
+    def test_names_are_content_hashed(self):
+        first = self.make_book()
+        second = self.make_book('9780000000009')
+        names = lambda book: sorted(ImageDerivative.objects.filter(source=book.cover_image.name).values_list('name', flat=True))
+        # Identical pixels give identical derivatives, stored once.
+        self.assertNotEqual(first.cover_image.name, second.cover_image.name)
+        self.assertEqual(names(first), names(second))
+    
+    def test_template_tag_and_api_field(self):
+        book = self.make_book()
+        html = Template("{% load image_tags %}{% picture book.cover_image 'small' alt=book.title %}").render(Context({'book': book}))
+        small = derivative_urls(book.cover_image)['small']
+        self.assertIn(f'srcset="{small["webp"]}" type="image/webp"', html)
+        self.assertIn(f'src="{small["jpeg"]}" width="200" height="300" alt="Covered"', html)
+        
+        self.assertEqual(BookSerializer(book).data['cover_images'], derivative_urls(book.cover_image))
+    
+    def test_page_of_covers_is_one_lookup(self):
+        books = [self.make_book(), self.make_book('9780000000009')]
+        cache.clear()
+        with self.assertNumQueries(1):
+            urls = derivative_urls_many(book.cover_image for book in books)
+        with self.assertNumQueries(0):
+            self.assertEqual(urls[books[1].cover_image.name], derivative_urls(books[1].cover_image))
+        
+        cache.clear()
+        with mock.patch('catalog.serializers.derivative_urls') as single:
+            results = mobile_book_search(APIRequestFactory().get('/catalog/api/mobile/search/')).data['results']
+        single.assert_not_called()
+        self.assertEqual([book['cover_images'] for book in results], [urls[book.cover_image.name] for book in books])
+    
+    def test_original_until_generated(self):
+        with override_settings(IMAGE_DERIVATIVE_WORKERS=2), mock.patch('catalog.images.get_pool') as get_pool:
+            book = self.make_book()
+        get_pool.return_value.submit.assert_called_once()
+        self.assertFalse(ImageDerivative.objects.exists())
+        
+        html = Template("{% load image_tags %}{% image_url book.cover_image 'thumb' 'webp' %}").render(Context({'book': book}))
+        self.assertEqual(html, book.cover_image.url)
+        self.assertIsNone(cache.get(derivatives_cache_key(book.cover_image.name)))
+    
+    def test_only_a_new_cover_is_scheduled(self):
+        book = self.make_book()
+        with mock.patch('catalog.signals.schedule_derivatives') as schedule:
+            book.title = 'Renamed'
+            book.save()
+            Book.objects.get(pk=book.pk).save()
+            Book.objects.only('pk', 'title').get(pk=book.pk).save()
+            schedule.assert_not_called()
+            
+            book.cover_image = png_upload('new.png')
+            book.save()
+            schedule.assert_called_once()
+    
+    def test_build_command_backfills(self):
+        author = Author.objects.create(first_name='Ann', last_name='Photo', photo=png_upload('ann.png', mode='RGB'))
+        self.assertFalse(ImageDerivative.objects.exists())
+        
+        call_command('build_image_derivatives', stdout=StringIO())
+        self.assertEqual(ImageDerivative.objects.filter(source=author.photo.name).count(), 4)
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import threading
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+READ_SIZE = 1024 * 1024
+
+def content_name(digest, filename):
+    """Storage name for content with SHA-256 ``digest``, keeping the extension."""
+    extension = os.path.splitext(filename)[1].lower()
+    return f'ebooks/sha256/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+def hash_file(handle):
+    """``(sha256 hexdigest, size)`` of an open file, read a block at a time."""
+    digest, size = hashlib.sha256(), 0
+    for block in iter(lambda: handle.read(READ_SIZE), b''):
+        digest.update(block)
+        size += len(block)
+    return digest.hexdigest(), size
+
+def store_content(content, filename, digest=None):
+    """
+    Store ``content`` once under its SHA-256 and return ``(name, digest, size)``.
+
+    The file is hashed a block at a time unless the caller already knows
+    ``digest``, and nothing is written when the same bytes are already
+    stored.
+    """
+    from catalog.advanced_models import EBookFile
+
+    # Write where EBookFile.file reads from, even with a custom storage.
+    storage = EBookFile._meta.get_field('file').storage
+    content.open('rb')
+    content.seek(0)
+    if digest is None:
+        digest, size = hash_file(content)
+    else:
+        size = content.size
+    name = content_name(digest, filename)
+    if not storage.exists(name):
+        content.seek(0)
+        saved = storage.save(name, content)
+        if saved != name:
+            # Another request stored the same bytes first.
+            storage.delete(saved)
+    return name, digest, size
+
+def upload_dir():
+    return str(getattr(settings, 'EBOOK_UPLOAD_DIR', os.path.join(settings.BASE_DIR, 'var', 'uploads')))
+
+def part_path(upload):
+    return os.path.join(upload_dir(), f'{upload.pk}.part')
+
+# Running SHA-256 of each upload in this process as ``{upload_id: (offset,
+# hash)}``. hashlib state cannot be written to the database, so when a
+# chunk lands on another worker, or the process restarts, the entry no
+# longer matches the offset and finish_upload() hashes the part file.
+_digests = {}
+_digests_lock = threading.Lock()
+
+def running_digest(upload_id, offset):
+    with _digests_lock:
+        hashed_to, digest = _digests.pop(upload_id, (None, None))
+    if hashed_to == offset:
+        return digest
+    return hashlib.sha256() if offset == 0 else None
+
+class UploadOffsetMismatch(Exception):
+    def __init__(self, offset):
+        super().__init__(f'Upload is at offset {offset}')
+        self.offset = offset
+
+def append_chunk(upload_id, offset, stream, length):
+    """
+    Append ``length`` bytes read from ``stream`` at ``offset`` of an upload.
+
+    The row is locked while the part file grows, so two clients resuming
+    the same upload cannot interleave. The chunk is copied a block at a
+    time, never held in memory, and fed to the upload's running SHA-256.
+    Once the last byte is in, the file is stored and attached outside that
+    lock. A chunk sent after every byte arrived but before the file was
+    attached retries the attach. Returns the upload; raises
+    ``UploadOffsetMismatch`` when ``offset`` is not where the upload stopped.
+    """
+    from catalog.advanced_models import EBookUpload
+
+    digest = None
+    with transaction.atomic():
+        upload = EBookUpload.objects.select_for_update().get(pk=upload_id)
+        received = upload.received_bytes == upload.total_size
+        if upload.is_complete or (offset != upload.received_bytes and not received):
+            raise UploadOffsetMismatch(upload.received_bytes)
+
+        if not received:
+            if offset + length > upload.total_size:
+                raise ValueError('Chunk runs past the declared size')
+
+            digest = running_digest(upload.pk, offset)
+            os.makedirs(upload_dir(), exist_ok=True)
+            with open(part_path(upload), 'ab') as part:
+                # Drop bytes from an earlier request that died before committing.
+                part.truncate(offset)
+                remaining = length
+                while remaining:
+                    block = stream.read(min(READ_SIZE, remaining))
+                    if not block:
+                        break
+                    part.write(block)
+                    if digest:
+                        digest.update(block)
+                    remaining -= len(block)
+            if remaining:
+                raise ValueError('Request body ended before Content-Length')
+
+            upload.received_bytes = offset + length
+            upload.save(update_fields=['received_bytes', 'updated_at'])
+
+    if upload.received_bytes < upload.total_size:
+        if digest:
+            with _digests_lock:
+                _digests[upload.pk] = (upload.received_bytes, digest)
+        return upload
+    return finish_upload(upload, digest)
+
+def finish_upload(upload, digest=None):
+    """
+    Move a complete part file into content-addressed storage and attach it.
+
+    The copy runs outside any transaction; only the row updates that
+    attach the stored file are atomic. Returns the upload.
+    """
+    from catalog.advanced_models import EBookFile, EBookUpload
+
+    path = part_path(upload)
+    with open(path, 'rb') as part:
+        name, sha256, size = store_content(
+            File(part), upload.filename, digest.hexdigest() if digest else None
+        )
+
+    with transaction.atomic():
+        upload = EBookUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.is_complete:
+            # A concurrent retry attached it first.
+            return upload
+
+        ebook, created = EBookFile.objects.get_or_create(
+            book=upload.book,
+            format=upload.format,
+            defaults={'file': name, 'sha256': sha256, 'file_size': size},
+        )
+        if not created:
+            ebook.file.name, ebook.sha256, ebook.file_size = name, sha256, size
+            ebook.text_status = 'PENDING'
+            ebook.save(update_fields=['file', 'sha256', 'file_size', 'text_status'])
+
+        upload.ebook = ebook
+        upload.save(update_fields=['ebook', 'updated_at'])
+        def remove_part():
+            if os.path.exists(path):
+                os.remove(path)
+        transaction.on_commit(remove_part)
+    return upload
+
+def purge_stale_uploads(before):
+    """Delete unfinished uploads last touched before ``before`` and their parts."""
+    from catalog.advanced_models import EBookUpload
+
+    stale = EBookUpload.objects.filter(ebook__isnull=True, updated_at__lt=before)
+    count = 0
+    for upload in stale.iterator():
+        if os.path.exists(part_path(upload)):
+            os.remove(part_path(upload))
+        with _digests_lock:
+            _digests.pop(upload.pk, None)
+        upload.delete()
+        count += 1
+    return count
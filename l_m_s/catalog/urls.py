@@ -1,11 +1,22 @@
 from django.urls import path
-from . import views
+from . import views, api_views
 
 urlpatterns = [
     path('', views.book_list, name='book_list'),
     path('book/<int:pk>/', views.book_detail, name='book_detail'),
     path('book/<int:pk>/review/', views.add_review, name='add_review'),
+    path('book/<int:pk>/similar/', api_views.api_similar_books, name='similar_books'),
+    path('book/<int:pk>/reviews/', api_views.api_book_reviews, name='book_reviews'),
+    path('reviews/<int:review_id>/helpful/', api_views.api_review_vote, name='review_vote'),
+    path('discussions/comments/<int:comment_id>/replies/', api_views.api_comment_replies, name='comment_replies'),
+    path('discussions/comments/<int:comment_id>/like/', api_views.api_comment_like, name='comment_like'),
     path('reading-lists/', views.reading_list_view, name='reading_lists'),
     path('reading-lists/create/', views.create_reading_list, name='create_reading_list'),
     path('trending/', views.trending_books, name='trending_books'),
+    path('api/suggest/', api_views.api_suggest, name='api_suggest'),
+    path('api/books/isbn-lookup/', api_views.api_isbn_lookup, name='api_isbn_lookup'),
+    path('api/ebooks/search/', api_views.api_ebook_text_search, name='api_ebook_text_search'),
+    path('api/ebooks/uploads/', api_views.api_ebook_upload_start, name='api_ebook_upload_start'),
+    path('api/ebooks/uploads/<uuid:upload_id>/', api_views.api_ebook_upload_chunk, name='api_ebook_upload_chunk'),
+    path('api/books/availability/', api_views.api_books_availability, name='api_books_availability'),
 ]
@@ -1,9 +1,13 @@
 from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
 
 def calculate_popularity_score(book):
     total_loans = book.instances.filter(loan__isnull=False).count()
-    total_reviews = book.reviews.count()
+    total_reviews = book.total_ratings
     avg_rating = float(book.average_rating)
     
     loan_weight = 2.0
@@ -23,8 +27,147 @@ def calculate_fine_amount(loan, policy):
     
     return min(fine_amount, float(policy.max_fine_amount))
 
+def review_data(review):
+    return {
+        'id': review.pk,
+        'user': review.user.username,
+        'rating': review.rating,
+        'title': review.title,
+        'content': review.content,
+        'helpful_count': review.helpful_count,
+        'created_at': review.created_at,
+    }
+
+def get_review_page(book_id, sort='helpful', cursor=None, per_page=10):
+    """
+    One keyset page of a book's reviews, most helpful or newest first.
+
+    Served by the (book, -helpful_count, -id) and (book, -created_at, -id)
+    indexes, so deep pages cost the same as the first.
+    """
+    from catalog.models import Review
+    from catalog.pagination import REVIEW_ORDERINGS, KeysetPaginator
+    
+    order_field, descending = REVIEW_ORDERINGS[sort]
+    reviews = Review.objects.filter(book_id=book_id).select_related('user')
+    page = KeysetPaginator(reviews, order_field, descending, per_page).page(cursor)
+    return [review_data(review) for review in page], page.next_cursor, page.previous_cursor
+
+def build_comment_tree(comments):
+    """
+    Nest path-ordered comments; each gets a ``children`` list.
+    
+    Returns the comments whose parent is not in ``comments``, which are the
+    roots of a thread page or the direct replies of an expanded comment.
+    """
+    roots, by_id = [], {}
+    for comment in comments:
+        comment.children = []
+        by_id[comment.pk] = comment
+        parent = by_id.get(comment.parent_id)
+        if parent is not None:
+            parent.children.append(comment)
+        else:
+            roots.append(comment)
+    return roots
+
+def get_thread_page(discussion_id, cursor=None, per_page=20, depth=None):
+    """
+    One keyset page of top-level threads with their replies.
+    
+    Thread roots are paged in path order, so a page covers one contiguous
+    path range and every reply on it comes back in a single ordered query.
+    Replies deeper than ``depth`` levels are left out; comments with
+    ``replies_count`` but no ``children`` can be expanded later.
+    Returns ``(threads, next_cursor, previous_cursor)``.
+    """
+    from catalog.advanced_models import DiscussionComment
+    from catalog.pagination import KeysetPaginator
+    
+    roots = DiscussionComment.objects.filter(discussion_id=discussion_id, depth=0).only('pk', 'path')
+    page = KeysetPaginator(roots, 'path', False, per_page).page(cursor)
+    if not len(page):
+        return [], page.next_cursor, page.previous_cursor
+    
+    comments = DiscussionComment.objects.filter(
+        discussion_id=discussion_id,
+        path__gte=page.object_list[0].path,
+        # ':' sorts right after '9', so this bounds the last root's subtree.
+        path__lt=page.object_list[-1].path + ':',
+    ).select_related('user').order_by('path')
+    if depth is not None:
+        comments = comments.filter(depth__lte=depth)
+    
+    return build_comment_tree(comments), page.next_cursor, page.previous_cursor
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'user': comment.user.username,
+        'content': comment.content,
+        'parent_id': comment.parent_id,
+        'depth': comment.depth,
+        'likes_count': comment.likes_count,
+        'replies_count': comment.replies_count,
+        'created_at': comment.created_at.isoformat(),
+        'replies': [comment_data(child) for child in getattr(comment, 'children', [])],
+    }
+
 def get_available_books_count(book):
-    return book.instances.filter(status='AVAILABLE').count()
+    return book.available_copies
+
+AVAILABILITY_FIELDS = {
+    'AVAILABLE': 'available_copies',
+    'ON_LOAN': 'on_loan',
+    'RESERVED': 'reserved',
+    'MAINTENANCE': 'maintenance',
+    'LOST': 'lost',
+    'DAMAGED': 'damaged',
+}
+
+def availability_cache_key(book_id):
+    return f"book_availability_{book_id}"
+
+def expire_availability_counts(book_ids):
+    """Drop the cached counts of ``book_ids`` once the current transaction commits."""
+    keys = [availability_cache_key(book_id) for book_id in book_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+def get_availability_counts(book_ids):
+    """
+    Per-status copy counts for many books.
+    
+    Cached entries are served first; the rest come from a single
+    GROUP BY (book_id, status) query and are cached briefly.
+    """
+    from catalog.models import BookInstance
+    
+    keys = {availability_cache_key(book_id): book_id for book_id in book_ids}
+    results = {keys[key]: counts for key, counts in cache.get_many(list(keys)).items()}
+    
+    missing = [book_id for book_id in book_ids if book_id not in results]
+    if missing:
+        fresh = {
+            book_id: dict({'total_copies': 0}, **{field: 0 for field in AVAILABILITY_FIELDS.values()})
+            for book_id in missing
+        }
+        rows = BookInstance.objects.filter(
+            book_id__in=missing
+        ).order_by().values_list('book_id', 'status').annotate(count=Count('pk'))
+        
+        for book_id, status, count in rows:
+            fresh[book_id]['total_copies'] += count
+            if status in AVAILABILITY_FIELDS:
+                fresh[book_id][AVAILABILITY_FIELDS[status]] = count
+        
+        cache.set_many(
+            {availability_cache_key(book_id): counts for book_id, counts in fresh.items()},
+            getattr(settings, 'CATALOG_AVAILABILITY_CACHE_TIMEOUT', 30)
+        )
+        results.update(fresh)
+    
+    return results
 
 def can_checkout_book(member, book_instance):
     from circulation.models import Loan, CheckoutPolicy
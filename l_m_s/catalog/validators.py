@@ -53,6 +53,29 @@ def clean_isbn(isbn):
     """Remove hyphens and spaces from ISBN"""
     return isbn.replace('-', '').replace(' ', '')
 
+def isbn10_to_isbn13(isbn):
+    """Convert a cleaned ISBN-10 to its 978-prefixed ISBN-13 form"""
+    body = '978' + isbn[:9]
+    total = sum(
+        int(digit) * (1 if i % 2 == 0 else 3)
+        for i, digit in enumerate(body)
+    )
+    return body + str((10 - (total % 10)) % 10)
+
+def normalize_isbn(isbn):
+    """
+    Return the ISBN-13 form of an ISBN-10 or ISBN-13, or None if the value
+    does not look like an ISBN.
+    """
+    isbn = clean_isbn(isbn or '').upper()
+    
+    if len(isbn) == 10 and isbn[:-1].isdigit() and (isbn[-1].isdigit() or isbn[-1] == 'X'):
+        return isbn10_to_isbn13(isbn)
+    elif len(isbn) == 13 and isbn.isdigit():
+        return isbn
+    
+    return None
+
 def format_isbn(isbn):
     """Format ISBN with proper hyphens"""
     isbn = clean_isbn(isbn)
@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+from django.conf import settings
+
+MAGIC = b'LMSVEC01'
+ALIGNMENT = 64
+POINTER = 'CURRENT'
+KINDS = ('LOAN', 'CONTENT')
+
+logger = logging.getLogger(__name__)
+
+def store_dir():
+    return str(getattr(settings, 'CATALOG_VECTOR_STORE_DIR', os.path.join(settings.BASE_DIR, 'var', 'vectors')))
+
+def write_arrays(path, arrays, meta=None):
+    """
+    Write named arrays into one file that readers can memory-map.
+
+    Layout: magic, header length, JSON header with each array's dtype,
+    shape and offset, then the raw arrays aligned to 64 bytes.
+    """
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header = json.dumps({'arrays': layout, 'meta': meta or {}}).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    with open(path, 'wb') as handle:
+        handle.write(MAGIC)
+        handle.write(len(header).to_bytes(8, 'little'))
+        handle.write(header)
+        for name, array in arrays.items():
+            handle.seek(data_start + layout[name]['offset'])
+            handle.write(array.tobytes())
+        handle.truncate(data_start + offset)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    return path
+
+def read_arrays(path):
+    """Map a file written by ``write_arrays``; returns ``(arrays, meta)``."""
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    if bytes(mapped[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f'{path} is not a vector store file')
+
+    header_length = int.from_bytes(bytes(mapped[len(MAGIC):len(MAGIC) + 8]), 'little')
+    header_start = len(MAGIC) + 8
+    header = json.loads(bytes(mapped[header_start:header_start + header_length]))
+    data_start = -(-(header_start + header_length) // ALIGNMENT) * ALIGNMENT
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+        start = data_start + spec['offset']
+        arrays[name] = mapped[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+    return arrays, header['meta']
+
+class VectorStore:
+    """
+    Read-only view of a published store file.
+
+    Arrays stay memory-mapped, so every worker process that opens the same
+    version shares one copy in the page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.arrays, self.meta = read_arrays(path)
+        self.version = self.meta.get('version')
+        self.book_ids = self.arrays['book_ids']
+
+    def position(self, book_id):
+        index = int(np.searchsorted(self.book_ids, book_id))
+        if index < len(self.book_ids) and self.book_ids[index] == book_id:
+            return index
+        return None
+
+    def __contains__(self, book_id):
+        return self.position(book_id) is not None
+
+    def title(self, book_id):
+        index = self.position(book_id)
+        if index is None:
+            return None
+        offsets = self.arrays['title_offsets']
+        return bytes(self.arrays['titles'][offsets[index]:offsets[index + 1]]).decode()
+
+    def popularity(self, book_id):
+        index = self.position(book_id)
+        return float(self.arrays['popularity'][index]) if index is not None else 0.0
+
+    def neighbors(self, kind, book_id, limit=None):
+        """``[(neighbor_id, score), ...]`` best first."""
+        index = self.position(book_id)
+        if index is None:
+            return []
+        indptr = self.arrays[f'{kind.lower()}_indptr']
+        start, end = indptr[index], indptr[index + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        ids = self.arrays[f'{kind.lower()}_neighbors'][start:end]
+        scores = self.arrays[f'{kind.lower()}_scores'][start:end]
+        return [(int(neighbor_id), float(score)) for neighbor_id, score in zip(ids, scores)]
+
+    def popular(self, limit, exclude=()):
+        """Most popular book ids, skipping ``exclude``."""
+        results = []
+        for index in self.arrays['popular_order']:
+            book_id = int(self.book_ids[index])
+            if book_id not in exclude:
+                results.append(book_id)
+                if len(results) >= limit:
+                    break
+        return results
+
+def collect_arrays(popular_count=1000):
+    """Snapshot neighbour lists, popularity and titles from the database."""
+    from catalog.models import Book
+    from catalog.advanced_models import BookNeighbor
+    from analytics.models import BookPopularity
+
+    ids, titles = [], []
+    for book_id, title in Book.objects.order_by('pk').values_list('pk', 'title').iterator(chunk_size=20000):
+        ids.append(book_id)
+        titles.append(title.encode())
+    book_ids = np.array(ids, dtype=np.int64)
+
+    lengths = np.fromiter((len(title) for title in titles), dtype=np.int64, count=len(titles))
+    arrays = {
+        'book_ids': book_ids,
+        'titles': np.frombuffer(b''.join(titles), dtype=np.uint8),
+        'title_offsets': np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+    }
+
+    popularity = np.zeros(len(book_ids), dtype=np.float32)
+    scores = BookPopularity.objects.values_list('book_id', 'popularity_score')
+    for book_id, score in scores.iterator(chunk_size=20000):
+        index = np.searchsorted(book_ids, book_id)
+        if index < len(book_ids) and book_ids[index] == book_id:
+            popularity[index] = score
+    arrays['popularity'] = popularity
+    arrays['popular_order'] = np.argsort(-popularity, kind='stable')[:popular_count].astype(np.int64)
+
+    for kind in KINDS:
+        rows = BookNeighbor.objects.filter(kind=kind).order_by('book_id', '-score')
+        sources, targets, weights = [], [], []
+        for book_id, neighbor_id, score in rows.values_list('book_id', 'neighbor_id', 'score').iterator(chunk_size=50000):
+            sources.append(book_id)
+            targets.append(neighbor_id)
+            weights.append(score)
+        positions = np.searchsorted(book_ids, np.array(sources, dtype=np.int64))
+        counts = np.bincount(positions, minlength=len(book_ids)) if len(positions) else np.zeros(len(book_ids), dtype=np.int64)
+        arrays[f'{kind.lower()}_indptr'] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        arrays[f'{kind.lower()}_neighbors'] = np.array(targets, dtype=np.int64)
+        arrays[f'{kind.lower()}_scores'] = np.array(weights, dtype=np.float32)
+
+    return arrays
+
+def publish_store(keep=2):
+    """
+    Write a new store version and point readers at it.
+
+    The file is written under a temporary name and the ``CURRENT`` pointer
+    is swapped with ``os.replace``, so readers see the old version or the
+    new one, never a partial file. Returns the new version.
+    """
+    directory = store_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    version = time.strftime('%Y%m%d%H%M%S') + f'{time.time_ns() % 10**9:09d}'
+    name = f'store-{version}.bin'
+    write_arrays(os.path.join(directory, name + '.tmp'), collect_arrays(), {'version': version})
+    os.replace(os.path.join(directory, name + '.tmp'), os.path.join(directory, name))
+
+    pointer = os.path.join(directory, POINTER)
+    with open(pointer + '.tmp', 'w') as handle:
+        handle.write(name)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(pointer + '.tmp', pointer)
+
+    # Workers that still map an older version keep reading it until their
+    # next check; unlinking only drops the name.
+    versions = sorted(f for f in os.listdir(directory) if f.startswith('store-') and f.endswith('.bin'))
+    for old in versions[:-keep]:
+        os.remove(os.path.join(directory, old))
+
+    return version
+
+_store = None
+_checked_at = 0
+_lock = threading.Lock()
+
+def get_store():
+    """
+    The currently published store, or ``None`` if nothing was published
+    or the published file cannot be read, so callers use the database.
+
+    The pointer file is re-read at most every
+    ``CATALOG_VECTOR_STORE_CHECK_INTERVAL`` seconds.
+    """
+    global _store, _checked_at
+    interval = getattr(settings, 'CATALOG_VECTOR_STORE_CHECK_INTERVAL', 30)
+
+    if time.monotonic() - _checked_at < interval and _checked_at:
+        return _store
+
+    with _lock:
+        _checked_at = time.monotonic()
+        directory = store_dir()
+        try:
+            with open(os.path.join(directory, POINTER)) as handle:
+                name = handle.read().strip()
+        except FileNotFoundError:
+            _store = None
+            return None
+
+        path = os.path.join(directory, name)
+        if _store is None or _store.path != path:
+            # CURRENT can name a version a concurrent publish already
+            # pruned, or a file that was truncated on disk.
+            try:
+                _store = VectorStore(path)
+            except (OSError, ValueError):
+                logger.exception('Could not open vector store %s', path)
+                _store = None
+    return _store
+
+def reset_store():
+    global _store, _checked_at
+    _store = None
+    _checked_at = 0
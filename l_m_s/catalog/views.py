@@ -1,85 +1,138 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, HttpResponseBadRequest
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Count, Avg, Prefetch
+from django.db.models import Count
 from django.core.paginator import Paginator
-from django.core.cache import cache
-from .models import Book, BookInstance, Author, Genre, Review, ReadingList
-from analytics.models import SearchLog, BookPopularity
+from django.conf import settings
+from .models import Book, Author, Genre, Review, ReadingList, RATING_VALUES
+from .search import search_books, rank_by_ids
+from .similarity import similar_books
+from .cache import CachedBookList, get_or_compute, result_cache_key, get_book_summary
+from .fuzzy import fuzzy_books, suggest
+from .facets import facet_counts, apply_facet_filters
+from .decorators import paginate_queryset
+from .pagination import BOOK_ORDERINGS, REVIEW_ORDERINGS, InvalidCursor
+from .utils import get_review_page
+from analytics.models import BookPopularity
+from analytics.search_log import log_search
+
+def book_list_result(books, search_query, params, sort_by):
+    """
+    Run the catalog search and return the cacheable part of the result.
+
+    Only primary keys, counts and facet values are returned; browse results
+    keep the first ``CATALOG_RESULT_CACHE_MAX_IDS`` ids, deeper pages are
+    read from the database.
+    """
+    did_you_mean = []
+    if search_query:
+        matches = search_books(books, search_query)
+        if not matches.exists():
+            did_you_mean = suggest(search_query)
+            matches = fuzzy_books(books, search_query)
+        books = matches
+    
+    books = apply_facet_filters(books, params)
+    
+    order_field, descending = BOOK_ORDERINGS[sort_by]
+    prefix = '-' if descending else ''
+    ordered = books.order_by(f'{prefix}{order_field}', f'{prefix}pk').values_list('pk', flat=True)
+    
+    if search_query:
+        book_ids = list(ordered)
+        count = len(book_ids)
+    else:
+        max_ids = getattr(settings, 'CATALOG_RESULT_CACHE_MAX_IDS', 1000)
+        book_ids = list(ordered[:max_ids + 1])
+        count = len(book_ids) if len(book_ids) <= max_ids else ordered.count()
+        book_ids = book_ids[:max_ids]
+    
+    return {
+        'book_ids': book_ids,
+        'count': count,
+        'facets': facet_counts(books),
+        'did_you_mean': did_you_mean,
+    }
 
 def book_list(request):
-    cache_key = f"book_list_{request.GET.urlencode()}"
-    cached_data = cache.get(cache_key)
+    books = Book.objects.select_related('publisher').prefetch_related('authors', 'genres')
     
-    if cached_data:
-        return render(request, 'catalog/book_list.html', cached_data)
+    search_query = request.GET.get('q', '').strip()
+    sort_by = request.GET.get('sort', 'relevance' if search_query else 'title')
+    if sort_by not in BOOK_ORDERINGS or (sort_by == 'relevance' and not search_query):
+        sort_by = 'title'
     
-    books = Book.objects.select_related('publisher').prefetch_related(
-        'authors', 
-        'genres',
-        Prefetch('instances', queryset=BookInstance.objects.filter(status='AVAILABLE'))
+    result = get_or_compute(
+        result_cache_key('book_list', request.GET, ignore=('page', 'cursor')),
+        lambda: book_list_result(books, search_query, request.GET, sort_by),
+        getattr(settings, 'CATALOG_RESULT_CACHE_TIMEOUT', 300)
     )
     
-    search_query = request.GET.get('q', '')
     if search_query:
-        books = books.filter(
-            Q(title__icontains=search_query) |
-            Q(authors__first_name__icontains=search_query) |
-            Q(authors__last_name__icontains=search_query) |
-            Q(isbn__icontains=search_query)
-        ).distinct()
-        
         if request.user.is_authenticated:
-            SearchLog.objects.create(
-                user=request.user,
-                search_query=search_query,
-                results_count=books.count(),
-                ip_address=request.META.get('REMOTE_ADDR')
+            log_search(
+                request.user,
+                search_query,
+                result['count'],
+                request.META.get('REMOTE_ADDR')
             )
-    
-    genre_filter = request.GET.get('genre')
-    if genre_filter:
-        books = books.filter(genres__id=genre_filter)
-    
-    language_filter = request.GET.get('language')
-    if language_filter:
-        books = books.filter(language=language_filter)
-    
-    sort_by = request.GET.get('sort', 'title')
-    if sort_by == 'rating':
-        books = books.order_by('-average_rating')
-    elif sort_by == 'newest':
-        books = books.order_by('-publication_date')
+        books = rank_by_ids(books, result['book_ids'])
     else:
-        books = books.order_by('title')
+        books = apply_facet_filters(books, request.GET)
     
-    paginator = Paginator(books, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if 'cursor' in request.GET:
+        try:
+            page_data = paginate_queryset(
+                books, None, 20, cursor=request.GET['cursor'] or None, ordering=sort_by
+            )
+        except InvalidCursor:
+            return HttpResponseBadRequest('Invalid cursor')
+        page_obj = page_data['results']
+    else:
+        order_field, descending = BOOK_ORDERINGS[sort_by]
+        prefix = '-' if descending else ''
+        books = books.order_by(f'{prefix}{order_field}', f'{prefix}pk')
+        
+        paginator = Paginator(CachedBookList(result['book_ids'], result['count'], books), 20)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
     
     context = {
         'page_obj': page_obj,
         'genres': Genre.objects.all(),
+        'facets': result['facets'],
         'search_query': search_query,
+        'did_you_mean': result['did_you_mean'],
     }
     
-    cache.set(cache_key, context, 300)
-    
     return render(request, 'catalog/book_list.html', context)
 
 def book_detail(request, pk):
-    book = get_object_or_404(
-        Book.objects.select_related('publisher')
-        .prefetch_related('authors', 'genres', 'instances', 'reviews__user'),
-        pk=pk
-    )
+    book = get_book_summary(pk)
+    if book is None:
+        raise Http404('Book not found')
+    
+    review_sort = request.GET.get('reviews', 'helpful')
+    if review_sort not in REVIEW_ORDERINGS:
+        review_sort = 'helpful'
+    cursor = request.GET.get('cursor')
     
-    available_instances = book.instances.filter(status='AVAILABLE').count()
-    reviews = book.reviews.all()[:10]
+    if review_sort == 'helpful' and not cursor:
+        reviews, next_cursor, previous_cursor = book['reviews'], book['reviews_next_cursor'], None
+    else:
+        try:
+            reviews, next_cursor, previous_cursor = get_review_page(pk, review_sort, cursor)
+        except InvalidCursor:
+            return HttpResponseBadRequest('Invalid cursor')
     
     context = {
         'book': book,
-        'available_instances': available_instances,
+        'available_instances': book['available_copies'],
         'reviews': reviews,
+        'review_sort': review_sort,
+        'reviews_next_cursor': next_cursor,
+        'reviews_previous_cursor': previous_cursor,
+        'similar_books': similar_books(pk),
     }
     return render(request, 'catalog/book_detail.html', context)
 
@@ -88,7 +141,13 @@ def add_review(request, pk):
     book = get_object_or_404(Book, pk=pk)
     
     if request.method == 'POST':
-        rating = int(request.POST.get('rating'))
+        try:
+            rating = int(request.POST.get('rating', ''))
+        except ValueError:
+            rating = None
+        if rating not in RATING_VALUES:
+            return HttpResponseBadRequest('Rating must be a whole number from 1 to 5')
+        
         title = request.POST.get('title')
         content = request.POST.get('content')
         
@@ -102,11 +161,6 @@ def add_review(request, pk):
             }
         )
         
-        reviews = book.reviews.all()
-        book.average_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-        book.total_ratings = reviews.count()
-        book.save()
-        
         return redirect('book_detail', pk=pk)
     
     return render(request, 'catalog/add_review.html', {'book': book})
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('catalog', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('membership_type', models.CharField(max_length=20, unique=True)),
+                ('max_books', models.IntegerField(default=5)),
+                ('loan_period_days', models.IntegerField(default=14)),
+                ('max_renewals', models.IntegerField(default=3)),
+                ('fine_per_day', models.DecimalField(decimal_places=2, default=0.5, max_digits=5)),
+                ('max_fine_amount', models.DecimalField(decimal_places=2, default=50.0, max_digits=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Loan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkout_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('due_date', models.DateField()),
+                ('return_date', models.DateTimeField(blank=True, null=True)),
+                ('renewal_count', models.IntegerField(default=0)),
+                ('max_renewals', models.IntegerField(default=3)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('RETURNED', 'Returned'), ('OVERDUE', 'Overdue'), ('LOST', 'Lost')], default='ACTIVE', max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('book_instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.bookinstance')),
+                ('checked_out_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loans_processed', to=settings.AUTH_USER_MODEL)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='loans', to='accounts.memberprofile')),
+            ],
+            options={
+                'ordering': ['-checkout_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Fine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('reason', models.CharField(choices=[('OVERDUE', 'Overdue Book'), ('DAMAGE', 'Damaged Book'), ('LOST', 'Lost Book'), ('OTHER', 'Other')], max_length=20)),
+                ('description', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PAID', 'Paid'), ('WAIVED', 'Waived'), ('CANCELLED', 'Cancelled')], default='PENDING', max_length=20)),
+                ('issued_date', models.DateTimeField(auto_now_add=True)),
+                ('paid_date', models.DateTimeField(blank=True, null=True)),
+                ('payment_method', models.CharField(blank=True, max_length=50)),
+                ('transaction_id', models.CharField(blank=True, max_length=100)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fines', to='accounts.memberprofile')),
+                ('loan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='circulation.loan')),
+            ],
+            options={
+                'ordering': ['-issued_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RenewalHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('renewed_on', models.DateTimeField(auto_now_add=True)),
+                ('old_due_date', models.DateField()),
+                ('new_due_date', models.DateField()),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renewal_history', to='circulation.loan')),
+                ('renewed_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-renewed_on'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reservation_date', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('expiry_date', models.DateField()),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('FULFILLED', 'Fulfilled'), ('CANCELLED', 'Cancelled'), ('EXPIRED', 'Expired')], default='ACTIVE', max_length=20)),
+                ('position_in_queue', models.IntegerField(default=1)),
+                ('notified', models.BooleanField(default=False)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.book')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='accounts.memberprofile')),
+            ],
+            options={
+                'ordering': ['position_in_queue', 'reservation_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['status'], name='circulation_status_63cda3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['due_date'], name='circulation_due_dat_cde580_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['book', 'status', 'position_in_queue'], name='circulation_book_id_2e5fd8_idx'),
+        ),
+    ]
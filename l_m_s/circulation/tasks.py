@@ -70,7 +70,7 @@ def update_book_popularity():
     
     for book in Book.objects.all():
         total_loans = book.instances.filter(loan__isnull=False).count()
-        total_reviews = book.reviews.count()
+        total_reviews = book.total_ratings
         avg_rating = float(book.average_rating)
         
         popularity_score = (total_loans * 2) + (total_reviews * 1.5) + (avg_rating * 10)
@@ -5,6 +5,7 @@ from datetime import timedelta
 from django.db.models import Q
 from .models import Loan, Reservation, Fine, RenewalHistory, CheckoutPolicy
 from catalog.models import BookInstance
+from catalog.tasks import queue_member_refresh
 from accounts.models import MemberProfile, ActivityLog
 
 def is_librarian(user):
@@ -101,6 +102,8 @@ def return_book(request, loan_id):
     loan.book_instance.status = 'AVAILABLE'
     loan.book_instance.save()
     
+    queue_member_refresh(loan.member_id)
+    
     if loan.is_overdue():
         days_overdue = loan.days_overdue()
         policy = CheckoutPolicy.objects.filter(
@@ -192,9 +195,7 @@ def create_reservation(request, book_id):
     book = get_object_or_404(Book, id=book_id)
     profile = get_object_or_404(MemberProfile, user=request.user)
     
-    available_count = book.instances.filter(status='AVAILABLE').count()
-    
-    if available_count > 0:
+    if book.available_copies > 0:
         return render(request, 'circulation/reservation_error.html', {
             'error': 'Book is available for checkout'
         })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -87,6 +88,26 @@ DATABASES = {
 }
 
 
+# Cache
+# The catalog generation counter, cached results and single-flight locks only
+# work when every worker process shares one cache, so it must not be the
+# per-process LocMemCache outside of tests.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    }
+}
+
+if 'test' in sys.argv:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -127,3 +148,150 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Catalog search
+# Dotted path to the search backend; falls back to plain database lookups
+# when the backend is not supported by the configured database.
+
+CATALOG_SEARCH_BACKEND = 'catalog.search.SQLiteFTSBackend'
+
+CATALOG_SEARCH_MAX_RESULTS = 1000
+
+# Typo-tolerant search
+# Minimum share of query trigrams a title or author name must contain.
+
+CATALOG_FUZZY_THRESHOLD = 0.5
+
+# Autocomplete
+# Suggestions kept per prefix and seconds before a worker rebuilds its index
+# in the background to pick up catalog changes made by other workers.
+
+CATALOG_AUTOCOMPLETE_TOP_K = 10
+
+CATALOG_AUTOCOMPLETE_MAX_AGE = 3600
+
+# Seconds the batch availability endpoint caches per-book status counts.
+
+CATALOG_AVAILABILITY_CACHE_TIMEOUT = 30
+
+# Book list result cache
+# Entries hold book ids and facet counts only and are orphaned whenever the
+# catalog generation is bumped. Browse results keep at most MAX_IDS ids.
+
+CATALOG_RESULT_CACHE_TIMEOUT = 300
+
+CATALOG_RESULT_CACHE_MAX_IDS = 1000
+
+CATALOG_CACHE_LOCK_TIMEOUT = 10
+
+# Book detail cache
+# Per-book summaries are expired by signals, so they can live for long.
+
+CATALOG_BOOK_SUMMARY_TIMEOUT = 3600
+
+CATALOG_BOOK_SUMMARY_REVIEWS = 10
+
+# Search logging
+# SearchLog rows are buffered per process and written in batches of this
+# size, or after this many seconds, when a request finishes or by a
+# background thread.
+
+ANALYTICS_SEARCH_LOG_BATCH_SIZE = 100
+
+ANALYTICS_SEARCH_LOG_FLUSH_INTERVAL = 5
+
+# Search log rows younger than this are left for the next rollup run.
+
+ANALYTICS_ROLLUP_SETTLE_SECONDS = 60
+
+# Recommendations
+# Books recommended per member and co-borrowing neighbours kept per book.
+
+CATALOG_RECOMMENDATIONS_PER_MEMBER = 20
+
+CATALOG_RECOMMENDATION_NEIGHBORS = 20
+
+# Content-similar books precomputed per book by build_similar_books.
+
+CATALOG_SIMILAR_BOOKS = 10
+
+# Shared vector store
+# Memory-mapped snapshot of neighbour lists, popularity and titles that all
+# worker processes read; workers look for a newly published version at most
+# every CHECK_INTERVAL seconds.
+
+CATALOG_VECTOR_STORE_DIR = BASE_DIR / 'var' / 'vectors'
+
+CATALOG_VECTOR_STORE_CHECK_INTERVAL = 30
+
+# Book discussions
+# Top-level threads per discussion page and how many reply levels are
+# loaded with them; deeper replies are expanded on request. Replies nested
+# past MAX_DEPTH attach to the deepest allowed ancestor.
+
+DISCUSSION_THREADS_PER_PAGE = 20
+
+DISCUSSION_TREE_DEPTH = 3
+
+DISCUSSION_MAX_DEPTH = 20
+
+# Seconds of recency worth a tenfold increase in comments when ranking
+# discussions as hot.
+
+DISCUSSION_HOT_SECONDS = 45000
+
+# E-book downloads
+# None streams files from Python with byte-range support. 'nginx' answers
+# with X-Accel-Redirect to ACCEL_REDIRECT_PREFIX (an internal location that
+# maps to the media root); 'xsendfile' sends the absolute path in
+# X-Sendfile for Apache mod_xsendfile or lighttpd.
+
+EBOOK_SENDFILE_BACKEND = None
+
+EBOOK_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Chunked e-book uploads are assembled here before being stored under
+# their SHA-256; unfinished ones are purged by purge_stale_uploads.
+
+EBOOK_UPLOAD_DIR = BASE_DIR / 'var' / 'uploads'
+
+EBOOK_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+EBOOK_UPLOAD_MAX_SIZE = 1024 * 1024 * 1024
+
+# Worker processes index_ebook_text uses to extract e-book text. PDF text
+# needs pypdf; without it PDFs wait as pending until it is installed.
+
+EBOOK_TEXT_WORKERS = 2
+
+# Celery
+# New e-book files are queued for text indexing when they are attached; beat
+# runs a catch-up pass for anything that was not queued.
+
+CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
+
+CELERY_BEAT_SCHEDULE = {
+    'index-ebook-text': {
+        'task': 'catalog.tasks.index_ebook_text',
+        'schedule': 15 * 60,
+    },
+}
+
+# Tasks run inline under the test runner.
+
+CELERY_TASK_ALWAYS_EAGER = 'test' in sys.argv
+
+# Image derivatives
+# Covers, author photos, profile pictures and badge icons are resized to
+# fit each box (width, height) in WebP and JPEG by a thread pool after
+# upload; WORKERS = 0 builds them inline.
+
+IMAGE_DERIVATIVE_SIZES = {
+    'thumb': (96, 144),
+    'small': (200, 300),
+    'medium': (400, 600),
+}
+
+IMAGE_DERIVATIVE_WORKERS = 2
+
+IMAGE_DERIVATIVE_CACHE_TIMEOUT = 3600
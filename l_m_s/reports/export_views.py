@@ -66,12 +66,10 @@ def export_catalog_csv(request):
     writer = csv.writer(response)
     writer.writerow(['ISBN', 'Title', 'Authors', 'Publisher', 'Publication Date', 'Total Copies', 'Available'])
     
-    books = Book.objects.prefetch_related('authors', 'instances').all()
+    books = Book.objects.select_related('publisher').prefetch_related('authors').all()
     
     for book in books:
         authors = ', '.join([f"{a.first_name} {a.last_name}" for a in book.authors.all()])
-        total_copies = book.instances.count()
-        available = book.instances.filter(status='AVAILABLE').count()
         
         writer.writerow([
             book.isbn,
@@ -79,8 +77,8 @@ def export_catalog_csv(request):
             authors,
             book.publisher.name if book.publisher else '',
             book.publication_date.strftime('%Y-%m-%d'),
-            total_copies,
-            available
+            book.total_copies,
+            book.available_copies
         ])
     
     return response